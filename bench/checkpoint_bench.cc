@@ -0,0 +1,167 @@
+// Microbenchmark of the prediction-time checkpoint store (pred_time_histories).
+//
+// Replays the conditional branches of one or more traces through the predict/update checkpoint pattern of
+// the predictors: a checkpoint is saved at predict and looked up and released at update. Updates happen out
+// of order, a random number of uops (less than the window size) after the prediction, like the execute stage
+// of the simulator. Each container (std::map, std::unordered_map, CheckpointBuffer) is timed with the GSHARE
+// checkpoint (SampleHist) and the TAGE-SC-L checkpoint (cbp_hist_t).
+//
+// Build: make checkpoint_bench
+// Run:   ./bench/checkpoint_bench [-r <repeats>] [-w <window>] <trace.gz> [<trace.gz> ...]
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <chrono>
+#include <map>
+#include <unordered_map>
+#include <random>
+#include <vector>
+#include <algorithm>
+#include "lib/trace_reader.h"
+#include "gshare.h"
+#include "cbp2016_tage_sc_l.h"
+#include "checkpoint_buffer.h"
+
+struct Event
+{
+    uint64_t time;  // uop count at which the event happens
+    uint64_t seq_no;
+    uint8_t piece;
+    bool is_update;
+};
+
+// Conditional branches of the trace as (seq_no, piece), seq_no counted in uops like uarchsim_t::step
+static void read_branches(const char* trace_name, std::vector<std::pair<uint64_t, uint8_t>>& branches, uint64_t& seq_no)
+{
+    TraceReader reader(trace_name);
+    uint8_t piece = 0;
+    while (db_t* inst = reader.get_inst())
+    {
+        if (is_cond_br(inst->insn_class))
+            branches.emplace_back(seq_no, piece);
+        piece = inst->is_last_piece ? 0 : piece + 1;
+        seq_no++;
+        delete inst;
+    }
+}
+
+static std::vector<Event> make_schedule(const std::vector<std::pair<uint64_t, uint8_t>>& branches, uint64_t window)
+{
+    std::mt19937_64 rng(1);
+    std::vector<Event> events;
+    events.reserve(2 * branches.size());
+    for (const auto& [seq_no, piece] : branches)
+    {
+        events.push_back({seq_no, seq_no, piece, false});
+        events.push_back({seq_no + 1 + rng() % (window - 1), seq_no, piece, true});
+    }
+    std::stable_sort(events.begin(), events.end(), [](const Event& a, const Event& b) { return a.time < b.time; });
+    return events;
+}
+
+static uint64_t unique_id(uint64_t seq_no, uint8_t piece)
+{
+    return (seq_no << 4) | (piece & 0x000F);
+}
+
+// Adapters giving the three containers the CheckpointBuffer interface
+template <typename T>
+struct MapStore
+{
+    std::map<uint64_t, T> map;
+    void emplace(uint64_t seq_no, uint8_t piece, const T& value) { map.emplace(unique_id(seq_no, piece), value); }
+    const T& at(uint64_t seq_no, uint8_t piece) const { return map.at(unique_id(seq_no, piece)); }
+    void erase(uint64_t seq_no, uint8_t piece) { map.erase(unique_id(seq_no, piece)); }
+};
+
+template <typename T>
+struct UnorderedMapStore
+{
+    std::unordered_map<uint64_t, T> map;
+    void emplace(uint64_t seq_no, uint8_t piece, const T& value) { map.emplace(unique_id(seq_no, piece), value); }
+    const T& at(uint64_t seq_no, uint8_t piece) const { return map.at(unique_id(seq_no, piece)); }
+    void erase(uint64_t seq_no, uint8_t piece) { map.erase(unique_id(seq_no, piece)); }
+};
+
+static uint64_t& hist_word(SampleHist& hist) { return hist.ghist; }
+static uint64_t& hist_word(cbp_hist_t& hist) { return hist.GHIST; }
+static uint64_t hist_word(const SampleHist& hist) { return hist.ghist; }
+static uint64_t hist_word(const cbp_hist_t& hist) { return hist.GHIST; }
+
+// Returns branches/sec; checksum keeps the lookups from being optimized away
+template <typename Store, typename T>
+static double replay(Store& store, const std::vector<Event>& events, uint64_t num_branches, int repeats, uint64_t& checksum)
+{
+    T active_hist;
+    hist_word(active_hist) = 0;
+    const auto begin = std::chrono::steady_clock::now();
+    for (int r = 0; r < repeats; r++)
+    {
+        // Shift seq_no per repeat so ids stay unique and increasing, as in one long trace
+        const uint64_t offset = (uint64_t)r << 40;
+        for (const Event& event : events)
+        {
+            if (event.is_update)
+            {
+                checksum += hist_word(store.at(offset + event.seq_no, event.piece));
+                store.erase(offset + event.seq_no, event.piece);
+            }
+            else
+            {
+                hist_word(active_hist) = (hist_word(active_hist) << 1) ^ event.seq_no;
+                store.emplace(offset + event.seq_no, event.piece, active_hist);
+            }
+        }
+    }
+    const double seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - begin).count();
+    return (double)num_branches * repeats / seconds;
+}
+
+template <typename T>
+static void bench_payload(const char* name, const std::vector<Event>& events, uint64_t num_branches, int repeats, uint64_t window)
+{
+    uint64_t checksum[3] = {0, 0, 0};
+    MapStore<T> map_store;
+    UnorderedMapStore<T> unordered_map_store;
+    CheckpointBuffer<T> ring_store(window);
+    const double map_rate = replay<MapStore<T>, T>(map_store, events, num_branches, repeats, checksum[0]);
+    const double unordered_map_rate = replay<UnorderedMapStore<T>, T>(unordered_map_store, events, num_branches, repeats, checksum[1]);
+    const double ring_rate = replay<CheckpointBuffer<T>, T>(ring_store, events, num_branches, repeats, checksum[2]);
+    assert(checksum[0] == checksum[1] && checksum[1] == checksum[2]);
+
+    printf("%-12s %6lu B  std::map %8.2f M br/s | std::unordered_map %8.2f M br/s | CheckpointBuffer %8.2f M br/s | speedup %5.2fx / %5.2fx\n",
+           name, sizeof(T), map_rate / 1e6, unordered_map_rate / 1e6, ring_rate / 1e6, ring_rate / map_rate, ring_rate / unordered_map_rate);
+}
+
+int main(int argc, char** argv)
+{
+    int repeats = 20;
+    uint64_t window = 1024;
+    int i = 1;
+    for (; i < argc && argv[i][0] == '-'; i += 2)
+    {
+        if (i + 1 >= argc)
+            break;
+        if (!strcmp(argv[i], "-r"))
+            repeats = atoi(argv[i + 1]);
+        else if (!strcmp(argv[i], "-w"))
+            window = strtoull(argv[i + 1], NULL, 10);
+    }
+    if (i >= argc || repeats <= 0 || window < 2)
+    {
+        fprintf(stderr, "usage: %s [-r <repeats>] [-w <window>] <trace.gz> [<trace.gz> ...]\n", argv[0]);
+        return 1;
+    }
+
+    std::vector<std::pair<uint64_t, uint8_t>> branches;
+    uint64_t num_uops = 0;
+    for (; i < argc; i++)
+        read_branches(argv[i], branches, num_uops);
+    const std::vector<Event> events = make_schedule(branches, window);
+    printf("%lu conditional branches in %lu uops, window %lu, %d repeats\n", branches.size(), num_uops, window, repeats);
+
+    bench_payload<SampleHist>("GSHARE", events, branches.size(), repeats, window);
+    bench_payload<cbp_hist_t>("TAGE-SC-L", events, branches.size(), repeats, window);
+    return 0;
+}
@@ -0,0 +1,144 @@
+// Microbenchmark of the predictor counter tables (counter_table.h).
+//
+// Replays the conditional branches of one or more traces through a predict/update loop of 2-bit counters with the
+// storage the predictors used before, one int (GSHARE, BHTPredictor) or int8_t (TOURNAMENT_PREDICTOR) per
+// counter, and with CounterTable<2> in its byte (default) and packed layouts, for a range of table sizes. All
+// four must make the same predictions.
+//
+// Two access patterns are timed. "gshare" indexes the table with the PC xor a global history of log2(size) bits:
+// the sample traces touch a few tens of thousands of counters, so every table stays cache resident and the
+// packed table pays its shift and mask: this is the case of the predictors. "uniform" spreads the branches over the whole table with a hash of their
+// position, the pattern of a table whose working set is the table itself (long traces, large configurations):
+// there the 4-16x larger tables fall out of the host caches.
+//
+// Build: make counter_table_bench
+// Run:   ./bench/counter_table_bench [-r <repeats>] [-min <log2 size>] [-max <log2 size>] <trace.gz> [<trace.gz> ...]
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <chrono>
+#include <vector>
+#include "lib/trace_reader.h"
+#include "counter_table.h"
+
+struct Branch
+{
+    uint64_t pc;
+    bool taken;
+};
+
+static void read_branches(const char* trace_name, std::vector<Branch>& branches)
+{
+    TraceReader reader(trace_name);
+    while (db_t* inst = reader.get_inst())
+    {
+        if (is_cond_br(inst->insn_class))
+            branches.push_back({inst->pc, inst->is_taken});
+        delete inst;
+    }
+}
+
+// The unpacked tables, with the saturating update of the predictors
+template <typename T>
+struct VectorTable
+{
+    std::vector<T> table;
+    VectorTable(uint64_t size) : table(size, 0) {}
+    bool taken(uint64_t index) const { return table[index] >= 2; }
+    void update(uint64_t index, bool up)
+    {
+        T& state = table[index];
+        if (up) { if (state < 3) state++; }
+        else { if (state > 0) state--; }
+    }
+    uint64_t host_bytes() const { return table.size() * sizeof(T); }
+};
+
+static inline uint64_t mix(uint64_t x)
+{
+    x ^= x >> 33;
+    x *= 0xff51afd7ed558ccdULL;
+    x ^= x >> 33;
+    return x;
+}
+
+// Returns branches/sec; mispredictions are counted to check the tables against each other
+template <typename Table>
+static double replay(Table& table, uint64_t size, bool uniform, const std::vector<Branch>& branches, int repeats, uint64_t& mispredictions)
+{
+    const uint64_t mask = size - 1;
+    uint64_t ghist = 0;
+    uint64_t position = 0;
+    const auto begin = std::chrono::steady_clock::now();
+    for (int r = 0; r < repeats; r++)
+    {
+        for (const Branch& branch : branches)
+        {
+            const uint64_t index = (uniform ? mix(position++) : (branch.pc >> 2) ^ ghist) & mask;
+            mispredictions += table.taken(index) != branch.taken;
+            table.update(index, branch.taken);
+            ghist = ((ghist << 1) | branch.taken) & mask;
+        }
+    }
+    const double seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - begin).count();
+    return (double)branches.size() * repeats / seconds;
+}
+
+int main(int argc, char** argv)
+{
+    int repeats = 10;
+    int min_log_size = 10;
+    int max_log_size = 24;
+    int i = 1;
+    for (; i < argc && argv[i][0] == '-'; i += 2)
+    {
+        if (i + 1 >= argc)
+            break;
+        if (!strcmp(argv[i], "-r"))
+            repeats = atoi(argv[i + 1]);
+        else if (!strcmp(argv[i], "-min"))
+            min_log_size = atoi(argv[i + 1]);
+        else if (!strcmp(argv[i], "-max"))
+            max_log_size = atoi(argv[i + 1]);
+    }
+    if (i >= argc || repeats <= 0 || min_log_size < 1 || max_log_size > 30 || min_log_size > max_log_size)
+    {
+        fprintf(stderr, "usage: %s [-r <repeats>] [-min <log2 size>] [-max <log2 size>] <trace.gz> [<trace.gz> ...]\n", argv[0]);
+        return 1;
+    }
+
+    std::vector<Branch> branches;
+    for (; i < argc; i++)
+        read_branches(argv[i], branches);
+    printf("%lu conditional branches, %d repeats\n", branches.size(), repeats);
+    printf("%-8s %10s %10s | %22s | %22s | %22s | %22s | %s\n", "pattern", "counters", "bits", "std::vector<int>", "std::vector<int8_t>",
+           "CounterTable<2,false>", "CounterTable<2,true>", "packed vs int8_t/byte");
+
+    for (int uniform = 0; uniform < 2; uniform++)
+    for (int log_size = min_log_size; log_size <= max_log_size; log_size++)
+    {
+        const uint64_t size = (uint64_t)1 << log_size;
+        uint64_t mispredictions[4] = {0, 0, 0, 0};
+        VectorTable<int> int_table(size);
+        VectorTable<int8_t> int8_table(size);
+        CounterTable<2, false> byte_table(size);
+        CounterTable<2, true> packed_table(size);
+        const double int_rate = replay(int_table, size, uniform, branches, repeats, mispredictions[0]);
+        const double int8_rate = replay(int8_table, size, uniform, branches, repeats, mispredictions[1]);
+        const double byte_rate = replay(byte_table, size, uniform, branches, repeats, mispredictions[2]);
+        const double packed_rate = replay(packed_table, size, uniform, branches, repeats, mispredictions[3]);
+        if (mispredictions[0] != mispredictions[1] || mispredictions[1] != mispredictions[2] || mispredictions[2] != mispredictions[3])
+        {
+            fprintf(stderr, "tables disagree: %lu %lu %lu %lu mispredictions\n", mispredictions[0], mispredictions[1], mispredictions[2], mispredictions[3]);
+            return 1;
+        }
+
+        printf("%-8s %10lu %10lu | %7.2f M br/s %6lu KB | %7.2f M br/s %6lu KB | %7.2f M br/s %6lu KB | %7.2f M br/s %6lu KB | %5.2fx / %5.2fx\n",
+               uniform ? "uniform" : "gshare", size, packed_table.storage_bits(),
+               int_rate / 1e6, int_table.host_bytes() / 1024, int8_rate / 1e6, int8_table.host_bytes() / 1024,
+               byte_rate / 1e6, byte_table.host_bytes() / 1024, packed_rate / 1e6, packed_table.host_bytes() / 1024,
+               packed_rate / int8_rate, packed_rate / byte_rate);
+    }
+    return 0;
+}
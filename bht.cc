@@ -3,7 +3,7 @@
 BHTPredictor cond_predictor_impl(1024);  
 
 BHTPredictor::BHTPredictor(int table_size) {
-    table.resize(table_size, 0);  
+    table.assign(table_size, 0);
 }
 
 int BHTPredictor::get_index(uint64_t address) const {
@@ -11,27 +11,15 @@ int BHTPredictor::get_index(uint64_t address) const {
 }
 
 bool BHTPredictor::predict(uint64_t seq_no, uint8_t piece, uint64_t pc, bool tage_sc_l_pred) {
-    int index = get_index(pc);    
-    int state = table[index];     
+    int index = get_index(pc);
 
-    return state >= 2;
+    return table.taken(index);
 }
 
 void BHTPredictor::update(uint64_t seq_no, uint8_t piece, uint64_t pc, bool resolve_dir, bool pred_dir, uint64_t next_pc) {
-    int index = get_index(pc);   
-    int &state = table[index];    
-    
-    if (resolve_dir) {
-        if (state < 3) {
-            state++;  
-        }
-    }
-    
-    else {
-        if (state > 0) {
-            state--;  
-        }
-    }
+    int index = get_index(pc);
+
+    table.update(index, resolve_dir);
 }
 
 void BHTPredictor::setup() {
@@ -43,3 +31,7 @@ void BHTPredictor::history_update(uint64_t seq_no, uint8_t piece, uint64_t pc, b
 void BHTPredictor::terminate() {
 }
 
+uint64_t BHTPredictor::storage_bits() const {
+    return table.storage_bits();
+}
+
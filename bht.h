@@ -4,6 +4,7 @@
 #include <vector>
 #include <stdint.h>
 #include <assert.h>
+#include "counter_table.h"
 
 class BHTPredictor {
 public:
@@ -19,8 +20,10 @@ public:
     
     void terminate();
 
+    uint64_t storage_bits() const;
+
 private:
-    std::vector<int> table;  
+    CounterTable<2> table;
     
     int get_index(uint64_t address) const;
 };
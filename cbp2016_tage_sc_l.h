@@ -7,10 +7,10 @@
 #include <inttypes.h>
 #include <math.h>
 #include <stdio.h>
-#include <unordered_map>
 #include <vector>
 #include <array>
 #include <iostream>
+#include "checkpoint_buffer.h"
 
 
 //parameters of the loop predictor
@@ -449,7 +449,7 @@ int predictorsize ()
 // * spec_update -> This is used for updating the history. It provides the actual direction of the branch. This is invoked for all branches.
 // * notify_instr_execute_resolve -> This hook is used to update the predictor. This is invoked for all the instructions and provides all information available at execute.
 //    * Note: The history at update is different than history at predict. To ensure that the predictor is getting trained correctly, 
-//    at predict, we checkpoint the history in an unordered_map(pred_time_histories) using unique identifying id of the instruction. 
+//    at predict, we checkpoint the history in a ring buffer(pred_time_histories, see checkpoint_buffer.h) using unique identifying id of the instruction. 
 //    When updating the predicor, we recover the prediction time history.
 // There are a couple of other hooks that aren't used in the current implementation, but are available to exploit:
 // * notify_instr_decode 
@@ -490,7 +490,7 @@ class CBP2016_TAGE_SC_L
 
         cbp_hist_t active_hist; // running history always updated accurately
         // checkpointed history. Can be accesed using the inst-id(seq_no/piece)
-        std::unordered_map<uint64_t/*key*/, cbp_hist_t/*val*/> pred_time_histories;
+        CheckpointBuffer<cbp_hist_t> pred_time_histories;
 
         CBP2016_TAGE_SC_L (void)
         {
@@ -1019,7 +1019,7 @@ class CBP2016_TAGE_SC_L
         bool predict (uint64_t seq_no, uint8_t piece, UINT64 PC)
         {
             // checkpoint current hist
-            pred_time_histories.emplace(get_unique_inst_id(seq_no, piece), active_hist);
+            pred_time_histories.emplace(seq_no, piece, active_hist);
             const bool pred_taken = predict_using_given_hist(seq_no, piece, PC, active_hist, true/*pred_time_predict*/);
             return pred_taken;
         }
@@ -1232,8 +1232,7 @@ class CBP2016_TAGE_SC_L
         //void update (UINT64 PC, int brtype, bool resolveDir, bool predDir, UINT64 nextPC)
         void update (uint64_t seq_no, uint8_t piece, UINT64 PC, bool resolveDir, bool predDir, UINT64 nextPC)
         {
-            const auto pred_hist_key = get_unique_inst_id(seq_no, piece);
-            const auto& pred_time_history = pred_time_histories.at(pred_hist_key);
+            const auto& pred_time_history = pred_time_histories.at(seq_no, piece);
             const bool pred_taken = predict_using_given_hist(seq_no, piece, PC, pred_time_history, false/*pred_time_predict*/);
             //if(pred_taken != predDir)
             //{
@@ -1242,7 +1241,7 @@ class CBP2016_TAGE_SC_L
             //} 
             // remove checkpointed hist
             update(PC, resolveDir, pred_taken, nextPC, pred_time_history);
-            pred_time_histories.erase(pred_hist_key);
+            pred_time_histories.erase(seq_no, piece);
         }
 
         void update (UINT64 PC, bool resolveDir, bool pred_taken, UINT64 nextPC, const cbp_hist_t& hist_to_use)
@@ -0,0 +1,109 @@
+#ifndef _CHECKPOINT_BUFFER_H_
+#define _CHECKPOINT_BUFFER_H_
+
+#include <deque>
+#include <vector>
+#include <stdint.h>
+#include <assert.h>
+
+// Fixed-capacity store for prediction-time checkpoints (e.g. the history a branch was predicted with),
+// replacing a std::map/std::unordered_map keyed by the unique instruction id.
+//
+// A checkpoint is taken at predict and released at update. Both happen while the instruction sits in the
+// simulator's instruction window, and seq_no is a running uop count, so the seq_no of all live checkpoints
+// are within WINDOW_SIZE of each other. Indexing a power-of-two ring by seq_no therefore never collides
+// as long as the capacity is at least the window size; each ring entry keeps the full (seq_no, piece) id as
+// a tag so a stale or missing checkpoint is caught. If the window is configured larger than the capacity
+// (cbp -w), the ring doubles on the first collision instead of failing.
+//
+// The ring only holds small index entries. The checkpoints themselves live in a pool sized by the number of
+// live checkpoints (roughly the branches in the window) whose slots are recycled last-freed-first, so large
+// checkpoints (TAGE-SC-L histories are ~10KB) stay cache resident, and checkpoints holding heap storage
+// (e.g. std::vector members) are copy-assigned into an existing allocation instead of allocating per branch.
+template <typename T>
+class CheckpointBuffer
+{
+    public:
+        explicit CheckpointBuffer(uint64_t capacity = 1024)
+        {
+            uint64_t size = 1;
+            while (size < capacity)
+                size <<= 1;
+            ring.resize(size);
+        }
+
+        // Saves a copy of value for (seq_no, piece) and returns a reference to it
+        T& emplace(uint64_t seq_no, uint8_t piece, const T& value)
+        {
+            const uint64_t tag = make_tag(seq_no, piece);
+            Entry* entry = &ring[seq_no & (ring.size() - 1)];
+            while (entry->valid && entry->tag != tag)
+            {
+                grow();
+                entry = &ring[seq_no & (ring.size() - 1)];
+            }
+            if (!entry->valid)
+            {
+                if (free_slots.empty())
+                {
+                    free_slots.push_back(pool.size());
+                    pool.emplace_back();
+                }
+                entry->slot = free_slots.back();
+                free_slots.pop_back();
+                entry->tag = tag;
+                entry->valid = true;
+            }
+            pool[entry->slot] = value;
+            return pool[entry->slot];
+        }
+
+        const T& at(uint64_t seq_no, uint8_t piece) const
+        {
+            const Entry& entry = ring[seq_no & (ring.size() - 1)];
+            assert(entry.valid && entry.tag == make_tag(seq_no, piece) && "no checkpoint for this instruction");
+            return pool[entry.slot];
+        }
+
+        void erase(uint64_t seq_no, uint8_t piece)
+        {
+            Entry& entry = ring[seq_no & (ring.size() - 1)];
+            assert(entry.valid && entry.tag == make_tag(seq_no, piece) && "no checkpoint for this instruction");
+            entry.valid = false;
+            free_slots.push_back(entry.slot);
+        }
+
+        uint64_t size() const { return pool.size() - free_slots.size(); }
+        uint64_t capacity() const { return ring.size(); }
+
+    private:
+        struct Entry
+        {
+            uint64_t tag = 0;
+            uint32_t slot = 0;
+            bool valid = false;
+        };
+
+        std::vector<Entry> ring;
+        std::deque<T> pool;  // deque: references stay valid as the pool grows
+        std::vector<uint32_t> free_slots;
+
+        static uint64_t make_tag(uint64_t seq_no, uint8_t piece)
+        {
+            assert(piece < 16);
+            return (seq_no << 4) | (piece & 0x000F);
+        }
+
+        void grow()
+        {
+            std::vector<Entry> old_ring(ring.size() * 2);
+            old_ring.swap(ring);
+            for (const Entry& entry : old_ring)
+            {
+                if (entry.valid)
+                    ring[(entry.tag >> 4) & (ring.size() - 1)] = entry;
+            }
+        }
+};
+
+#endif
@@ -19,6 +19,7 @@
 #include "lib/sim_common_structs.h"
 #include "cbp2016_tage_sc_l.h"
 #include "my_cond_branch_predictor.h"
+#include "hook_profiler.h"
 #include <cassert>
 
 //
@@ -32,6 +33,7 @@ void beginCondDirPredictor()
     // setup sample_predictor
     cbp2016_tage_sc_l.setup();
     cond_predictor_impl.setup();
+    HOOK_PROFILE_BEGIN();
 }
 
 //
@@ -42,6 +44,7 @@ void beginCondDirPredictor()
 //
 void notify_instr_fetch(uint64_t seq_no, uint8_t piece, uint64_t pc, const uint64_t fetch_cycle)
 {
+    HOOK_PROFILE_SCOPE(HOOK_FETCH);
 }
 
 //
@@ -53,6 +56,7 @@ void notify_instr_fetch(uint64_t seq_no, uint8_t piece, uint64_t pc, const uint6
 //
 bool get_cond_dir_prediction(uint64_t seq_no, uint8_t piece, uint64_t pc, const uint64_t pred_cycle)
 {
+    HOOK_PROFILE_SCOPE(HOOK_PREDICT);
     const bool tage_sc_l_pred = cbp2016_tage_sc_l.predict(seq_no, piece, pc);
     const bool my_prediction = cond_predictor_impl.predict(seq_no, piece, pc, tage_sc_l_pred);
     return my_prediction;
@@ -68,6 +72,7 @@ bool get_cond_dir_prediction(uint64_t seq_no, uint8_t piece, uint64_t pc, const
 //
 void spec_update(uint64_t seq_no, uint8_t piece, uint64_t pc, InstClass inst_class, const bool resolve_dir, const bool pred_dir, const uint64_t next_pc)
 {
+    HOOK_PROFILE_SCOPE(HOOK_SPEC_UPDATE);
     assert(is_br(inst_class));
     int br_type = 0;
     switch(inst_class)
@@ -137,6 +142,7 @@ void notify_agen_complete(uint64_t seq_no, uint8_t piece, uint64_t pc, const Dec
 // At the moment, we do not consider updating any other structure, but the contestants are allowed to  update any other predictor state.
 void notify_instr_execute_resolve(uint64_t seq_no, uint8_t piece, uint64_t pc, const bool pred_dir, const ExecuteInfo& _exec_info, const uint64_t execute_cycle)
 {
+    HOOK_PROFILE_SCOPE(HOOK_RESOLVE);
     const bool is_branch = is_br(_exec_info.dec_info.insn_class);
     if(is_branch)
     {
@@ -163,6 +169,7 @@ void notify_instr_execute_resolve(uint64_t seq_no, uint8_t piece, uint64_t pc, c
 // For the sample predictor implementation, we do not leverage commit information
 void notify_instr_commit(uint64_t seq_no, uint8_t piece, uint64_t pc, const bool pred_dir, const ExecuteInfo& _exec_info, const uint64_t commit_cycle)
 {
+    HOOK_PROFILE_SCOPE(HOOK_COMMIT);
 }
 
 //
@@ -175,4 +182,5 @@ void endCondDirPredictor ()
 {
     cbp2016_tage_sc_l.terminate();
     cond_predictor_impl.terminate();
+    HOOK_PROFILE_DUMP();
 }
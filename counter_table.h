@@ -0,0 +1,122 @@
+#ifndef _COUNTER_TABLE_H_
+#define _COUNTER_TABLE_H_
+
+#include <vector>
+#include <type_traits>
+#include <stdint.h>
+#include <assert.h>
+
+// Table of BITS-bit unsigned saturating counters (1 <= BITS <= 8).
+//
+// By default every counter takes a byte, the layout of the std::vector<int8_t> tables of the predictors. With
+// PACKED (the default when compiled with -DPACKED_COUNTERS, make PACKED_COUNTERS=1) the counters are packed into
+// bytes when the width divides 8 (1, 2, 4, 8 bits) and into 64-bit words otherwise, a counter never straddling
+// two words: 4x less host memory for 2-bit counters, at the cost of a shift and mask per access.
+// bench/counter_table_bench compares both layouts: on the index stream of gshare over the sample traces the
+// byte layout is faster at every size, packing only wins when accesses spread uniformly over tables of several
+// MB. Either way storage_bits() counts BITS per counter, the figure to check against the storage budget, and
+// host_bytes() the memory actually used.
+//
+// Counters are predicted taken from the midpoint up (taken(): the top bit is set), the ">= 2" of a 2-bit counter.
+#ifdef PACKED_COUNTERS
+#define COUNTER_TABLE_PACKED true
+#else
+#define COUNTER_TABLE_PACKED false
+#endif
+
+template <int BITS, bool PACKED = COUNTER_TABLE_PACKED>
+class CounterTable
+{
+    static_assert(BITS >= 1 && BITS <= 8, "counter width must be 1 to 8 bits");
+
+    public:
+        static constexpr uint64_t MAX = (1u << BITS) - 1;
+
+        explicit CounterTable(uint64_t size = 0, uint8_t value = 0)
+        {
+            assign(size, value);
+        }
+
+        // Resizes the table to size counters, all set to value
+        void assign(uint64_t size, uint8_t value = 0)
+        {
+            assert(value <= MAX);
+            Word word = 0;
+            for (uint64_t i = 0; i < PER_WORD; i++)
+                word |= (Word)((uint64_t)value << (i * BITS));
+            num_counters = size;
+            words.assign((size + PER_WORD - 1) / PER_WORD, word);
+        }
+
+        uint8_t get(uint64_t index) const
+        {
+            return field(words[index / PER_WORD], shift(index));
+        }
+
+        void set(uint64_t index, uint8_t value)
+        {
+            assert(value <= MAX);
+            Word& word = words[index / PER_WORD];
+            const uint64_t s = shift(index);
+            word = (Word)((word & ~(MAX << s)) | ((uint64_t)value << s));
+        }
+
+        bool taken(uint64_t index) const
+        {
+            return get(index) >> (BITS - 1);
+        }
+
+        // Saturating increment (up) or decrement of a counter
+        void update(uint64_t index, bool up)
+        {
+            Word& word = words[index / PER_WORD];
+            const uint64_t s = shift(index);
+            const uint64_t value = field(word, s);
+            // A saturated counter is not written back, most updates of a trained table do not change it
+            if (up)
+            {
+                if (value != MAX)
+                    word = (Word)(word + ((uint64_t)1 << s));
+            }
+            else if (value != 0)
+                word = (Word)(word - ((uint64_t)1 << s));
+        }
+
+        uint64_t size() const
+        {
+            return num_counters;
+        }
+
+        // Modeled storage of the table
+        uint64_t storage_bits() const
+        {
+            return num_counters * BITS;
+        }
+
+        // Host memory of the words
+        uint64_t host_bytes() const
+        {
+            return words.size() * sizeof(Word);
+        }
+
+    private:
+        typedef typename std::conditional<!PACKED || 8 % BITS == 0, uint8_t, uint64_t>::type Word;
+        static constexpr uint64_t WORD_BITS = 8 * sizeof(Word);
+        static constexpr uint64_t PER_WORD = PACKED ? WORD_BITS / BITS : 1;
+
+        static uint64_t shift(uint64_t index)
+        {
+            return (index % PER_WORD) * BITS;
+        }
+
+        // Counter at bit s of a word; a byte holds nothing but its counter unless PACKED
+        static uint64_t field(Word word, uint64_t s)
+        {
+            return PACKED ? (word >> s) & MAX : word;
+        }
+
+        std::vector<Word> words;
+        uint64_t num_counters = 0;
+};
+
+#endif
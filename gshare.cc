@@ -13,7 +13,7 @@ GSHARE::GSHARE(int history_length, int table_size)
 
 // Inizializza le strutture dati del predittore
 void GSHARE::setup() {
-    table.resize(table_size, 0); // Inizializza i contatori a "strongly not taken"
+    table.assign(table_size, 0); // Inizializza i contatori a "strongly not taken"
 }
 
 // Funzione di cleanup (se necessaria)
@@ -38,15 +38,13 @@ int GSHARE::get_index(uint64_t pc, uint64_t ghr) const {
 bool GSHARE::predict(uint64_t seq_no, uint8_t piece, uint64_t PC, const bool tage_pred) {
     // Salva lo stato corrente della cronologia per un uso futuro nell'aggiornamento
     active_hist.tage_pred = tage_pred;
-    const uint64_t inst_id = get_unique_inst_id(seq_no, piece);
-    pred_time_histories.emplace(inst_id, active_hist);
+    pred_time_histories.emplace(seq_no, piece, active_hist);
 
     // Esegue la predizione GSHARE usando la cronologia ATTIVA
     int index = get_index(PC, active_hist.ghist);
-    int state = table[index];
 
     // La predizione è "taken" se il contatore è in uno stato di "weakly" o "strongly taken"
-    return state >= 2;
+    return table.taken(index);
 }
 
 // Aggiorna la cronologia globale "live"
@@ -62,26 +60,24 @@ void GSHARE::history_update(uint64_t seq_no, uint8_t piece, uint64_t PC, bool ta
 
 // Funzione di aggiornamento principale (interfaccia pubblica)
 void GSHARE::update(uint64_t seq_no, uint8_t piece, uint64_t PC, bool resolveDir, bool predDir, uint64_t nextPC) {
-    const auto pred_hist_key = get_unique_inst_id(seq_no, piece);
-    const auto& pred_time_history = pred_time_histories.at(pred_hist_key);
+    const auto& pred_time_history = pred_time_histories.at(seq_no, piece);
 
     // Chiama la funzione di aggiornamento interna con la cronologia salvata
     update(PC, resolveDir, predDir, nextPC, pred_time_history);
 
-    // Rimuove la voce dalla mappa poiché non è più necessaria
-    pred_time_histories.erase(pred_hist_key);
+    // Libera lo slot del buffer poiché non è più necessario
+    pred_time_histories.erase(seq_no, piece);
 }
 
 // Funzione di aggiornamento interna che contiene la logica GSHARE
 void GSHARE::update(uint64_t PC, bool resolveDir, bool pred_taken, uint64_t nextPC, const SampleHist& hist_to_use) {
     // Calcola l'indice usando la cronologia salvata al momento della predizione
     int index = get_index(PC, hist_to_use.ghist);
-    int& state = table[index];
 
-    // Aggiorna il contatore a 2 bit
-    if (resolveDir) { // Il branch è stato preso (Taken)
-        if (state < 3) state++;
-    } else { // Il branch non è stato preso (Not Taken)
-        if (state > 0) state--;
-    }
+    // Aggiorna il contatore a 2 bit: incrementa se preso (Taken), decrementa altrimenti
+    table.update(index, resolveDir);
+}
+
+uint64_t GSHARE::storage_bits() const {
+    return table.storage_bits() + history_length;
 }
\ No newline at end of file
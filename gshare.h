@@ -3,7 +3,8 @@
 
 #include <vector>
 #include <stdint.h>
-#include <map>      // Necessario per std::map
+#include "checkpoint_buffer.h" // Buffer circolare per i checkpoint delle cronologie
+#include "counter_table.h" // Tabella di contatori saturanti compattata
 #include <cassert>  // Necessario per assert
 
 // Struttura per salvare lo stato al momento della predizione
@@ -29,15 +30,18 @@ public:
     
     void update(uint64_t seq_no, uint8_t piece, uint64_t PC, bool resolveDir, bool predDir, uint64_t nextPC);
 
+    // Bit di stato modellati (PHT e cronologia globale), da confrontare con il budget
+    uint64_t storage_bits() const;
+
 private:
     // Membri del predittore GSHARE
-    std::vector<int> table;  // Pattern History Table (PHT) con contatori a 2 bit
+    CounterTable<2> table;  // Pattern History Table (PHT) con contatori a 2 bit
     int history_length;
     int table_size;
 
     // Strutture dati per la nuova interfaccia
     SampleHist active_hist; // Cronologia globale "live"
-    std::map<uint64_t, SampleHist> pred_time_histories; // Mappa delle cronologie salvate
+    CheckpointBuffer<SampleHist> pred_time_histories; // Cronologie salvate, indicizzate per seq_no
 
     // Metodi helper interni
     int get_index(uint64_t pc, uint64_t ghr) const;
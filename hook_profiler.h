@@ -0,0 +1,243 @@
+#ifndef _HOOK_PROFILER_H_
+#define _HOOK_PROFILER_H_
+
+// Opt-in instrumentation of the predictor hooks of cond_branch_predictor_interface.cc, compiled in with
+// -DHOOK_PROFILE (make HOOK_PROFILE=1) and free otherwise: the HOOK_PROFILE_* macros expand to nothing.
+//
+// Every call of a hook is counted, and one call in CBP_HOOK_PROFILE_PERIOD (environment, a power of two, 16 by
+// default, 1 times every call) is timed with the time stamp counter (lfence; rdtsc ... rdtscp; lfence, minus the
+// cost of the measurement itself, calibrated at begin). The timed calls go into a log2 histogram per hook, and the
+// totals are estimated from the mean of the timed calls. Ticks are converted to time with the tick rate measured
+// over the whole simulation against steady_clock, and the share of each hook is relative to the time between
+// beginCondDirPredictor() and endCondDirPredictor(), i.e. the simulation loop.
+//
+// The report is printed by endCondDirPredictor(), before the measurements of the simulator:
+//
+//   ----------...HOOK PROFILE (1/16 calls timed, 2.995 GHz ticks)...----------
+//   Hook           Calls      Timed   AvgTicks      AvgNs    TotalMs    Share   p50Ticks   p90Ticks   p99Ticks
+//   Predict       128874       8055      123.4       41.2      5.311   0.712%        128        256       1024
+//   ...
+//   ----------...----------
+//   Predict        ticks [64,128):2010 [128,256):5000 ...
+//
+// The rows are parsed by scripts/trace_exec_training_list.py into <Hook>HookCalls, <Hook>HookNs and
+// <Hook>HookShare result columns. The percentiles are the upper bound of the histogram bucket they fall in.
+
+#ifdef HOOK_PROFILE
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <stdint.h>
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#endif
+
+enum HookId
+{
+    HOOK_FETCH,
+    HOOK_PREDICT,
+    HOOK_SPEC_UPDATE,
+    HOOK_RESOLVE,
+    HOOK_COMMIT,
+    NUM_HOOKS
+};
+
+static const char* const hook_names[NUM_HOOKS] = {"Fetch", "Predict", "SpecUpdate", "Resolve", "Commit"};
+
+static inline uint64_t hook_ticks_begin()
+{
+#if defined(__x86_64__) || defined(__i386__)
+    // lfence keeps the earlier instructions out of the measured interval
+    _mm_lfence();
+    return __rdtsc();
+#elif defined(__aarch64__)
+    uint64_t ticks;
+    asm volatile("isb; mrs %0, cntvct_el0" : "=r"(ticks) :: "memory");
+    return ticks;
+#else
+    return std::chrono::steady_clock::now().time_since_epoch().count();
+#endif
+}
+
+static inline uint64_t hook_ticks_end()
+{
+#if defined(__x86_64__) || defined(__i386__)
+    // rdtscp waits for the measured instructions, lfence keeps the later ones out
+    unsigned int aux;
+    const uint64_t ticks = __rdtscp(&aux);
+    _mm_lfence();
+    return ticks;
+#else
+    return hook_ticks_begin();
+#endif
+}
+
+class HookProfiler
+{
+    public:
+        static const int NUM_BUCKETS = 64;
+
+        struct Hook
+        {
+            uint64_t calls = 0;
+            uint64_t timed = 0;
+            uint64_t ticks = 0;
+            uint64_t histogram[NUM_BUCKETS] = {};
+        };
+
+        void begin()
+        {
+            uint64_t period = 16;
+            if (const char* env = getenv("CBP_HOOK_PROFILE_PERIOD"))
+                period = strtoull(env, nullptr, 0);
+            uint64_t size = 1;
+            while (size < period)
+                size <<= 1;
+            period_mask = size - 1;
+
+            // Cost of an empty measurement, the minimum of many so an interrupt does not inflate it
+            overhead = UINT64_MAX;
+            for (int i = 0; i < 1000; i++)
+            {
+                const uint64_t start = hook_ticks_begin();
+                const uint64_t ticks = hook_ticks_end() - start;
+                overhead = ticks < overhead ? ticks : overhead;
+            }
+
+            begin_ticks = hook_ticks_begin();
+            begin_time = std::chrono::steady_clock::now();
+        }
+
+        // Counts the call, true if it is to be timed
+        inline bool count(HookId id)
+        {
+            return (hooks[id].calls++ & period_mask) == 0;
+        }
+
+        inline void record(HookId id, uint64_t ticks)
+        {
+            Hook& hook = hooks[id];
+            ticks = ticks > overhead ? ticks - overhead : 0;
+            hook.timed++;
+            hook.ticks += ticks;
+            const int bucket = ticks ? 64 - __builtin_clzll(ticks) : 0;
+            hook.histogram[bucket < NUM_BUCKETS ? bucket : NUM_BUCKETS - 1]++;
+        }
+
+        void dump() const
+        {
+            const uint64_t end_ticks = hook_ticks_end();
+            const double seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - begin_time).count();
+            const double ticks_per_ns = seconds > 0 ? (double)(end_ticks - begin_ticks) / (seconds * 1e9) : 0.0;
+
+            printf("\n---------------------------------------HOOK PROFILE (1/%lu calls timed, %.3f GHz ticks)---------------------------------------\n",
+                   (unsigned long)(period_mask + 1), ticks_per_ns);
+            printf("%-12s %12s %10s %10s %10s %10s %8s %10s %10s %10s\n",
+                   "Hook", "Calls", "Timed", "AvgTicks", "AvgNs", "TotalMs", "Share", "p50Ticks", "p90Ticks", "p99Ticks");
+            Hook all;
+            double all_ms = 0.0;
+            for (int id = 0; id < NUM_HOOKS; id++)
+            {
+                all.calls += hooks[id].calls;
+                all.timed += hooks[id].timed;
+                all.ticks += hooks[id].ticks;
+                for (int b = 0; b < NUM_BUCKETS; b++)
+                    all.histogram[b] += hooks[id].histogram[b];
+                all_ms += print_row(hook_names[id], hooks[id], ticks_per_ns, seconds);
+            }
+            // Sum of the estimated totals of the hooks, so AvgTicks is weighted by the call counts
+            const double avg_ticks = all.calls ? all_ms * 1e6 * ticks_per_ns / (double)all.calls : 0.0;
+            printf("%-12s %12lu %10lu %10.1f %10.1f %10.3f %7.3f%% %10lu %10lu %10lu\n", "All",
+                   (unsigned long)all.calls, (unsigned long)all.timed, avg_ticks, ticks_per_ns > 0 ? avg_ticks / ticks_per_ns : 0.0,
+                   all_ms, seconds > 0 ? all_ms / (10.0 * seconds) : 0.0,
+                   (unsigned long)percentile(all, 0.5), (unsigned long)percentile(all, 0.9), (unsigned long)percentile(all, 0.99));
+            printf("---------------------------------------------------------------------------------------------------------------------------------------------------\n");
+            for (int id = 0; id < NUM_HOOKS; id++)
+            {
+                if (!hooks[id].timed)
+                    continue;
+                printf("%-12s ticks", hook_names[id]);
+                for (int b = 0; b < NUM_BUCKETS; b++)
+                {
+                    if (hooks[id].histogram[b])
+                        printf(" [%lu,%lu):%lu", (unsigned long)bucket_low(b), (unsigned long)bucket_low(b + 1), (unsigned long)hooks[id].histogram[b]);
+                }
+                printf("\n");
+            }
+        }
+
+    private:
+        // Bucket 0 holds 0 ticks, bucket b >= 1 holds [2^(b-1), 2^b)
+        static uint64_t bucket_low(int b)
+        {
+            return b ? (uint64_t)1 << (b - 1) : 0;
+        }
+
+        static uint64_t percentile(const Hook& hook, double fraction)
+        {
+            uint64_t seen = 0;
+            for (int b = 0; b < NUM_BUCKETS; b++)
+            {
+                seen += hook.histogram[b];
+                if (hook.timed && (double)seen >= fraction * (double)hook.timed)
+                    return bucket_low(b + 1);
+            }
+            return 0;
+        }
+
+        // Prints the row of a hook, returns its estimated total time in ms
+        static double print_row(const char* name, const Hook& hook, double ticks_per_ns, double seconds)
+        {
+            const double avg_ticks = hook.timed ? (double)hook.ticks / (double)hook.timed : 0.0;
+            const double avg_ns = ticks_per_ns > 0 ? avg_ticks / ticks_per_ns : 0.0;
+            const double total_ms = avg_ns * (double)hook.calls * 1e-6;
+            printf("%-12s %12lu %10lu %10.1f %10.1f %10.3f %7.3f%% %10lu %10lu %10lu\n", name,
+                   (unsigned long)hook.calls, (unsigned long)hook.timed, avg_ticks, avg_ns, total_ms,
+                   seconds > 0 ? total_ms / (10.0 * seconds) : 0.0,
+                   (unsigned long)percentile(hook, 0.5), (unsigned long)percentile(hook, 0.9), (unsigned long)percentile(hook, 0.99));
+            return total_ms;
+        }
+
+        Hook hooks[NUM_HOOKS];
+        uint64_t period_mask = 15;
+        uint64_t overhead = 0;
+        uint64_t begin_ticks = 0;
+        std::chrono::steady_clock::time_point begin_time;
+};
+
+static HookProfiler hook_profiler;
+
+// Times the enclosing scope if the call is sampled
+class HookProfileScope
+{
+    public:
+        explicit HookProfileScope(HookId id) : id(id), timed(hook_profiler.count(id)), start(timed ? hook_ticks_begin() : 0)
+        {
+        }
+
+        ~HookProfileScope()
+        {
+            if (timed)
+                hook_profiler.record(id, hook_ticks_end() - start);
+        }
+
+    private:
+        const HookId id;
+        const bool timed;
+        const uint64_t start;
+};
+
+#define HOOK_PROFILE_BEGIN() hook_profiler.begin()
+#define HOOK_PROFILE_SCOPE(id) HookProfileScope hook_profile_scope(id)
+#define HOOK_PROFILE_DUMP() hook_profiler.dump()
+
+#else
+
+#define HOOK_PROFILE_BEGIN()
+#define HOOK_PROFILE_SCOPE(id)
+#define HOOK_PROFILE_DUMP()
+
+#endif // HOOK_PROFILE
+
+#endif // _HOOK_PROFILER_H_
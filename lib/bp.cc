@@ -28,6 +28,7 @@ THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #include <iostream>
 #include <numeric>
 #include <cstdlib>
+#include "stats_json.h"
 #include "sim_common_structs.h"
 #include "bp.h"
 #include "cbp.h"
@@ -370,3 +371,128 @@ void bp_t::output_periodic_info(const std::vector<uint64_t>&num_insts_per_epoch,
       printf("------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n");
    }
 }
+
+void bp_t::output_direction_only(const std::vector<uint64_t>&num_insts_per_epoch)
+{
+   const uint64_t total_instr = std::accumulate(num_insts_per_epoch.begin(), num_insts_per_epoch.end(), (uint64_t)0);
+   const struct { const char *title; uint64_t target_instr_count; } windows[] = {
+      {"---------------------------------------------DIRECTION-ONLY CONDITIONAL BRANCH PREDICTION MEASUREMENTS (50 Perc instructions)---------------------------------------------", total_instr/2},
+      {"----------------------------DIRECTION-ONLY CONDITIONAL BRANCH PREDICTION MEASUREMENTS (Full Simulation i.e. Counts Not Reset When Warmup Ends)----------------------------", total_instr},
+   };
+   for (const auto& window : windows)
+   {
+      printf("\n%s\n", window.title);
+      printf("       Instr      NumBr     MispBr        MR     MPKI\n");
+      uint64_t my_instr_count = 0;
+      uint64_t my_br_count = 0;
+      uint64_t my_br_mispred_count = 0;
+      for(int epoch_index = num_insts_per_epoch.size() -1; epoch_index >= 0; epoch_index--)
+      {
+           my_instr_count       += num_insts_per_epoch.at(epoch_index);
+           my_br_count          += meas_conddir_n_per_epoch.at(epoch_index);
+           my_br_mispred_count  += meas_conddir_m_per_epoch.at(epoch_index);
+           if(my_instr_count > window.target_instr_count)
+           {
+               break;
+           }
+      }
+      printf("%12ld %10ld %10ld %8.4lf%% %8.4lf\n", my_instr_count, my_br_count, my_br_mispred_count, 100.0*((double)(my_br_mispred_count)/(double)(my_br_count)), 1000.0*((double)(my_br_mispred_count)/(double)(my_instr_count)));
+      printf("------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n");
+   }
+
+   if(PRINT_PER_EPOCH_STATS)
+   {
+      printf("EPOCH COUNT  = %lu\n", num_insts_per_epoch.size());
+      printf("\n--------------------------------------------------------DIRECTION-ONLY CONDITIONAL BRANCH PREDICTION PER EPOCH MEASUREMENTS-------------------------------------------------------\n");
+      printf("EPOCH       Instr      NumBr     MispBr        MR     MPKI\n");
+      for(uint64_t epoch_index = 0; epoch_index < num_insts_per_epoch.size(); epoch_index++)
+      {
+           const uint64_t my_instr_count = num_insts_per_epoch.at(epoch_index);
+           const uint64_t my_br_count = meas_conddir_n_per_epoch.at(epoch_index);
+           const uint64_t my_br_mispred_count = meas_conddir_m_per_epoch.at(epoch_index);
+           printf("%5ld %12ld %10ld %10ld %8.4lf%% %8.4lf\n", epoch_index, my_instr_count, my_br_count, my_br_mispred_count, 100.0*((double)(my_br_mispred_count)/(double)(my_br_count)), 1000.0*((double)(my_br_mispred_count)/(double)(my_instr_count)));
+      }
+      printf("------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n");
+   }
+}
+
+// Conditional branch measurements of the last epochs covering more than target_instr_count instructions
+// (accumulated from the last epoch backwards, like output_periodic_info).
+static void output_json_cond_dir_window(FILE *f, const char *name, const uint64_t target_instr_count,
+                                        const std::vector<uint64_t>&num_insts_per_epoch, const std::vector<uint64_t>&num_cycles_per_epoch,
+                                        const std::vector<uint64_t>&meas_conddir_n_per_epoch, const std::vector<uint64_t>&meas_conddir_m_per_epoch,
+                                        const std::vector<uint64_t>&meas_cycles_on_wrong_path_per_epoch)
+{
+   uint64_t my_instr_count = 0;
+   uint64_t my_cycle_count = 0;
+   uint64_t my_br_count = 0;
+   uint64_t my_br_mispred_count = 0;
+   uint64_t my_wpc_count = 0;
+   for(int epoch_index = num_insts_per_epoch.size() -1; epoch_index >= 0; epoch_index--)
+   {
+        my_instr_count       += num_insts_per_epoch.at(epoch_index);
+        my_cycle_count       += num_cycles_per_epoch.at(epoch_index);
+        my_br_count          += meas_conddir_n_per_epoch.at(epoch_index);
+        my_br_mispred_count  += meas_conddir_m_per_epoch.at(epoch_index);
+        my_wpc_count         += meas_cycles_on_wrong_path_per_epoch.at(epoch_index);
+        if(my_instr_count > target_instr_count)
+        {
+            break;
+        }
+   }
+   fprintf(f, "    \"%s\": {\"Instr\": %" PRIu64 ", \"Cycles\": %" PRIu64 ", \"NumBr\": %" PRIu64 ", \"MispBr\": %" PRIu64 ", \"CycWP\": %" PRIu64,
+           name, my_instr_count, my_cycle_count, my_br_count, my_br_mispred_count, my_wpc_count);
+   fprintf(f, ", \"IPC\": ");          json_double(f, (double)my_instr_count/(double)my_cycle_count);
+   fprintf(f, ", \"BrPerCyc\": ");     json_double(f, (double)my_br_count/(double)my_cycle_count);
+   fprintf(f, ", \"MispBrPerCyc\": "); json_double(f, (double)my_br_mispred_count/(double)my_cycle_count);
+   fprintf(f, ", \"MR\": ");           json_double(f, 100.0*((double)my_br_mispred_count/(double)my_br_count));
+   fprintf(f, ", \"MPKI\": ");         json_double(f, 1000.0*((double)my_br_mispred_count/(double)my_instr_count));
+   fprintf(f, ", \"CycWPAvg\": ");     json_double(f, (my_br_mispred_count == 0) ? 0.00 : (double)my_wpc_count/(double)my_br_mispred_count);
+   fprintf(f, ", \"CycWPPKI\": ");     json_double(f, (double)my_wpc_count*1000/(double)my_instr_count);
+   fprintf(f, "}");
+}
+
+void bp_t::output_json(FILE *f, const uint64_t num_inst, const std::vector<uint64_t>&num_insts_per_epoch, const std::vector<uint64_t>&num_cycles_per_epoch)
+{
+   assert(num_insts_per_epoch.size() == num_cycles_per_epoch.size());
+   const struct { const char *name; const std::vector<uint64_t>& n; const std::vector<uint64_t>* m; } types[] = {
+      {"CondDirect",   meas_conddir_n_per_epoch, &meas_conddir_m_per_epoch},
+      {"JumpDirect",   meas_jumpdir_n_per_epoch, nullptr},
+      {"JumpIndirect", meas_jumpind_n_per_epoch, &meas_jumpind_m_per_epoch},
+      {"JumpReturn",   meas_jumpret_n_per_epoch, &meas_jumpret_m_per_epoch},
+      {"NotControl",   meas_notctrl_n_per_epoch, &meas_notctrl_m_per_epoch},
+   };
+   fprintf(f, "  \"branch\": {\n");
+   for (size_t i = 0; i < sizeof(types)/sizeof(types[0]); i++)
+   {
+      const uint64_t n = std::accumulate(types[i].n.begin(), types[i].n.end(), (uint64_t)0);
+      const uint64_t m = types[i].m ? std::accumulate(types[i].m->begin(), types[i].m->end(), (uint64_t)0) : 0;
+      fprintf(f, "    \"%s\": {\"NumBr\": %" PRIu64 ", \"MispBr\": %" PRIu64 ", \"MR\": ", types[i].name, n, m);
+      json_double(f, 100.0*((double)m/(double)n));
+      fprintf(f, ", \"MPKI\": ");
+      json_double(f, 1000.0*((double)m/(double)num_inst));
+      fprintf(f, "}%s\n", (i + 1 < sizeof(types)/sizeof(types[0])) ? "," : "");
+   }
+   fprintf(f, "  },\n");
+
+   const uint64_t total_instr = std::accumulate(num_insts_per_epoch.begin(), num_insts_per_epoch.end(), (uint64_t)0);
+   const struct { const char *name; uint64_t target_instr_count; } windows[] = {
+      {"Last10M", 10000000}, {"Last25M", 25000000}, {"50Perc", total_instr/2}, {"Full", total_instr},
+   };
+   fprintf(f, "  \"cond_dir\": {\n");
+   for (size_t i = 0; i < sizeof(windows)/sizeof(windows[0]); i++)
+   {
+      output_json_cond_dir_window(f, windows[i].name, windows[i].target_instr_count, num_insts_per_epoch, num_cycles_per_epoch,
+                                  meas_conddir_n_per_epoch, meas_conddir_m_per_epoch, meas_cycles_on_wrong_path_per_epoch);
+      fprintf(f, "%s\n", (i + 1 < sizeof(windows)/sizeof(windows[0])) ? "," : "");
+   }
+   fprintf(f, "  },\n");
+
+   fprintf(f, "  \"epochs\": {\n");
+   fprintf(f, "    \"Instr\": ");  json_array(f, num_insts_per_epoch);                 fprintf(f, ",\n");
+   fprintf(f, "    \"Cycles\": "); json_array(f, num_cycles_per_epoch);                fprintf(f, ",\n");
+   fprintf(f, "    \"NumBr\": ");  json_array(f, meas_conddir_n_per_epoch);            fprintf(f, ",\n");
+   fprintf(f, "    \"MispBr\": "); json_array(f, meas_conddir_m_per_epoch);            fprintf(f, ",\n");
+   fprintf(f, "    \"CycWP\": ");  json_array(f, meas_cycles_on_wrong_path_per_epoch); fprintf(f, "\n");
+   fprintf(f, "  }");
+}
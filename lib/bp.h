@@ -109,6 +109,10 @@ public:
     // Output all branch prediction measurements.
     void output(const uint64_t num_inst);
     void output_periodic_info(const std::vector<uint64_t>&num_insts_per_epoch, const std::vector<uint64_t>&num_cycles_per_epoch);
+    // Same measurements as output()/output_periodic_info() (all windows and all epochs) as JSON members of the stats file.
+    void output_json(FILE *f, const uint64_t num_inst, const std::vector<uint64_t>&num_insts_per_epoch, const std::vector<uint64_t>&num_cycles_per_epoch);
+    // Direction-only mode (dirsim_t): conditional branch measurements without the timing columns.
+    void output_direction_only(const std::vector<uint64_t>&num_insts_per_epoch);
     void notify_begin_new_epoch();
     void update_cycles_on_wrong_path(const uint64_t cycles_on_wrong_path);
 };
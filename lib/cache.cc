@@ -28,6 +28,7 @@ THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #include <stdio.h>
 #include "parameters.h"
 #include "cache.h"
+#include "stats_json.h"
 
 
 cache_t::cache_t(uint64_t size, uint64_t assoc, uint64_t blocksize, uint64_t latency, cache_t *next_level) {
@@ -148,3 +149,11 @@ void cache_t::stats() {
    printf("\tpf misses     = %lu\n", pf_misses);
    printf("\tpf miss ratio = %.2f%%\n", 100.0*((double)pf_misses/(double)pf_accesses));
 }
+
+void cache_t::stats_json(FILE *f) {
+   fprintf(f, "{\"accesses\": %" PRIu64 ", \"misses\": %" PRIu64 ", \"miss_ratio\": ", accesses, misses);
+   json_double(f, 100.0*((double)misses/(double)accesses));
+   fprintf(f, ", \"pf_accesses\": %" PRIu64 ", \"pf_misses\": %" PRIu64 ", \"pf_miss_ratio\": ", pf_accesses, pf_misses);
+   json_double(f, 100.0*((double)pf_misses/(double)pf_accesses));
+   fprintf(f, "}");
+}
@@ -21,6 +21,7 @@ THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 // Author: Eric Rotenberg (ericro@ncsu.edu)
 
+#include <stdio.h>
 
 struct block_t {
     bool valid;
@@ -63,4 +64,5 @@ public:
     uint64_t access(uint64_t cycle, bool read, uint64_t addr, bool pf = false);
     bool is_hit(uint64_t cycle, uint64_t addr) const;
     void stats();
+    void stats_json(FILE *f);
 };
@@ -27,6 +27,9 @@ THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #include <inttypes.h>
 #include <assert.h>
 #include <string.h>
+#include <algorithm>
+#include <chrono>
+#include <string>
 #include "cbp.h"
 #include "trace_reader.h"
 #include "fifo.h"
@@ -34,9 +37,12 @@ THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #include "bp.h"
 #include "resource_schedule.h"
 #include "uarchsim.h"
+#include "dirsim.h"
 #include "parameters.h"
+#include "stats_json.h"
 
 uarchsim_t *sim;
+dirsim_t *dsim;
 
 int parseargs(int argc, char ** argv) 
 {
@@ -60,6 +66,11 @@ int parseargs(int argc, char ** argv)
      //   PERFECT_INDIRECT_PRED = true;
      //   i++;
      //}
+     else if (!strcmp(argv[i], "-B"))
+     {
+        DIRECTION_ONLY = true;
+        i++;
+     }
      else if (!strcmp(argv[i], "-P"))
      {
         PREFETCHER_ENABLE = true;
@@ -229,6 +240,43 @@ int parseargs(int argc, char ** argv)
            exit(0);
         }
      }
+     else if (!strcmp(argv[i], "-t"))
+     {
+        i++;
+        if (i < argc)
+        {
+           uint64_t sample_period;
+           if (sscanf(argv[i], "%lu", &sample_period) == 1)
+           {
+              TIME_SAMPLE_PERIOD = sample_period;
+           }
+           else
+           {
+              printf("Usage: missing time sample period: -t <sample_period>\n");
+              exit(0);
+           }
+           i++;
+        }
+        else
+        {
+           printf("Usage: missing time sample period: -t <sample_period>\n");
+           exit(0);
+        }
+     }
+     else if (!strcmp(argv[i], "-S"))
+     {
+        i++;
+        if (i < argc)
+        {
+           STATS_FILE = argv[i];
+           i++;
+        }
+        else
+        {
+           printf("Usage: missing stats file: -S <stats_file.json>\n");
+           exit(0);
+        }
+     }
      else if (!strcmp(argv[i], "-w"))
      {
         i++;
@@ -259,6 +307,7 @@ int parseargs(int argc, char ** argv)
              //"\t[optional: -p to enable perfect value prediction (if -v also specified)]\n",
              "\t[optional: -d to enable perfect data cache]\n"
              "\t[optional: -b to enable perfect branch prediction (all branch types)]\n"
+             "\t[optional: -B for direction-only simulation: branch measurements only, no timing model (ignores -d -P -M -A -F -I -D -w)]\n"
              // "\t[optional: -i to enable perfect indirect-branch prediction]\n"
              "\t[optional: -P to enable stride prefetcher in L1D]\n"
              // "\t[optional: -f <pipeline_fill_latency>]\n"
@@ -269,18 +318,45 @@ int parseargs(int argc, char ** argv)
              "\t[optional: -D <log2_L1_size>,<L1_assoc>,<L1_blocksize>,<L1_latency>,<log2_L2_size>,<L2_assoc>,<L2_blocksize>,<L2_latency>,<log2_L3_size>,<L3_assoc>,<L3_blocksize>,<L3_latency>,<main_memory_latency>]\n"
              "\t[optional: -w <window_size>]\n"
              "\t[optional: -E <epoch_size_insts> to enable dumping per-epoch conditional branch info\n"
+             "\t[optional: -t <sample_period> to time one in N uarch steps/trace reads (and every gzread) and print a simulator time breakdown\n"
+             "\t[optional: -S <stats_file.json> to also write all measurements to a JSON file\n"
              "\t[REQUIRED: .gz trace file]\n", argv[0]);
      exit(0);
   }
 }
 
+// Cost of a steady_clock read, the minimum of many so an interrupt does not inflate it
+static double calibrate_timer_overhead()
+{
+  double overhead = 1.0;
+  for (int i = 0; i < 1000; i++)
+  {
+     const auto begin = std::chrono::steady_clock::now();
+     overhead = std::min(overhead, std::chrono::duration<double>(std::chrono::steady_clock::now() - begin).count());
+  }
+  return overhead;
+}
+
+// Steps until the next timed one: uniform in [1, 2 * period - 1], period on average (xorshift64)
+static uint64_t next_sample_gap(uint64_t &state, uint64_t period)
+{
+  state ^= state << 13;
+  state ^= state >> 7;
+  state ^= state << 17;
+  return 1 + state % (2 * period - 1);
+}
+
 int main(int argc, char ** argv)
 {
   int i = parseargs(argc, argv);
-  TraceReader reader(argv[i]);
+  const char *trace_name = argv[i];
+  TraceReader reader(trace_name);
 
   // Need to create simulator after parsing arguments (for global parameters).
-  sim = new uarchsim_t;
+  if (DIRECTION_ONLY)
+     dsim = new dirsim_t;
+  else
+     sim = new uarchsim_t;
  
   // Get to next (optional) argument after trace filename.
   i++;
@@ -295,6 +371,21 @@ int main(int argc, char ** argv)
   //   beginCondDirPredictor(0, (char **)NULL);
   beginCondDirPredictor();
 
+  // Sampled simulator time breakdown (-t): trace read (gzstream decompression + decode) vs. uarch model.
+  // Decompression is timed on every gzread(). Steps are sampled once per TIME_SAMPLE_PERIOD on average,
+  // after a warm-up (cold caches, first inflate) and with random gaps, so periodic code cannot alias with
+  // the samples. The cost of a clock read, calibrated here, is subtracted from every sampled interval.
+  const uint64_t time_sample_warmup = 1000;
+  gz::gzstreambuf::timed = TIME_SAMPLE_PERIOD != 0;
+  uint64_t sample_rng = 0x9e3779b97f4a7c15ULL;
+  uint64_t next_sample = time_sample_warmup + (TIME_SAMPLE_PERIOD ? next_sample_gap(sample_rng, TIME_SAMPLE_PERIOD) : 0);
+  const double timer_overhead = TIME_SAMPLE_PERIOD ? calibrate_timer_overhead() : 0.0;
+  uint64_t num_steps = 0;
+  uint64_t num_sampled_steps = 0;
+  double sampled_step_seconds = 0.0;
+  double sampled_decode_seconds = 0.0;
+  const auto loop_begin = std::chrono::steady_clock::now();
+
   db_t *inst = reader.get_inst(); 
 
   //bool dump_activity = true;
@@ -308,7 +399,27 @@ int main(int argc, char ** argv)
       //    dump_activity = false;
       //}
 
-      sim->step(inst);
+      if (TIME_SAMPLE_PERIOD && num_steps == next_sample)
+      {
+         const double decompress_before = gz::gzstreambuf::read_seconds;
+         const auto step_begin = std::chrono::steady_clock::now();
+         if (dsim) dsim->step(inst); else sim->step(inst);
+         const auto step_end = std::chrono::steady_clock::now();
+         delete inst;
+         inst = reader.get_inst();
+         const auto read_end = std::chrono::steady_clock::now();
+         // The decompression of a read is timed exactly by gzstream, only the decode is sampled
+         const double decode_seconds = std::chrono::duration<double>(read_end - step_end).count() - (gz::gzstreambuf::read_seconds - decompress_before);
+         sampled_step_seconds += std::max(std::chrono::duration<double>(step_end - step_begin).count() - timer_overhead, 0.0);
+         sampled_decode_seconds += std::max(decode_seconds - timer_overhead, 0.0);
+         num_sampled_steps++;
+         next_sample += next_sample_gap(sample_rng, TIME_SAMPLE_PERIOD);
+         num_steps++;
+         continue;
+      }
+      num_steps++;
+
+      if (dsim) dsim->step(inst); else sim->step(inst);
 
       //const uint64_t next_fetch_cycle = sim->get_current_fetch_cycle();
       //if(logging_activated && next_fetch_cycle != current_fetch_cycle)
@@ -321,7 +432,61 @@ int main(int argc, char ** argv)
       inst = reader.get_inst();
   }
 
+  const double loop_seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - loop_begin).count();
+
   endPredictor();
   endCondDirPredictor();
-  sim->output();
+  if (dsim) dsim->output(); else sim->output();
+
+  const bool time_sampled = TIME_SAMPLE_PERIOD && num_sampled_steps;
+  const double step_seconds = time_sampled ? sampled_step_seconds * (double)num_steps / (double)num_sampled_steps : 0.0;
+  const double decompress_seconds = gz::gzstreambuf::read_seconds;
+  const double read_seconds = decompress_seconds + (time_sampled ? sampled_decode_seconds * (double)num_steps / (double)num_sampled_steps : 0.0);
+  // The step estimates carry sampling noise: the shares are scaled down when the parts exceed the loop
+  const double share_scale = 100.0 / std::max(loop_seconds, step_seconds + read_seconds);
+  const double uarch_share = step_seconds * share_scale;
+  const double read_share = read_seconds * share_scale;
+  const double decompress_share = decompress_seconds * share_scale;
+  if (time_sampled)
+  {
+     printf("\n---------------------------------------SIMULATOR TIME BREAKDOWN (Steps sampled 1/%lu, estimated totals)---------------------------------------\n", TIME_SAMPLE_PERIOD);
+     printf("SimLoopTime      = %.4f s\n", loop_seconds);
+     printf("UarchTime        = %.4f s\n", step_seconds);
+     printf("TraceReadTime    = %.4f s\n", read_seconds);
+     printf("DecompressTime   = %.4f s\n", decompress_seconds);
+     printf("UarchShare       = %.4f%%\n", uarch_share);
+     printf("TraceReadShare   = %.4f%%\n", read_share);
+     printf("DecompressShare  = %.4f%%\n", decompress_share);
+     printf("---------------------------------------------------------------------------------------------------------------------------------------------------\n");
+  }
+
+  if (STATS_FILE)
+  {
+     // Written to a temporary file and renamed, so a reader never sees a partial stats file
+     const std::string tmp_stats_file = std::string(STATS_FILE) + ".tmp";
+     FILE *f = fopen(tmp_stats_file.c_str(), "w");
+     if (!f)
+     {
+        printf("Could not open stats file %s\n", tmp_stats_file.c_str());
+        exit(1);
+     }
+     fprintf(f, "{\n  \"trace\": ");
+     json_string(f, trace_name);
+     fprintf(f, ",\n");
+     if (dsim) dsim->output_json(f); else sim->output_json(f);
+     if (time_sampled)
+     {
+        fprintf(f, ",\n  \"time_breakdown\": {\"SimLoopTime\": ");  json_double(f, loop_seconds);
+        fprintf(f, ", \"UarchTime\": ");       json_double(f, step_seconds);
+        fprintf(f, ", \"TraceReadTime\": ");   json_double(f, read_seconds);
+        fprintf(f, ", \"DecompressTime\": ");  json_double(f, decompress_seconds);
+        fprintf(f, ", \"UarchShare\": ");      json_double(f, uarch_share);
+        fprintf(f, ", \"TraceReadShare\": ");  json_double(f, read_share);
+        fprintf(f, ", \"DecompressShare\": "); json_double(f, decompress_share);
+        fprintf(f, "}");
+     }
+     fprintf(f, "\n}\n");
+     fclose(f);
+     rename(tmp_stats_file.c_str(), STATS_FILE);
+  }
 }
@@ -0,0 +1,86 @@
+#include <stdio.h>
+#include <inttypes.h>
+#include <assert.h>
+#include "value_predictor_interface.h"
+#include "trace_reader.h"
+#include "fifo.h"
+#include "cache.h"
+#include "bp.h"
+#include "cbp.h"
+#include "resource_schedule.h"
+#include "uarchsim.h"
+#include "dirsim.h"
+#include "parameters.h"
+#include "stats_json.h"
+
+dirsim_t::dirsim_t()
+{
+   num_inst = 0;
+   num_uop = 0;
+
+   num_insts_per_epoch.clear();
+   num_insts_per_epoch.emplace_back(0);
+   BP.notify_begin_new_epoch();
+}
+
+void dirsim_t::step(db_t *inst)
+{
+   // Determine which piece of the instruction this is (same numbering as uarchsim_t::step).
+   static uint8_t piece = UINT8_MAX;
+   piece = (piece == UINT8_MAX) ? 0 : (piece + 1);
+
+   const uint64_t seq_no = num_uop;
+   num_uop++;
+   num_inst += inst->is_last_piece;
+
+   populate_exec_info(inst, _current_execute_info);
+
+   notify_instr_fetch(seq_no, piece, inst->pc, seq_no);
+
+   bool pred_taken = false;
+   const bool br_mispred = BP.predict(seq_no, piece, inst->insn_class, inst->pc, inst->next_pc, seq_no);
+   if (is_br(inst->insn_class))
+   {
+      assert(is_cond_br(inst->insn_class) || _current_execute_info.taken.value());
+      pred_taken = is_cond_br(inst->insn_class) ? (br_mispred != _current_execute_info.taken.value()) : true;
+   }
+
+   notify_instr_decode(seq_no, piece, inst->pc, _current_execute_info.dec_info, seq_no);
+   if (inst->is_load || inst->is_store)
+   {
+      notify_agen_complete(seq_no, piece, inst->pc, _current_execute_info.dec_info, _current_execute_info.mem_va.value(), _current_execute_info.mem_sz.value(), seq_no);
+   }
+   notify_instr_execute_resolve(seq_no, piece, inst->pc, pred_taken, _current_execute_info, seq_no);
+   notify_instr_commit(seq_no, piece, inst->pc, pred_taken, _current_execute_info, seq_no);
+
+   if (inst->is_last_piece)
+   {
+      piece = UINT8_MAX;
+   }
+
+   num_insts_per_epoch.back() += inst->is_last_piece;
+   if (num_insts_per_epoch.back() == EPOCH_SIZE_INSTS)
+   {
+      num_insts_per_epoch.emplace_back(0);
+      BP.notify_begin_new_epoch();
+   }
+}
+
+void dirsim_t::output()
+{
+   printf("\n------------------------------------------------------------------------DIRECTION-ONLY SIMULATION (cbp -B)-------------------------------------------------------------------------\n");
+   printf("instructions = %lu\n", num_inst);
+   printf("uops         = %lu\n", num_uop);
+   BP.output(num_inst);
+   BP.output_direction_only(num_insts_per_epoch);
+}
+
+void dirsim_t::output_json(FILE *f)
+{
+   // No timing model: cycles are reported as 0, so IPC and the per-cycle rates are null and CycWP is 0.
+   fprintf(f, "  \"mode\": \"direction_only\",\n");
+   fprintf(f, "  \"config\": {\"PERFECT_INDIRECT_PRED\": %d, \"MISP_REDUCTION_PERC\": %lu, \"EPOCH_SIZE_INSTS\": %lu},\n",
+           PERFECT_INDIRECT_PRED ? 1 : 0, MISP_REDUCTION_PERC, EPOCH_SIZE_INSTS);
+   fprintf(f, "  \"ilp\": {\"instructions\": %lu, \"uops\": %lu},\n", num_inst, num_uop);
+   BP.output_json(f, num_inst, num_insts_per_epoch, std::vector<uint64_t>(num_insts_per_epoch.size(), 0));
+}
@@ -0,0 +1,35 @@
+#ifndef _DIRSIM_H
+#define _DIRSIM_H
+
+// Direction-only simulator (cbp -B): drives the predictor interface over the trace in program order,
+// without the timing model of uarchsim_t (no fetch bundles, window, caches, prefetcher or execution lanes).
+//
+// Every uop gets the same hooks as in uarchsim_t, back to back: notify_instr_fetch, then the branch
+// prediction and spec_update (bp_t::predict, so indirect branches and MISP_REDUCTION_PERC behave the same),
+// notify_instr_decode, notify_agen_complete (loads/stores), notify_instr_execute_resolve and
+// notify_instr_commit. The cycle argument of every hook is the uop's seq_no.
+//
+// Only the branch measurements are meaningful. Because each branch resolves before the next uop is
+// fetched, a predictor sees its own updates immediately, whereas in uarchsim_t a branch resolves up to a
+// window's worth of uops later (see README, "Direction-only mode").
+class dirsim_t {
+   private:
+      bp_t BP;
+
+      uint64_t num_inst;
+      uint64_t num_uop;
+
+      // Instructions for each epoch
+      std::vector<uint64_t> num_insts_per_epoch;
+
+      ExecuteInfo _current_execute_info;
+
+   public:
+      dirsim_t();
+
+      void step(db_t *inst);
+      void output();
+      void output_json(FILE *f);
+};
+
+#endif
@@ -28,6 +28,7 @@
 
 #include "./gzstream.h"
 #include <iostream>
+#include <chrono>
 #include <string.h>  // for memcpy
 
 #ifdef GZSTREAM_NAMESPACE
@@ -42,6 +43,10 @@ namespace GZSTREAM_NAMESPACE {
 // class gzstreambuf:
 // --------------------------------------
 
+bool     gzstreambuf::timed = false;
+uint64_t gzstreambuf::num_reads = 0;
+double   gzstreambuf::read_seconds = 0.0;
+
 gzstreambuf* gzstreambuf::open( const char* name, int open_mode) {
     if ( is_open())
         return (gzstreambuf*)0;
@@ -87,7 +92,15 @@ int gzstreambuf::underflow() { // used for input buffer only
         n_putback = 4;
     memcpy( buffer + (4 - n_putback), gptr() - n_putback, n_putback);
 
-    int num = gzread( file, buffer+4, bufferSize-4);
+    int num;
+    if ( timed) {
+        const auto begin = std::chrono::steady_clock::now();
+        num = gzread( file, buffer+4, bufferSize-4);
+        read_seconds += std::chrono::duration<double>(std::chrono::steady_clock::now() - begin).count();
+    }
+    else
+        num = gzread( file, buffer+4, bufferSize-4);
+    num_reads++;
     if (num <= 0) // ERROR or EOF
         return EOF;
 
@@ -32,6 +32,7 @@
 // standard C++ with new header file names and std:: namespace
 #include <iostream>
 #include <fstream>
+#include <cstdint>
 #include <zlib.h>
 
 #ifdef GZSTREAM_NAMESPACE
@@ -44,8 +45,9 @@ namespace GZSTREAM_NAMESPACE {
 
 class gzstreambuf : public std::streambuf {
 private:
-    static const int bufferSize = 47+256;    // size of data buff
-    // totals 512 bytes under g++ for igzstream at the end.
+    // 4 bytes of putback and 64 KiB of data: one gzread() per 64 KiB of decompressed trace instead of per 299 bytes
+    static const int bufferSize = 4+65536;   // size of data buff
+    // the buffer is a member, so an igzstream takes a little over 64 KiB.
 
     gzFile           file;               // file handle for compressed file
     char             buffer[bufferSize]; // data buffer
@@ -54,6 +56,12 @@ private:
 
     int flush_buffer();
 public:
+    // Optional timing of gzread() (decompression), shared by all buffers. Every call is timed: with
+    // 64 KiB per call the two clock reads are noise, and there are too few calls to sample them.
+    static bool     timed;
+    static uint64_t num_reads;
+    static double   read_seconds;
+
     gzstreambuf() : opened(0) {
         setp( buffer, buffer + (bufferSize-1));
         setg( buffer + 4,     // beginning of putback area
@@ -79,3 +79,7 @@ uint64_t MISP_REDUCTION_PERC = 0;
 
 uint64_t EPOCH_SIZE_INSTS = 1000000;
 bool PRINT_PER_EPOCH_STATS = false;
+
+uint64_t TIME_SAMPLE_PERIOD = 0;    // 0: disabled; >0: time one in N trace reads/uarch steps on average, and every decompression
+const char *STATS_FILE = nullptr;   // -S <file>: also write all measurements as JSON to this file
+bool DIRECTION_ONLY = false;        // -B: direction-only simulation (dirsim_t), no timing model
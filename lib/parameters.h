@@ -86,4 +86,8 @@ extern uint64_t MISP_REDUCTION_PERC;
 
 extern uint64_t EPOCH_SIZE_INSTS;
 extern bool PRINT_PER_EPOCH_STATS;
+
+extern uint64_t TIME_SAMPLE_PERIOD;
+extern const char *STATS_FILE;
+extern bool DIRECTION_ONLY;
 #endif
@@ -0,0 +1,43 @@
+#ifndef _STATS_JSON_H_
+#define _STATS_JSON_H_
+
+// Helpers for the machine-readable stats file (cbp -S <file>).
+// Values are written with fprintf; doubles that are not finite (e.g. a miss ratio with no accesses) become null.
+
+#include <stdio.h>
+#include <math.h>
+#include <inttypes.h>
+#include <vector>
+
+inline void json_double(FILE *f, double value)
+{
+   if (isfinite(value))
+      fprintf(f, "%.17g", value);
+   else
+      fprintf(f, "null");
+}
+
+inline void json_string(FILE *f, const char *value)
+{
+   fputc('"', f);
+   for (const char *c = value; *c; c++)
+   {
+      if (*c == '"' || *c == '\\')
+         fprintf(f, "\\%c", *c);
+      else if ((unsigned char)*c < 0x20)
+         fprintf(f, "\\u%04x", (unsigned char)*c);
+      else
+         fputc(*c, f);
+   }
+   fputc('"', f);
+}
+
+inline void json_array(FILE *f, const std::vector<uint64_t>& values)
+{
+   fputc('[', f);
+   for (size_t i = 0; i < values.size(); i++)
+      fprintf(f, "%s%" PRIu64, (i ? ", " : ""), values[i]);
+   fputc(']', f);
+}
+
+#endif
@@ -5,6 +5,8 @@
 #include <deque>
 #include <map>
 #include <algorithm>
+#include <cstdio>
+#include <cinttypes>
 //#include <optional>
 
 #define DEF_ENUM(ENUM, NAME) _DEF_ENUM(ENUM, NAME)
@@ -379,6 +381,13 @@ class StridePrefetcher
         std::cout << "Num prefetches not issued LDST contention :" << stat_put_back << std::endl;
         std::cout << "Num prefetches not issued stride 0 :" << stat_stride_zero << std::endl;
     }
+
+    void print_stats_json(FILE *f)
+    {
+        fprintf(f, "{\"trainings\": %" PRIu64 ", \"generated\": %" PRIu64 ", \"issued\": %" PRIu64 ", \"duplicate_filtered\": %" PRIu64
+                   ", \"dropped_untimely\": %" PRIu64 ", \"not_issued_ldst_contention\": %" PRIu64 ", \"not_issued_stride_zero\": %" PRIu64 "}",
+                stat_trainings, stat_generated, stat_issued, stat_duplicate_pf_filtered, stat_dropped_untimely_pf, stat_put_back, stat_stride_zero);
+    }
     private:
     std::array<RPTEntry, NUM_RPT_ENTRIES> rpt;
     uint64_t lru_info;
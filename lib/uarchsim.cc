@@ -37,6 +37,7 @@ THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #include "resource_schedule.h"
 #include "uarchsim.h"
 #include "parameters.h"
+#include "stats_json.h"
 
 //uarchsim_t::uarchsim_t():window(WINDOW_SIZE),
 uarchsim_t::uarchsim_t()
@@ -195,12 +196,13 @@ uint64_t uarchsim_t::get_load_exec_cycle(db_t *inst) const
    return exec_cycle;
 }
 
-void uarchsim_t::populate_exec_info(db_t *inst) 
+// Decode/execute information passed to the predictor hooks for a trace instruction
+// (also used by the direction-only simulator, dirsim_t).
+void populate_exec_info(const db_t *inst, ExecuteInfo& exec_info)
 {
-    _current_execute_info.reset();
+    exec_info.reset();
 
-    populate_decode_info(inst);
-    _current_execute_info.dec_info = _current_decode_info;
+    populate_decode_info(inst, exec_info.dec_info);
 
     if(is_br(inst->insn_class))
     {
@@ -209,47 +211,47 @@ void uarchsim_t::populate_exec_info(db_t *inst)
         {
             assert(branch_taken);
         }
-        _current_execute_info.taken.emplace(branch_taken);
-        //_current_execute_info.taken_target.emplace(inst->next_pc);
+        exec_info.taken.emplace(branch_taken);
+        //exec_info.taken_target.emplace(inst->next_pc);
     }
-    _current_execute_info.next_pc = inst->next_pc;
+    exec_info.next_pc = inst->next_pc;
 
     if(inst->is_load || inst->is_store)
     {
-        _current_execute_info.mem_va.emplace(inst->addr);
-        _current_execute_info.mem_sz.emplace(inst->size);
+        exec_info.mem_va.emplace(inst->addr);
+        exec_info.mem_sz.emplace(inst->size);
     }
 
     if (inst->D.valid)
     {
         assert(inst->D.log_reg < RFSIZE);
-        _current_execute_info.dst_reg_value.emplace(inst->D.value);
+        exec_info.dst_reg_value.emplace(inst->D.value);
     }
 }
 
-void uarchsim_t::populate_decode_info(db_t *inst) 
+void populate_decode_info(const db_t *inst, DecodeInfo& decode_info)
 {
-    _current_decode_info.reset();
-    _current_decode_info.insn_class = inst->insn_class;
+    decode_info.reset();
+    decode_info.insn_class = inst->insn_class;
 
     if (inst->A.valid) {
         assert(inst->A.log_reg < RFSIZE);
-        _current_decode_info.src_reg_info.push_back(inst->A.log_reg);
+        decode_info.src_reg_info.push_back(inst->A.log_reg);
     }
     if (inst->B.valid) {
         assert(inst->B.log_reg < RFSIZE);
-        _current_decode_info.src_reg_info.push_back(inst->B.log_reg);
+        decode_info.src_reg_info.push_back(inst->B.log_reg);
     }
     if (inst->C.valid) {
         assert(inst->C.log_reg < RFSIZE);
-        _current_decode_info.src_reg_info.push_back(inst->C.log_reg);
+        decode_info.src_reg_info.push_back(inst->C.log_reg);
     }
 
     // Anything to do if inst->D.log_reg != RFFLAGS
     if (inst->D.valid)
     {
         assert(inst->D.log_reg < RFSIZE);
-        _current_decode_info.dst_reg_info.emplace(inst->D.log_reg);
+        decode_info.dst_reg_info.emplace(inst->D.log_reg);
     }
 }
 
@@ -662,7 +664,7 @@ void uarchsim_t::step(db_t *inst)
      //      latency});
    //window_t (uint64_t _seq_no, uint64_t _PC, uint64_t _fetch_cycle, uint64_t _decode_cycle, uint64_t _exec_cycle, ExecuteInfo _exec_info, uint64_t _retire_cycle, uint64_t _addr, uint64_t _value, uint64_t _latency)
    const uint64_t decode_cycle = fetch_cycle+DQ_LATENCY;
-   populate_exec_info(inst);
+   populate_exec_info(inst, _current_execute_info);
    assert(fetch_cycle < exec_cycle);
    const uint64_t predict_cycle = fetch_cycle;
    window.push_back({seq_no,
@@ -913,3 +915,28 @@ void uarchsim_t::output()
    BP.output(num_inst);
    BP.output_periodic_info(num_insts_per_epoch, num_cycles_per_epoch);
 }
+
+// Writes the members of the stats file (cbp -S): configuration and the measurements printed by output().
+void uarchsim_t::output_json(FILE *f)
+{
+   fprintf(f, "  \"config\": {\"WINDOW_SIZE\": %lu, \"FETCH_WIDTH\": %lu, \"FETCH_NUM_BRANCH\": %lu, \"FETCH_STOP_AT_INDIRECT\": %d, \"FETCH_STOP_AT_TAKEN\": %d, "
+              "\"FETCH_MODEL_ICACHE\": %d, \"PERFECT_BRANCH_PRED\": %d, \"PERFECT_INDIRECT_PRED\": %d, \"PIPELINE_FILL_LATENCY\": %lu, \"NUM_LDST_LANES\": %lu, "
+              "\"NUM_ALU_LANES\": %lu, \"PREFETCHER_ENABLE\": %d, \"PERFECT_CACHE\": %d, \"WRITE_ALLOCATE\": %d, \"EPOCH_SIZE_INSTS\": %lu},\n",
+           WINDOW_SIZE, FETCH_WIDTH, FETCH_NUM_BRANCH, FETCH_STOP_AT_INDIRECT ? 1 : 0, FETCH_STOP_AT_TAKEN ? 1 : 0,
+           FETCH_MODEL_ICACHE ? 1 : 0, PERFECT_BRANCH_PRED ? 1 : 0, PERFECT_INDIRECT_PRED ? 1 : 0, PIPELINE_FILL_LATENCY, NUM_LDST_LANES,
+           NUM_ALU_LANES, PREFETCHER_ENABLE ? 1 : 0, PERFECT_CACHE ? 1 : 0, WRITE_ALLOCATE ? 1 : 0, EPOCH_SIZE_INSTS);
+   fprintf(f, "  \"store_queue\": {\"loads\": %lu, \"loads_sq_miss\": %lu, \"pfs_issued_to_mem\": %lu},\n", num_load, num_load_sqmiss, stat_pfs_issued_to_mem);
+   fprintf(f, "  \"caches\": {");
+   if (FETCH_MODEL_ICACHE) {
+      fprintf(f, "\"IC\": "); IC.stats_json(f); fprintf(f, ", ");
+   }
+   fprintf(f, "\"L1\": "); L1.stats_json(f);
+   fprintf(f, ", \"L2\": "); L2.stats_json(f);
+   fprintf(f, ", \"L3\": "); L3.stats_json(f);
+   fprintf(f, "},\n");
+   fprintf(f, "  \"prefetcher\": "); prefetcher.print_stats_json(f); fprintf(f, ",\n");
+   fprintf(f, "  \"ilp\": {\"instructions\": %lu, \"cycles\": %lu, \"CycWP\": %lu, \"IPC\": ", num_inst, cycle, cycles_on_wrong_path);
+   json_double(f, (double)num_inst/(double)cycle);
+   fprintf(f, "},\n");
+   BP.output_json(f, num_inst, num_insts_per_epoch, num_cycles_per_epoch);
+}
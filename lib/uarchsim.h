@@ -109,6 +109,9 @@ struct store_queue_t {
    uint64_t ret_cycle;  // store's commit cycle
 };
 
+void populate_exec_info(const db_t *inst, ExecuteInfo& exec_info);
+void populate_decode_info(const db_t *inst, DecodeInfo& decode_info);
+
 // Class for a microarchitectural simulator.
 
 class uarchsim_t {
@@ -176,10 +179,7 @@ class uarchsim_t {
       // Helper for oracle hit/miss information
       uint64_t get_load_exec_cycle(db_t *inst) const;
 
-      DecodeInfo _current_decode_info;
       ExecuteInfo _current_execute_info;
-      void populate_exec_info(db_t *inst); 
-      void populate_decode_info(db_t *inst); 
       const window_t& locate_entry_in_window(uint64_t seq_no, uint8_t piece) const;
       void end_current_begin_new_epoch(const bool first_epoch, const bool last_epoch, const uint64_t epoch_end_cycle);
 
@@ -194,6 +194,7 @@ class uarchsim_t {
       void eval_exec(std::ostream& activity_trace, bool& activity_observed, const uint64_t current_fetch_cycle) ;
       void eval_retire(std::ostream& activity_trace, bool& activity_observed, const uint64_t current_fetch_cycle) ;
       void output();
+      void output_json(FILE *f);
       uint64_t get_current_fetch_cycle() const;
       PredictionRequest get_value_prediction_req_for_track(uint64_t cycle, uint64_t seq_no, uint8_t piece, db_t *inst);
 };
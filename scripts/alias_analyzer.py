@@ -0,0 +1,231 @@
+import os
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import branch_stream
+
+# Aliasing of 2-bit counter tables under different index functions.
+#
+# The conditional branches of a trace are replayed through a table of 2-bit saturating counters (initialized to
+# 0, strongly not taken, as GSHARE and BHTPredictor) for every index function and table size, and through an
+# alias-free table with a private counter per context (the full (PC, history) an index function hashes). An
+# access is aliased when the previous update of its counter came from another context. Comparing the two:
+#   destructive   the private counter predicts correctly, the shared one does not
+#   constructive  the shared counter predicts correctly, the private one does not
+# so MispBr(shared) - MispBr(private) = destructive - constructive, and destructive / MispBr(shared) is the share
+# of the mispredictions caused by aliasing.
+#
+# Counters are updated right after each prediction, as in cbp -B. The counter values are computed for all
+# accesses at once: accesses are grouped by counter, and the state before every access is a segmented prefix
+# composition of the per-access update functions (see counter_predictions).
+
+NUM_STATES = 4
+
+
+def _encode(outputs):
+    """A function of the counter state, as a byte holding f(s) in bits 2s+1..2s."""
+    return sum(int(out) << (2 * state) for state, out in enumerate(outputs))
+
+
+INC = _encode([min(s + 1, NUM_STATES - 1) for s in range(NUM_STATES)])
+DEC = _encode([max(s - 1, 0) for s in range(NUM_STATES)])
+
+# APPLY[f, s] = f(s); THEN[f, g] = g(f(.)), i.e. apply f, then g
+_funcs = np.arange(256)
+APPLY = np.array([[(f >> (2 * s)) & 3 for s in range(NUM_STATES)] for f in _funcs], dtype=np.uint8)
+THEN = np.zeros((256, 256), dtype=np.uint8)
+for _state in range(NUM_STATES):
+    THEN |= APPLY[_funcs[None, :], APPLY[:, _state][:, None]] << (2 * _state)
+
+
+def group_accesses(keys):
+    """Stable order of the accesses grouped by key (tuple of arrays) and the first-of-group flag in that order."""
+    n = len(keys[0])
+    order = np.lexsort(keys[::-1])
+    same = np.ones(max(n - 1, 0), dtype=bool)
+    for key in keys:
+        sorted_key = key[order]
+        same &= sorted_key[1:] == sorted_key[:-1]
+    first = np.ones(n, dtype=bool)
+    first[1:] = ~same
+    return order, first
+
+
+def counter_predictions(keys, taken, init_state=0):
+    """Prediction (state >= 2 before the update) of each access to a table of 2-bit counters selected by keys.
+
+    Accesses with equal keys share a counter. The update functions of every counter are combined with a
+    segmented Hillis-Steele scan over the accesses grouped by counter, in log2(longest run) vectorized steps.
+    Returns the predictions and, in grouped order, the order and first-access flags.
+    """
+    n = len(taken)
+    order, first = group_accesses(keys)
+    positions = np.arange(n)
+    segment_start = np.maximum.accumulate(np.where(first, positions, 0))
+
+    # Inclusive scan: funcs[i] = all updates of the counter up to and including access i
+    funcs = np.where(taken[order], INC, DEC).astype(np.uint8)
+    step = 1
+    while True:
+        combine = positions[positions - step >= segment_start]
+        if len(combine) == 0:
+            break
+        funcs[combine] = THEN[funcs[combine - step], funcs[combine]]
+        step *= 2
+
+    state = np.full(n, init_state, dtype=np.uint8)
+    state[1:] = np.where(first[1:], init_state, APPLY[funcs[:-1], init_state])
+    predictions = np.empty(n, dtype=bool)
+    predictions[order] = state >= 2
+    return predictions, order, first
+
+
+def fold(values, bits, width):
+    """XOR of the bits-wide history folded into width bits."""
+    folded = np.zeros_like(values)
+    mask = np.uint64((1 << width) - 1)
+    for shift in range(0, bits, width):
+        folded ^= (values >> np.uint64(shift)) & mask
+    return folded
+
+
+# Index functions: name -> (index(pc, hist, log2_size, hist_length), uses history)
+# gshare and bimodal are GSHARE::get_index and BHTPredictor::get_index; the others are candidates.
+def index_gshare(pc, hist, log2_size, hist_length):
+    size = np.uint64(1 << log2_size)
+    return (hist ^ (pc & (size - np.uint64(1)))) % size
+
+
+def index_gshare_shift(pc, hist, log2_size, hist_length):
+    return (hist ^ (pc >> np.uint64(2))) & np.uint64((1 << log2_size) - 1)
+
+
+def index_gshare_fold(pc, hist, log2_size, hist_length):
+    pc_bits = pc >> np.uint64(2)
+    return fold(hist, hist_length, log2_size) ^ fold(pc_bits, 64 - 2, log2_size)
+
+
+def index_gselect(pc, hist, log2_size, hist_length):
+    hist_bits = min(hist_length, log2_size // 2)
+    pc_bits = (pc >> np.uint64(2)) & np.uint64((1 << (log2_size - hist_bits)) - 1)
+    return (pc_bits << np.uint64(hist_bits)) | (hist & np.uint64((1 << hist_bits) - 1))
+
+
+def index_bimodal(pc, hist, log2_size, hist_length):
+    return pc % np.uint64(1 << log2_size)
+
+
+def index_bimodal_shift(pc, hist, log2_size, hist_length):
+    return (pc >> np.uint64(2)) & np.uint64((1 << log2_size) - 1)
+
+
+INDEX_FUNCTIONS = {
+    'gshare'        : (index_gshare, True),
+    'gshare_shift'  : (index_gshare_shift, True),
+    'gshare_fold'   : (index_gshare_fold, True),
+    'gselect'       : (index_gselect, True),
+    'bimodal'       : (index_bimodal, False),
+    'bimodal_shift' : (index_bimodal_shift, False),
+}
+
+
+def analyze_index(pcs, taken, hist, num_inst, index_name, log2_size, hist_length, private_predictions):
+    index_function, uses_history = INDEX_FUNCTIONS[index_name]
+    index = index_function(pcs, hist, log2_size, hist_length)
+    predictions, order, first = counter_predictions((index,), taken)
+
+    # Aliased: the previous access to the counter came from another context
+    context = (pcs, hist) if uses_history else (pcs,)
+    aliased_sorted = np.zeros(len(order), dtype=bool)
+    for key in context:
+        sorted_key = key[order]
+        aliased_sorted[1:] |= sorted_key[1:] != sorted_key[:-1]
+    aliased_sorted &= ~first
+    num_contexts = int(group_accesses((index,) + context)[1].sum())
+
+    shared_ok = predictions == taken
+    private_ok = private_predictions == taken
+    num_br = len(taken)
+    misp = int((~shared_ok).sum())
+    destructive = int((private_ok & ~shared_ok).sum())
+    constructive = int((~private_ok & shared_ok).sum())
+    used = int(first.sum())
+    return {
+            'Index'             : index_name,
+            'Log2Size'          : log2_size,
+            'HistLength'        : hist_length if uses_history else 0,
+            'UsedEntries'       : used,
+            'ContextsPerEntry'   : num_contexts / used if used else 0.0,
+            'AliasedAccesses'   : 100.0 * aliased_sorted.sum() / num_br,
+            'Destructive'       : 100.0 * destructive / num_br,
+            'Constructive'      : 100.0 * constructive / num_br,
+            'MispBr'            : misp,
+            'MPKI'              : 1000.0 * misp / num_inst,
+            'AliasFreeMPKI'     : 1000.0 * int((~private_ok).sum()) / num_inst,
+            'AliasMispShare'    : 100.0 * destructive / misp if misp else 0.0,
+    }
+
+
+def analyze_trace(task):
+    my_trace_path, cache_dir, index_names, log2_sizes, hist_length = task
+    my_wl, my_run = branch_stream.get_run_key(my_trace_path)
+    stream = branch_stream.load_stream(my_trace_path, cache_dir)
+    pcs, taken, _ = branch_stream.conditional_branches(stream)
+    num_inst = max(branch_stream.num_instructions(stream), 1)
+    hist = branch_stream.global_history(taken, hist_length)
+    zero_hist = np.zeros_like(hist)
+
+    # The alias-free predictions only depend on the context, not on the index function or size
+    private = {False: counter_predictions((pcs,), taken)[0], True: counter_predictions((pcs, hist), taken)[0]}
+    rows = []
+    for index_name in index_names:
+        uses_history = INDEX_FUNCTIONS[index_name][1]
+        for log2_size in log2_sizes:
+            row = analyze_index(pcs, taken, hist if uses_history else zero_hist, num_inst, index_name, log2_size, hist_length, private[uses_history])
+            rows.append(dict({'Workload': my_wl, 'Run': my_run, 'NumBr': len(pcs)}, **row))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aliasing of 2-bit counter tables under the gshare/bimodal index functions and candidate alternatives.')
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--results_dir', help='directory of the aliasing.csv and aliasing_summary.csv results', required=True)
+    parser.add_argument('--cache_dir', help='branch stream cache directory (default: <results_dir>/streams)')
+    parser.add_argument('--index', default=','.join(INDEX_FUNCTIONS), help=f'index functions (default: {",".join(INDEX_FUNCTIONS)})')
+    parser.add_argument('--log2_sizes', default='8-16', help='range of log2 table sizes (default: 8-16)')
+    parser.add_argument('--hist_length', type=int, default=12, help='global history length (default: 12, as cond_predictor_impl in gshare.cc)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of traces analyzed concurrently (default: number of CPUs)')
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = args.cache_dir or str(results_dir / 'streams')
+    index_names = [name for name in args.index.split(',') if name]
+    for name in index_names:
+        if name not in INDEX_FUNCTIONS:
+            parser.error(f'unknown index function {name} (known: {", ".join(INDEX_FUNCTIONS)})')
+    first, last = (int(x) for x in args.log2_sizes.split('-'))
+    log2_sizes = list(range(first, last + 1))
+
+    my_traces = sorted(branch_stream.get_trace_paths(args.trace_dir))
+    tasks = [(my_trace, cache_dir, index_names, log2_sizes, args.hist_length) for my_trace in my_traces]
+    with mp.Pool(args.jobs) as pool:
+        df = pd.DataFrame([row for rows in pool.map(analyze_trace, tasks) for row in rows])
+    df.to_csv(results_dir / 'aliasing.csv', index=False)
+
+    # AMean over the traces, per workload and over all the traces
+    metrics = ['ContextsPerEntry', 'AliasedAccesses', 'Destructive', 'Constructive', 'MPKI', 'AliasFreeMPKI', 'AliasMispShare']
+    summary = pd.concat([df.groupby(['Workload', 'Index', 'Log2Size'], sort=False)[metrics].mean().reset_index(),
+                         df.groupby(['Index', 'Log2Size'], sort=False)[metrics].mean().reset_index().assign(Workload='All')])
+    summary.to_csv(results_dir / 'aliasing_summary.csv', index=False)
+
+    print('\n\n-----------------------------------------Table Aliasing (AMean over traces, rates in % of conditional branches)-----------------------------------------\n')
+    all_df = summary[summary['Workload'] == 'All']
+    print(all_df.drop(columns='Workload').to_string(index=False, float_format=lambda x: f'{x:.4f}'))
+    print('-----------------------------------------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import os
+import argparse
+import subprocess
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+from trace_paths import get_trace_paths, get_run_key
+
+# Branch streams of the traces, for the trace analysis scripts.
+#
+# tools/branch_stream (make branch_stream) decodes a trace once and writes its branches to a .npy file; the
+# analyses then load it memory-mapped instead of decoding the gzipped trace again. Streams are cached per trace
+# as cache_dir/<wl>/<run>.<fingerprint>.npy, where the fingerprint is the size and mtime of the trace, so a
+# replaced trace is dumped again.
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DUMPER = REPO_DIR / 'tools' / 'branch_stream'
+
+# One record per branch uop (see tools/branch_stream.cc)
+STREAM_DTYPE = np.dtype([('pc', '<u8'), ('target', '<u8'), ('inst', '<u8'), ('cls', 'u1'), ('taken', 'u1')])
+
+# InstClass values (lib/sim_common_structs.h)
+COND_BRANCH = 3
+UNCOND_DIRECT = 4
+UNCOND_INDIRECT = 5
+CALL_DIRECT = 9
+CALL_INDIRECT = 10
+RETURN = 11
+
+
+def trace_fingerprint(my_trace_path):
+    stat = os.stat(my_trace_path)
+    return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+
+def stream_path(my_trace_path, cache_dir):
+    my_wl, my_run = get_run_key(my_trace_path)
+    return Path(cache_dir) / my_wl / f'{my_run}.{trace_fingerprint(my_trace_path)}.npy'
+
+
+def load_stream(my_trace_path, cache_dir, dumper=DUMPER):
+    """Returns the branch stream of the trace (memory-mapped STREAM_DTYPE array), dumping it on a cache miss."""
+    my_stream_path = stream_path(my_trace_path, cache_dir)
+    if not my_stream_path.exists():
+        if not Path(dumper).exists():
+            raise FileNotFoundError(f'{dumper} not found, build it with: make branch_stream')
+        my_stream_path.parent.mkdir(parents=True, exist_ok=True)
+        # The dumper writes a temporary file of its own and renames it, so concurrent dumps of a trace are safe
+        subprocess.run([str(dumper), my_trace_path, str(my_stream_path)], check=True, stdout=subprocess.DEVNULL)
+        # Streams of an older version of this trace (never the current one, another worker may be reading it)
+        for stale in my_stream_path.parent.glob(my_stream_path.name.split('.')[0] + '.*.npy'):
+            if stale.name != my_stream_path.name:
+                stale.unlink(missing_ok=True)
+    stream = np.load(my_stream_path, mmap_mode='r')
+    assert stream.dtype == STREAM_DTYPE, f'{my_stream_path}: unexpected dtype {stream.dtype}'
+    return stream
+
+
+def num_instructions(stream):
+    """Instructions before the last branch of the stream (a lower bound of the trace length)."""
+    return int(stream['inst'][-1]) if len(stream) else 0
+
+
+def conditional_branches(stream):
+    """Returns (pc, taken, inst) arrays of the conditional branches, in trace order."""
+    cond = stream['cls'] == COND_BRANCH
+    return (np.ascontiguousarray(stream['pc'][cond]), stream['taken'][cond].astype(bool),
+            np.ascontiguousarray(stream['inst'][cond]))
+
+
+def global_history(taken, length):
+    """Global history before each branch: the last length outcomes, most recent in bit 0 (as GSHARE::history_update)."""
+    assert 0 <= length <= 64
+    taken = np.asarray(taken, dtype=np.uint64)
+    history = np.zeros(len(taken), dtype=np.uint64)
+    for k in range(1, min(length, len(taken)) + 1):
+        history[k:] |= taken[:-k] << np.uint64(k - 1)
+    return history
+
+
+def dump_trace(task):
+    my_trace_path, cache_dir, dumper = task
+    load_stream(my_trace_path, cache_dir, dumper)
+    return my_trace_path
+
+
+def dump_streams(my_traces, cache_dir, jobs=None, dumper=DUMPER):
+    """Dumps the missing streams of the traces, one worker per trace. Analyses that run several tasks per trace
+    call it first, so the tasks of a trace do not all dump its stream at once."""
+    with mp.Pool(jobs) as pool:
+        yield from pool.imap_unordered(dump_trace, [(t, cache_dir, dumper) for t in my_traces])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dumps (and caches) the branch streams of all the traces of a directory.')
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--cache_dir', help='branch stream cache directory', required=True)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of concurrent dumps (default: number of CPUs)')
+    parser.add_argument('--dumper', default=str(DUMPER), help=f'branch stream dumper (default: {DUMPER})')
+    args = parser.parse_args()
+
+    my_traces = sorted(get_trace_paths(args.trace_dir))
+    for my_trace_path in dump_streams(my_traces, args.cache_dir, args.jobs, args.dumper):
+        print(f'{my_trace_path} -> {stream_path(my_trace_path, args.cache_dir)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import os
+import json
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import branch_stream
+
+# Branch working set of the traces, to size predictor tables without simulating every size.
+#
+# Over the conditional branch stream of each trace:
+#   footprint    number of distinct branch PCs and distinct (PC, global history) contexts
+#   coverage     share of the dynamic branches covered by the k most frequent PCs, and the PCs needed to cover
+#                50/90/99/99.9% of them
+#   reuse        LRU stack (reuse) distance of every access to a PC or (PC, history) context: the number of
+#                distinct other keys seen since its previous access. A fully associative LRU table of S entries
+#                keeps a key between two accesses iff the distance is below S, so the share of accesses with
+#                distance < S is the hit rate of an ideal S-entry table. It is a reference, not a bound, for a
+#                direct-mapped table: a cyclic pattern over S + 1 keys never hits in LRU but mostly hits there.
+#
+# Reuse distances are computed for all accesses at once in O(n log^2 n) vectorized steps (see reuse_distances).
+# Per trace results are cached as results_dir/<wl>/<run>.json and aggregated per workload.
+
+COVERAGE_LEVELS = [0.5, 0.9, 0.99, 0.999]
+
+
+def previous_access(*keys):
+    """Index of the previous access with the same key (tuple of the key arrays), -1 for the first access."""
+    n = len(keys[0])
+    order = np.lexsort(keys[::-1])  # stable: equal keys stay in access order
+    same = np.ones(max(n - 1, 0), dtype=bool)
+    for key in keys:
+        sorted_key = key[order]
+        same &= sorted_key[1:] == sorted_key[:-1]
+    prev = np.full(n, -1, dtype=np.int64)
+    prev[order[1:][same]] = order[:-1][same]
+    return prev
+
+
+def count_smaller_before(values):
+    """For every i, the number of j < i with values[j] < values[i] (values >= 0).
+
+    Bottom-up merge sort over the array padded to a power of two: at each level the array is viewed as pairs of
+    blocks, and every element of a right block counts the smaller elements of the sorted left block with one
+    global searchsorted (the pair index is added as a high-order offset so all pairs are searched at once).
+    The pairs are then sorted row-wise to form the sorted blocks of the next level. The padding is appended
+    after the last element, so it never counts for a real element.
+    """
+    n = len(values)
+    counts = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return counts
+    size = 1 << int(n - 1).bit_length()
+    padded = np.full(size, 0, dtype=np.int64)
+    padded[:n] = values
+    big = int(padded.max()) + 1
+    padded_counts = np.zeros(size, dtype=np.int64)
+    sorted_values = padded.copy()
+    width = 1
+    while width < size:
+        num_pairs = size // (2 * width)
+        offsets = np.arange(num_pairs, dtype=np.int64)[:, None] * big
+        blocks = sorted_values.reshape(num_pairs, 2, width)
+        left_keys = (blocks[:, 0, :] + offsets).ravel()
+        queries = padded.reshape(num_pairs, 2, width)[:, 1, :] + offsets
+        found = np.searchsorted(left_keys, queries.ravel(), 'left').reshape(num_pairs, width)
+        padded_counts.reshape(num_pairs, 2, width)[:, 1, :] += found - np.arange(num_pairs, dtype=np.int64)[:, None] * width
+        sorted_values = np.sort(sorted_values.reshape(num_pairs, 2 * width), axis=1).ravel()
+        width *= 2
+    counts[:] = padded_counts[:n]
+    return counts
+
+
+def reuse_distances(*keys):
+    """LRU stack distance of every access (-1 for the first access of a key).
+
+    With p = prev[i], the distinct keys accessed in (p, i) are the accesses j in (p, i) whose own previous access
+    is before p, i.e. #{j < i : prev[j] < p} minus the p + 1 accesses j <= p (which all have prev[j] < p).
+    """
+    prev = previous_access(*keys)
+    distances = count_smaller_before(prev + 1) - prev - 1
+    distances[prev < 0] = -1
+    return distances
+
+
+def lru_hit_rates(distances, sizes):
+    """Share of the accesses that hit in a fully associative LRU table, per table size."""
+    if not len(distances):
+        return {size: 1.0 for size in sizes}  # no access, no miss
+    sorted_distances = np.sort(distances[distances >= 0])
+    return {size: np.searchsorted(sorted_distances, size, 'left') / len(distances) for size in sizes}
+
+
+def reuse_histogram(distances):
+    """Accesses per log2 reuse distance bucket: 'cold', '0', '1', '2-3', '4-7', ..."""
+    hist = {'cold': int((distances < 0).sum())}
+    warm = distances[distances >= 0]
+    buckets = np.bincount(np.where(warm == 0, 0, np.floor(np.log2(np.maximum(warm, 1))).astype(np.int64) + 1))
+    for bucket, count in enumerate(buckets):
+        low, high = (0, 0) if bucket == 0 else (1 << (bucket - 1), (1 << bucket) - 1)
+        hist[f'{low}' if low == high else f'{low}-{high}'] = int(count)
+    return hist
+
+
+def coverage(pcs):
+    """Top-k coverage (k = 1, 2, 4, ...) and number of PCs needed per COVERAGE_LEVELS."""
+    if not len(pcs):
+        return {}, {level: 0 for level in COVERAGE_LEVELS}
+    _, counts = np.unique(pcs, return_counts=True)
+    cumulative = np.cumsum(np.sort(counts)[::-1]) / len(pcs)
+    top_k = {1 << i: float(cumulative[min(1 << i, len(cumulative)) - 1]) for i in range(int(np.log2(len(cumulative))) + 2)}
+    pcs_for = {level: int(np.searchsorted(cumulative, level - 1e-12, 'left') + 1) for level in COVERAGE_LEVELS}
+    return top_k, pcs_for
+
+
+def analyze_trace(my_trace_path, cache_dir, hist_lengths, sizes):
+    stream = branch_stream.load_stream(my_trace_path, cache_dir)
+    pcs, taken, _ = branch_stream.conditional_branches(stream)
+    top_k, pcs_for = coverage(pcs)
+    result = {
+            'Instr'     : branch_stream.num_instructions(stream),
+            'NumBr'     : len(pcs),
+            'StaticPCs' : int(len(np.unique(pcs))),
+            'TopK'      : top_k,
+            'PCsFor'    : pcs_for,
+            'Keys'      : {},
+    }
+    key_arrays = {'pc': (pcs,)}
+    for length in hist_lengths:
+        key_arrays[f'pc+h{length}'] = (pcs, branch_stream.global_history(taken, length))
+    for key_name, keys in key_arrays.items():
+        distances = reuse_distances(*keys)
+        result['Keys'][key_name] = {
+                'Distinct'  : int((distances < 0).sum()),
+                'HitRate'   : lru_hit_rates(distances, sizes),
+                'Histogram' : reuse_histogram(distances),
+        }
+    return result
+
+
+def analyze_task(task):
+    my_trace_path, cache_dir, results_dir, hist_lengths, sizes = task
+    my_wl, my_run = branch_stream.get_run_key(my_trace_path)
+    result_file = Path(results_dir) / my_wl / f'{my_run}.json'
+    options = {'fingerprint': branch_stream.trace_fingerprint(my_trace_path), 'hist_lengths': hist_lengths, 'sizes': sizes}
+    if result_file.exists():
+        with open(result_file) as f:
+            cached = json.load(f)
+        if cached.get('options') == options:
+            return my_wl, my_run, cached['result']
+    result = analyze_trace(my_trace_path, cache_dir, hist_lengths, sizes)
+    result_file.parent.mkdir(parents=True, exist_ok=True)
+    # json keys are strings; round trip so cached and fresh results look the same
+    result = json.loads(json.dumps(result))
+    with open(result_file, 'w') as f:
+        json.dump({'options': options, 'result': result}, f, indent=1)
+    return my_wl, my_run, result
+
+
+def flatten(my_wl, my_run, result):
+    row = {'Workload': my_wl, 'Run': my_run, 'Instr': result['Instr'], 'NumBr': result['NumBr'], 'StaticPCs': result['StaticPCs']}
+    for level, num_pcs in result['PCsFor'].items():
+        row[f'PCsFor{float(level) * 100:g}%'] = num_pcs
+    for key_name, key_result in result['Keys'].items():
+        row[f'{key_name}:Distinct'] = key_result['Distinct']
+        for size, hit_rate in key_result['HitRate'].items():
+            row[f'{key_name}:Hit@{size}'] = hit_rate
+    return row
+
+
+def smallest_size(hit_rates, target):
+    """Smallest table size whose hit rate reaches the target (None if none does)."""
+    for size, hit_rate in sorted(hit_rates.items()):
+        if hit_rate >= target:
+            return size
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Branch footprint, coverage and reuse distances of the conditional branches of each trace, per workload.')
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--results_dir', help='per trace results (cached) and the csv files', required=True)
+    parser.add_argument('--cache_dir', help='branch stream cache directory (default: <results_dir>/streams)')
+    parser.add_argument('--hist_lengths', default='4,8,12,16', help='global history lengths of the (PC, history) contexts (default: 4,8,12,16)')
+    parser.add_argument('--log2_sizes', default='6-20', help='range of log2 table sizes of the LRU hit rates (default: 6-20)')
+    parser.add_argument('--target_hit_rate', type=float, default=0.99, help='hit rate used to suggest a table size (default: 0.99)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of traces analyzed concurrently (default: number of CPUs)')
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    cache_dir = args.cache_dir or str(results_dir / 'streams')
+    hist_lengths = [int(length) for length in args.hist_lengths.split(',') if length]
+    first, last = (int(x) for x in args.log2_sizes.split('-'))
+    sizes = [1 << i for i in range(first, last + 1)]
+
+    my_traces = sorted(branch_stream.get_trace_paths(args.trace_dir))
+    tasks = [(my_trace, cache_dir, str(results_dir), hist_lengths, sizes) for my_trace in my_traces]
+    with mp.Pool(args.jobs) as pool:
+        results = pool.map(analyze_task, tasks)
+
+    df = pd.DataFrame([flatten(*my_result) for my_result in results])
+    df.to_csv(results_dir / 'working_set.csv', index=False)
+    print(df[['Workload', 'Run', 'NumBr', 'StaticPCs'] + [c for c in df.columns if c.startswith('PCsFor') or c.endswith(':Distinct')]].to_string(index=False))
+
+    key_names = list(results[0][2]['Keys']) if results else []
+    summary = []
+    for my_wl in list(df['Workload'].unique()) + ['All']:
+        wl_results = [r for wl, _, r in results if my_wl in ('All', wl)]
+        row = {'Workload': my_wl, 'Traces': len(wl_results),
+               'StaticPCs': np.mean([r['StaticPCs'] for r in wl_results])}
+        for level in COVERAGE_LEVELS:
+            row[f'PCsFor{level * 100:g}%'] = np.mean([r['PCsFor'][str(level)] for r in wl_results])
+        for key_name in key_names:
+            # Hit rate per size averaged over the traces, weighting every trace equally (as the AMean of MPKI)
+            mean_hit_rates = {int(size): np.mean([r['Keys'][key_name]['HitRate'][str(size)] for r in wl_results]) for size in sizes}
+            row[f'{key_name}:Distinct'] = np.mean([r['Keys'][key_name]['Distinct'] for r in wl_results])
+            row[f'{key_name}:SizeFor{args.target_hit_rate:g}'] = smallest_size(mean_hit_rates, args.target_hit_rate)
+            for size in sizes:
+                row[f'{key_name}:Hit@{size}'] = mean_hit_rates[size]
+        summary.append(row)
+    summary_df = pd.DataFrame(summary)
+    summary_df.to_csv(results_dir / 'working_set_summary.csv', index=False)
+
+    print(f'\n\n------------------------------Branch Working Set Per Workload (AMean over traces, LRU hit rate target {args.target_hit_rate:g})------------------------------\n')
+    for row in summary:
+        print(f"WL:{row['Workload']:<10} Traces:{row['Traces']:<4} StaticPCs:{row['StaticPCs']:10.1f} " +
+              ' '.join(f"PCsFor{level * 100:g}%:{row[f'PCsFor{level * 100:g}%']:.1f}" for level in COVERAGE_LEVELS))
+        for key_name in key_names:
+            print(f"    {key_name:<10} Distinct:{row[f'{key_name}:Distinct']:12.1f}  suggested entries: {row[f'{key_name}:SizeFor{args.target_hit_rate:g}']}")
+    print('-----------------------------------------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    main()
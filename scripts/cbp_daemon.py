@@ -0,0 +1,500 @@
+import os
+import sys
+import json
+import time
+import heapq
+import signal
+import socket
+import argparse
+import selectors
+import subprocess
+import tempfile
+from pathlib import Path
+import cpu_topology
+
+# Local job daemon owning the worker slots of the machine.
+#
+# Jobs (command, working directory, stdout file) are submitted over a Unix socket with a priority and started on
+# a free slot, highest priority first (FIFO within a priority). A job submitted with preempt may suspend
+# (SIGSTOP) a running job of lower priority to take its slot; suspended jobs resume (SIGCONT, re-pinned to the
+# slot they get) before any queued job of the same priority. So a quick interactive check submitted at a higher
+# priority starts right away, while a sweep at priority 0 keeps all the slots busy the rest of the time.
+# A suspended cbp keeps its memory, so preempting a sweep costs no work but does not free any RAM.
+#
+# Protocol: one JSON object per line each way.
+#   {"op": "submit", "jobs": [{"cmd": [...], "cwd": ..., "stdout": ..., "name": ...}], "priority": 0,
+#    "preempt": false, "wait": false}
+#       -> {"ok": true, "ids": [...]}; with wait, then one {"event": "done", "job": {...}} per job as it finishes
+#          and {"event": "all_done"}. A waiting client that disconnects cancels its unfinished jobs.
+#   {"op": "status"}                        -> {"ok": true, "stats": {...}, "jobs": [...]}
+#   {"op": "cancel", "ids": [...]}          -> {"ok": true, "cancelled": [...]}
+#   {"op": "shutdown"}                      -> {"ok": true}, then the running jobs are killed and the daemon exits
+
+DEFAULT_SOCKET = os.environ.get('CBP_DAEMON_SOCKET', str(Path(tempfile.gettempdir()) / f'cbp_daemon.{os.getuid()}.sock'))
+RECV_SIZE = 65536
+
+
+def get_rusage_dict(rusage):
+    # Same keys as the runner: ru_maxrss is in KB on Linux and in bytes on macOS; ru_inblock counts 512-byte blocks
+    max_rss_mb = rusage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else rusage.ru_maxrss / 1024
+    return {'UserTime': rusage.ru_utime,
+            'SysTime': rusage.ru_stime,
+            'MaxRSSMB': max_rss_mb,
+            'ReadBytes': rusage.ru_inblock * 512,
+            'VolCtxSw': rusage.ru_nvcsw,
+            'InvolCtxSw': rusage.ru_nivcsw}
+
+
+def log(message):
+    print(f'[{time.strftime("%H:%M:%S")}] {message}', flush=True)
+
+
+class Job:
+    def __init__(self, job_id, spec, priority, preempt, owner):
+        self.id = job_id
+        self.cmd = spec['cmd']
+        self.cwd = spec.get('cwd') or os.getcwd()
+        self.stdout = spec.get('stdout')
+        self.name = spec.get('name') or ' '.join(self.cmd)
+        self.priority = priority
+        self.preempt = preempt
+        self.owner = owner          # waiting client, None when fire-and-forget
+        self.state = 'queued'       # queued, running, suspended, done, failed, cancelled
+        self.submit_time = time.time()
+        self.start_time = None
+        self.resume_time = None     # start of the current running period
+        self.end_time = None
+        self.run_time = 0.0         # wall time spent running (excludes suspended periods)
+        self.suspensions = 0
+        self.proc = None
+        self.slot = None
+        self.returncode = None
+        self.rusage = None
+
+    def queue_key(self, seq):
+        # Highest priority first, suspended before queued, then submission order
+        return (-self.priority, self.state != 'suspended', seq)
+
+    def result(self):
+        # A running job has also run since its last resume
+        exec_time = self.run_time + (time.time() - self.resume_time if self.state == 'running' else 0.0)
+        return {'id': self.id, 'name': self.name, 'state': self.state, 'priority': self.priority,
+                'returncode': self.returncode, 'stdout': self.stdout,
+                'QueueTime': (self.start_time or self.end_time or time.time()) - self.submit_time,
+                'ExecTime': exec_time, 'WallTime': (self.end_time - self.start_time) if self.start_time and self.end_time else 0.0,
+                'Suspensions': self.suspensions, 'rusage': self.rusage}
+
+
+class Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b''
+        self.outbuf = b''
+        self.waiting = set()    # ids of the jobs whose completion is streamed to this client
+
+
+class Daemon:
+    def __init__(self, socket_path, slots):
+        self.socket_path = socket_path
+        self.slots = slots                  # CPU set per slot, None when unpinned
+        self.free_slots = list(range(len(slots)))
+        self.jobs = {}                      # id -> Job (finished jobs are kept for status/wait)
+        self.waiting = []                   # heap of (queue key, job id) of queued and suspended jobs
+        self.running = {}                   # slot -> Job
+        self.live = set()                   # jobs whose process has not been reaped yet
+        self.next_id = 1
+        self.seq = 0
+        self.start_time = time.time()
+        self.busy_time = 0.0                # slot-seconds of finished running periods
+        self.preemptions = 0
+        self.queue_times = {}               # priority -> [queue time of the started jobs]
+        self.counts = {'done': 0, 'failed': 0, 'cancelled': 0}
+        self.selector = selectors.DefaultSelector()
+        self.stopping = False
+
+    # Scheduling
+
+    def push_waiting(self, job):
+        self.seq += 1
+        heapq.heappush(self.waiting, (job.queue_key(self.seq), job.id))
+
+    def schedule(self):
+        while self.waiting:
+            _, job_id = self.waiting[0]
+            job = self.jobs[job_id]
+            if job.state not in ('queued', 'suspended'):
+                heapq.heappop(self.waiting)     # cancelled while waiting
+                continue
+            if not self.free_slots:
+                victims = [j for j in self.running.values() if j.priority < job.priority] if job.preempt else []
+                if not victims:
+                    return
+                # Lowest priority, most recently (re)started: the longest-running ones get to finish first
+                self.suspend(min(victims, key=lambda j: (j.priority, -j.resume_time)))
+            heapq.heappop(self.waiting)
+            self.run(job, self.free_slots.pop(0))
+
+    def run(self, job, slot):
+        cpus = self.slots[slot]
+        now = time.time()
+        if job.state == 'suspended':
+            if cpus is not None:
+                os.sched_setaffinity(job.proc.pid, cpus)
+            os.killpg(job.proc.pid, signal.SIGCONT)
+            log(f'resume {job.id} (priority {job.priority}) on slot {slot}: {job.name}')
+        else:
+            stdout = subprocess.DEVNULL
+            try:
+                if job.stdout:
+                    stdout = open(job.stdout, 'w')
+                job.proc = subprocess.Popen(job.cmd, cwd=job.cwd, stdout=stdout, stderr=subprocess.STDOUT, start_new_session=True,
+                                            preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus is not None else None)
+            except OSError as e:
+                log(f'job {job.id} failed to start: {e}')
+                job.state, job.end_time = 'failed', now
+                self.free_slots.insert(0, slot)
+                self.finish(job)
+                return
+            finally:
+                if stdout is not subprocess.DEVNULL:
+                    stdout.close()
+            job.start_time = now
+            self.live.add(job)
+            self.queue_times.setdefault(job.priority, []).append(now - job.submit_time)
+            log(f'start {job.id} (priority {job.priority}) on slot {slot}: {job.name}')
+        job.state, job.slot, job.resume_time = 'running', slot, now
+        self.running[slot] = job
+
+    def suspend(self, job):
+        os.killpg(job.proc.pid, signal.SIGSTOP)
+        self.release(job)
+        job.state = 'suspended'
+        job.suspensions += 1
+        self.preemptions += 1
+        self.push_waiting(job)
+        log(f'suspend {job.id} (priority {job.priority}) from slot {job.slot}: {job.name}')
+
+    def release(self, job):
+        elapsed = time.time() - job.resume_time
+        job.run_time += elapsed
+        self.busy_time += elapsed
+        del self.running[job.slot]
+        self.free_slots.append(job.slot)
+
+    def reap(self):
+        for job in list(self.live):
+            pid, status, rusage = os.wait4(job.proc.pid, os.WNOHANG)
+            if pid == 0:
+                continue
+            self.live.discard(job)
+            if job.state == 'running':
+                self.release(job)
+            job.proc.returncode = job.returncode = os.waitstatus_to_exitcode(status)
+            job.rusage = get_rusage_dict(rusage)
+            job.end_time = time.time()
+            if job.state != 'cancelled':
+                job.state = 'done' if job.returncode == 0 else 'failed'
+            log(f'{job.state} {job.id} (exit {job.returncode}, {job.run_time:.1f}s): {job.name}')
+            self.finish(job)
+
+    def finish(self, job):
+        self.counts[job.state] += 1
+        client = job.owner
+        if client is not None and job.id in client.waiting:
+            client.waiting.discard(job.id)
+            self.send(client, {'event': 'done', 'job': job.result()})
+            if not client.waiting:
+                self.send(client, {'event': 'all_done'})
+
+    def cancel(self, job):
+        if job.state in ('running', 'suspended'):
+            if job.state == 'running':
+                self.release(job)
+            job.state = 'cancelled'
+            os.killpg(job.proc.pid, signal.SIGKILL)     # also ends a stopped process; reaped as usual
+            return True
+        if job.state == 'queued':
+            job.state, job.end_time = 'cancelled', time.time()
+            self.finish(job)
+            return True
+        return False
+
+    # Stats
+
+    def stats(self):
+        now = time.time()
+        uptime = now - self.start_time
+        busy = self.busy_time + sum(now - j.resume_time for j in self.running.values())
+        queued = {}
+        for job in self.jobs.values():
+            if job.state in ('queued', 'suspended'):
+                per_priority = queued.setdefault(str(job.priority), {'queued': 0, 'suspended': 0})
+                per_priority[job.state] += 1
+        return {
+                'Uptime'            : uptime,
+                'Slots'             : len(self.slots),
+                'BusySlots'         : len(self.running),
+                'Suspended'         : sum(1 for j in self.jobs.values() if j.state == 'suspended'),
+                'Queued'            : sum(1 for j in self.jobs.values() if j.state == 'queued'),
+                'SlotUtilization'   : busy / (len(self.slots) * uptime) if uptime > 0 else 0.0,
+                'Preemptions'       : self.preemptions,
+                'PerPriority'       : queued,
+                'QueueTime'         : {str(p): {'started': len(t), 'mean': sum(t) / len(t), 'max': max(t)} for p, t in sorted(self.queue_times.items())},
+                **{state.capitalize(): count for state, count in self.counts.items()},
+        }
+
+    # Client requests
+
+    def handle(self, client, message):
+        op = message.get('op')
+        if op == 'submit':
+            specs = message.get('jobs', [])
+            if not all(isinstance(spec.get('cmd'), list) and spec['cmd'] for spec in specs):
+                return {'ok': False, 'error': 'every job needs a non-empty cmd list'}
+            wait = bool(message.get('wait'))
+            ids = []
+            for spec in specs:
+                job = Job(self.next_id, spec, int(message.get('priority', 0)), bool(message.get('preempt')), client if wait else None)
+                self.next_id += 1
+                self.jobs[job.id] = job
+                self.push_waiting(job)
+                ids.append(job.id)
+            if wait:
+                client.waiting.update(ids)
+            log(f'submitted {len(ids)} jobs (priority {message.get("priority", 0)}{", preempt" if message.get("preempt") else ""})')
+            self.send(client, {'ok': True, 'ids': ids})
+            if wait and not ids:
+                self.send(client, {'event': 'all_done'})
+            return None
+        if op == 'status':
+            active = [j.result() | {'slot': j.slot} for j in self.jobs.values() if j.state in ('queued', 'running', 'suspended')]
+            return {'ok': True, 'stats': self.stats(), 'jobs': active}
+        if op == 'cancel':
+            cancelled = [job_id for job_id in message.get('ids', []) if job_id in self.jobs and self.cancel(self.jobs[job_id])]
+            return {'ok': True, 'cancelled': cancelled}
+        if op == 'shutdown':
+            self.stopping = True
+            return {'ok': True}
+        return {'ok': False, 'error': f'unknown op {op}'}
+
+    def send(self, client, message):
+        client.outbuf += (json.dumps(message) + '\n').encode()
+        self.flush(client)
+
+    def flush(self, client):
+        try:
+            sent = client.sock.send(client.outbuf)
+            client.outbuf = client.outbuf[sent:]
+        except BlockingIOError:
+            pass
+        except OSError:
+            client.outbuf = b''
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbuf else 0)
+        self.selector.modify(client.sock, events, client)
+
+    def read(self, client):
+        try:
+            data = client.sock.recv(RECV_SIZE)
+        except OSError:
+            data = b''
+        if not data:
+            self.disconnect(client)
+            return
+        client.inbuf += data
+        while b'\n' in client.inbuf:
+            line, client.inbuf = client.inbuf.split(b'\n', 1)
+            try:
+                response = self.handle(client, json.loads(line))
+            except (ValueError, AttributeError, TypeError, KeyError) as e:
+                response = {'ok': False, 'error': f'bad request: {e}'}
+            if response is not None:
+                self.send(client, response)
+
+    def disconnect(self, client):
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        unfinished, client.waiting = client.waiting, set()
+        if unfinished:
+            log(f'client gone, cancelling its {len(unfinished)} unfinished jobs')
+            for job_id in unfinished:
+                self.cancel(self.jobs[job_id])
+
+    # Main loop
+
+    def serve(self):
+        if os.path.exists(self.socket_path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(self.socket_path)
+                sys.exit(f'Error: a daemon is already listening on {self.socket_path}')
+            except ConnectionRefusedError:
+                os.unlink(self.socket_path)     # left over by a daemon that died
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen()
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ, None)
+
+        # SIGCHLD wakes the loop up through a pipe so finished jobs are reaped (and replaced) immediately
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_r, False)
+        os.set_blocking(wakeup_w, False)
+        signal.set_wakeup_fd(wakeup_w)
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: setattr(self, 'stopping', True))
+        self.selector.register(wakeup_r, selectors.EVENT_READ, 'wakeup')
+
+        pinned = 'unpinned' if self.slots[0] is None else 'pinned'
+        log(f'listening on {self.socket_path} with {len(self.slots)} {pinned} slots')
+        try:
+            while not self.stopping:
+                for key, events in self.selector.select(timeout=1.0):
+                    if key.data is None:
+                        sock, _ = server.accept()
+                        sock.setblocking(False)
+                        self.selector.register(sock, selectors.EVENT_READ, Client(sock))
+                    elif key.data == 'wakeup':
+                        while True:
+                            try:
+                                if not os.read(wakeup_r, RECV_SIZE):
+                                    break
+                            except BlockingIOError:
+                                break
+                    else:
+                        if events & selectors.EVENT_WRITE:
+                            self.flush(key.data)
+                        if events & selectors.EVENT_READ:
+                            self.read(key.data)
+                self.reap()
+                self.schedule()
+        finally:
+            for job in self.live:
+                os.killpg(job.proc.pid, signal.SIGKILL)
+                os.waitpid(job.proc.pid, 0)
+            server.close()
+            os.unlink(self.socket_path)
+            log('stopped')
+
+
+# Client side
+
+def connect(socket_path=DEFAULT_SOCKET):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        raise ConnectionError(f'no cbp daemon listening on {socket_path} (start one with: python scripts/cbp_daemon.py serve)')
+    return sock
+
+
+def messages(sock):
+    """Yields the messages the daemon sends on sock, until it closes the connection."""
+    buf = b''
+    while True:
+        data = sock.recv(RECV_SIZE)
+        if not data:
+            return
+        buf += data
+        while b'\n' in buf:
+            line, buf = buf.split(b'\n', 1)
+            yield json.loads(line)
+
+
+def request(message, socket_path=DEFAULT_SOCKET):
+    """Sends one request and returns the response."""
+    with connect(socket_path) as sock:
+        sock.sendall((json.dumps(message) + '\n').encode())
+        response = next(messages(sock), None)
+    if response is None or not response.get('ok'):
+        raise RuntimeError(f'cbp daemon: {response.get("error") if response else "no response"}')
+    return response
+
+
+def run_jobs(jobs, priority=0, preempt=False, socket_path=DEFAULT_SOCKET):
+    """Submits jobs and yields the result of each one as it finishes (in completion order, with its 'index' in jobs).
+
+    The jobs are cancelled if the caller stops iterating (or dies) before they are all done.
+    """
+    with connect(socket_path) as sock:
+        sock.sendall((json.dumps({'op': 'submit', 'jobs': jobs, 'priority': priority, 'preempt': preempt, 'wait': True}) + '\n').encode())
+        stream = messages(sock)
+        response = next(stream, None)
+        if response is None or not response.get('ok'):
+            raise RuntimeError(f'cbp daemon: {response.get("error") if response else "no response"}')
+        index_of = {job_id: i for i, job_id in enumerate(response['ids'])}
+        for message in stream:
+            if message.get('event') == 'all_done':
+                return
+            yield dict(message['job'], index=index_of[message['job']['id']])
+        raise RuntimeError('cbp daemon: connection closed before the jobs finished')
+
+
+def print_status(response):
+    stats = response['stats']
+    print(f"Slots: {stats['BusySlots']}/{stats['Slots']} busy | utilization {100 * stats['SlotUtilization']:.1f}% over {stats['Uptime']:.0f}s | "
+          f"{stats['Queued']} queued | {stats['Suspended']} suspended | {stats['Preemptions']} preemptions | "
+          f"{stats['Done']} done | {stats['Failed']} failed | {stats['Cancelled']} cancelled")
+    for priority in sorted(set(stats['QueueTime']) | set(stats['PerPriority']), key=int):
+        queue_time = stats['QueueTime'].get(priority, {'started': 0, 'mean': 0.0, 'max': 0.0})
+        waiting = stats['PerPriority'].get(priority, {'queued': 0, 'suspended': 0})
+        print(f"Priority {priority:>4}: {queue_time['started']} started, queue time mean {queue_time['mean']:.2f}s max {queue_time['max']:.2f}s | "
+              f"{waiting['queued']} queued, {waiting['suspended']} suspended")
+    for job in sorted(response['jobs'], key=lambda j: (j['state'] != 'running', -j['priority'], j['id'])):
+        slot = f"slot {job['slot']}" if job['state'] == 'running' else job['state']
+        print(f"  {job['id']:>6} {slot:<10} priority {job['priority']:>4} {job['ExecTime']:8.1f}s  {job['name']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local job daemon owning the worker slots, with priorities and preemption of lower-priority runs.")
+    parser.add_argument('command', choices=['serve', 'submit', 'status', 'cancel', 'shutdown'])
+    parser.add_argument('ids', nargs='*', type=int, help='cancel: the job ids')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f'Unix socket of the daemon (default: $CBP_DAEMON_SOCKET or {DEFAULT_SOCKET})')
+    parser.add_argument('--jobs', type=int, help='serve: number of slots (default: number of worker slots with --pin, else number of CPUs)')
+    parser.add_argument('--pin', action='store_true', help='serve: pin every slot to a dedicated physical core (kept on one NUMA node)')
+    parser.add_argument('--use_smt', action='store_true', help='serve: with --pin, one slot per hardware thread instead of per physical core')
+    parser.add_argument('--priority', type=int, default=0, help='submit: priority, higher runs first (default: 0)')
+    parser.add_argument('--preempt', action='store_true', help='submit: suspend lower-priority jobs if no slot is free')
+    parser.add_argument('--stdout', help='submit: file the output of the command is written to (default: discarded)')
+    parser.add_argument('--wait', action='store_true', help='submit: wait for the job and exit with its exit code')
+    # submit [options] -- <command>
+    argv = sys.argv[1:]
+    cmd = []
+    if '--' in argv:
+        argv, cmd = argv[:argv.index('--')], argv[argv.index('--') + 1:]
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        if args.pin:
+            slots = cpu_topology.worker_slots(cpu_topology.read_topology(), args.use_smt)
+            if args.jobs:
+                slots = slots[:args.jobs]
+        elif args.use_smt:
+            parser.error('--use_smt requires --pin')
+        else:
+            slots = [None] * (args.jobs or os.cpu_count())
+        Daemon(args.socket, slots).serve()
+    elif args.command == 'submit':
+        if not cmd:
+            parser.error('submit requires a command after --')
+        job = {'cmd': cmd, 'cwd': os.getcwd(), 'stdout': os.path.abspath(args.stdout) if args.stdout else None}
+        if args.wait:
+            for result in run_jobs([job], args.priority, args.preempt, args.socket):
+                print(f"Job {result['id']} {result['state']} (exit {result['returncode']}): queued {result['QueueTime']:.2f}s, "
+                      f"ran {result['ExecTime']:.2f}s, suspended {result['Suspensions']} times")
+                sys.exit(0 if result['state'] == 'done' else 1)
+        response = request({'op': 'submit', 'jobs': [job], 'priority': args.priority, 'preempt': args.preempt}, args.socket)
+        print(f"Submitted job {response['ids'][0]}")
+    elif args.command == 'status':
+        print_status(request({'op': 'status'}, args.socket))
+    elif args.command == 'cancel':
+        response = request({'op': 'cancel', 'ids': args.ids}, args.socket)
+        print(f"Cancelled jobs {response['cancelled']}")
+    else:
+        request({'op': 'shutdown'}, args.socket)
+        print('Daemon shutting down')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import argparse
+from pathlib import Path
+from collections import namedtuple
+
+# CPU topology discovery (Linux sysfs) for pinning cbp runs.
+#
+# A slot is the set of CPUs one worker (and the cbp processes it starts) is pinned to. Without SMT there is one
+# slot per physical core holding its first hardware thread, so no two runs share a core; with SMT there is one
+# slot per hardware thread. Slots never span NUMA nodes, and are ordered round-robin over the nodes so that a
+# partial allocation spreads memory traffic over all sockets.
+
+SYSFS_CPU = Path('/sys/devices/system/cpu')
+SYSFS_NODE = Path('/sys/devices/system/node')
+
+Cpu = namedtuple('Cpu', ['cpu', 'package', 'core', 'node'])
+
+
+def parse_cpu_list(cpu_list):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in cpu_list.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus += range(int(first), int(last) + 1)
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def read_int(path, default):
+    try:
+        return int(path.read_text())
+    except (OSError, ValueError):
+        return default
+
+
+def read_topology(sysfs_cpu=SYSFS_CPU, sysfs_node=SYSFS_NODE):
+    """Returns a Cpu per CPU this process may run on (online and in its affinity mask)."""
+    node_of = {}
+    for node_dir in sysfs_node.glob('node[0-9]*'):
+        for cpu in parse_cpu_list((node_dir / 'cpulist').read_text()):
+            node_of[cpu] = int(node_dir.name[4:])
+
+    topology = []
+    for cpu in sorted(os.sched_getaffinity(0)):
+        cpu_dir = sysfs_cpu / f'cpu{cpu}' / 'topology'
+        package = read_int(cpu_dir / 'physical_package_id', 0)
+        # core_id is only unique within a package
+        core = read_int(cpu_dir / 'core_id', cpu)
+        topology.append(Cpu(cpu, package, core, node_of.get(cpu, 0)))
+    return topology
+
+
+def worker_slots(topology, use_smt=False):
+    """Returns the list of CPU sets to pin workers to, one per physical core (or hardware thread with use_smt)."""
+    cores = {}
+    for my_cpu in topology:
+        cores.setdefault((my_cpu.node, my_cpu.package, my_cpu.core), []).append(my_cpu.cpu)
+
+    per_node = {}
+    for (node, _, _), cpus in sorted(cores.items()):
+        threads = cpus if use_smt else cpus[:1]
+        per_node.setdefault(node, []).extend({cpu} for cpu in threads)
+
+    # Interleave the nodes: node0 slot0, node1 slot0, node0 slot1, ...
+    slots = []
+    node_slots = list(per_node.values())
+    for i in range(max((len(s) for s in node_slots), default=0)):
+        slots += [s[i] for s in node_slots if i < len(s)]
+    return slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prints the CPU topology and the worker slots the runner pins cbp to.")
+    parser.add_argument('--use_smt', action='store_true', help='one slot per hardware thread instead of per physical core')
+    args = parser.parse_args()
+
+    topology = read_topology()
+    for my_cpu in topology:
+        print(f'CPU {my_cpu.cpu:<4} Package {my_cpu.package:<3} Core {my_cpu.core:<4} Node {my_cpu.node}')
+    slots = worker_slots(topology, args.use_smt)
+    print(f'{len(topology)} CPUs | {len({(c.package, c.core) for c in topology})} physical cores | '
+          f'{len({c.node for c in topology})} NUMA nodes | {len(slots)} worker slots')
+    for i, slot in enumerate(slots):
+        print(f'Slot {i:<4} CPUs {sorted(slot)}')
+
+
+if __name__ == '__main__':
+    main()
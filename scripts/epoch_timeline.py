@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Per-epoch timelines of several predictors on the same traces.
+#
+# Reads the "epochs" arrays of the cbp -S stats files (<results_dir>/<wl>/<run>.json, written by
+# trace_exec_training_list.py; the epoch size is set with cbp -E) of one results directory per predictor, and
+# renders for every trace:
+#   <output_dir>/<wl>/<run>.png    per-epoch MPKI and IPC of all the predictors
+#   <output_dir>/<wl>/<run>.html   the same as a self-contained interactive chart (zoom, hover, toggle series)
+# plus <output_dir>/summary.csv and <output_dir>/index.html with per-trace, per-predictor epoch statistics.
+#
+# Series are downsampled with LTTB (Largest-Triangle-Three-Buckets), which keeps the visual shape (spikes and
+# phase changes) of long series: the PNGs use --points points per series, and the HTML embeds --html_points
+# points, decimated again to the visible range and canvas width while zooming. Traces are rendered in parallel.
+
+METRICS = {
+    'MPKI': lambda epochs: 1000.0 * epochs['MispBr'] / np.maximum(epochs['Instr'], 1),
+    'IPC' : lambda epochs: epochs['Instr'] / np.where(epochs['Cycles'] > 0, epochs['Cycles'], np.nan),
+}
+
+
+def lttb(x, y, threshold):
+    """Indices of the threshold points LTTB keeps from the series (all of them if it is short enough)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y, nan=0.0)
+    every = (n - 2) / (threshold - 2)
+    edges = np.floor(np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the last bucket)
+        next_start, next_end = end, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def get_stats_paths(results_dir):
+    """{(wl, run): stats file} of the runs of a results directory."""
+    ret = {}
+    for my_path in Path(results_dir).glob('*/*.json'):
+        ret[(my_path.parent.name, my_path.stem)] = my_path
+    return ret
+
+
+def load_epochs(stats_file):
+    """Per-epoch arrays of a stats file (None without epochs) and the 50 Perc MPKI."""
+    try:
+        with open(stats_file) as f:
+            stats = json.load(f)
+        epochs = {key: np.asarray(values, dtype=np.float64) for key, values in stats['epochs'].items()}
+        mpki_50perc = stats['cond_dir']['50Perc']['MPKI']
+    except (OSError, ValueError, KeyError):
+        return None, None
+    # Drop the empty epoch begun after the last full one
+    keep = epochs['Instr'] > 0
+    return {key: values[keep] for key, values in epochs.items()}, mpki_50perc
+
+
+def summarize(series, mpki_50perc):
+    mpki = series['MPKI']
+    return {
+            'Epochs'        : len(mpki),
+            '50PercMPKI'    : mpki_50perc,
+            'MeanMPKI'      : float(np.mean(mpki)) if len(mpki) else float('nan'),
+            'MedianMPKI'    : float(np.median(mpki)) if len(mpki) else float('nan'),
+            'P95MPKI'       : float(np.percentile(mpki, 95)) if len(mpki) else float('nan'),
+            'MaxMPKI'       : float(np.max(mpki)) if len(mpki) else float('nan'),
+            'MaxMPKIAtM'    : float(series['x'][np.argmax(mpki)]) if len(mpki) else float('nan'),
+            'MeanIPC'       : float(np.nanmean(series['IPC'])) if np.isfinite(series['IPC']).any() else float('nan'),
+    }
+
+
+def render_png(png_file, title, predictors, points):
+    metrics = [m for m in METRICS if any(np.isfinite(s[m]).any() for s in predictors.values())]
+    fig, axes = plt.subplots(len(metrics), 1, figsize=(14, 3.5 * len(metrics)), sharex=True, squeeze=False)
+    for ax, metric in zip(axes[:, 0], metrics):
+        for name, series in predictors.items():
+            keep = lttb(series['x'], series[metric], points)
+            ax.plot(series['x'][keep], series[metric][keep], label=name, linewidth=0.8)
+        ax.set_ylabel(metric)
+        ax.grid(True, linestyle='--', alpha=0.5)
+    axes[0, 0].set_title(title)
+    axes[0, 0].legend(loc='upper right', fontsize='small')
+    axes[-1, 0].set_xlabel('Instructions (M)')
+    fig.tight_layout()
+    fig.savefig(png_file, dpi=100)
+    plt.close(fig)
+
+
+HTML_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+canvas { border: 1px solid #ccc; display: block; margin-bottom: 8px; }
+#legend span { cursor: pointer; margin-right: 16px; user-select: none; }
+#tip { font-family: monospace; white-space: pre; min-height: 3em; }
+table { border-collapse: collapse; font-size: 13px; } td, th { border: 1px solid #ccc; padding: 2px 8px; text-align: right; }
+</style></head><body>
+<h3>__TITLE__</h3>
+<div>Drag to zoom, double-click to reset, click a legend entry to hide/show a predictor.</div>
+<div id="legend"></div>
+<div id="charts"></div>
+<div id="tip"></div>
+__SUMMARY__
+<script>
+const DATA = __DATA__;
+const COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+const W = 1200, H = 260, PAD = 50;
+let view = null, hidden = {}, drag = null;
+const charts = DATA.metrics.map(metric => {
+  const c = document.createElement('canvas'); c.width = W; c.height = H;
+  document.getElementById('charts').appendChild(c);
+  c.addEventListener('mousedown', e => { drag = {start: e.offsetX, canvas: c}; });
+  c.addEventListener('mouseup', e => {
+    if (drag && Math.abs(e.offsetX - drag.start) > 4) {
+      const [a, b] = [drag.start, e.offsetX].sort((p, q) => p - q).map(px => toX(px));
+      view = [a, b]; drawAll();
+    }
+    drag = null;
+  });
+  c.addEventListener('dblclick', () => { view = null; drawAll(); });
+  c.addEventListener('mousemove', e => hover(metric, e.offsetX));
+  return {metric: metric, canvas: c};
+});
+function range() { return view || [DATA.xmin, DATA.xmax]; }
+function toX(px) { const [a, b] = range(); return a + (px - PAD) / (W - 2 * PAD) * (b - a); }
+function visible(series, metric) {
+  // Slice of the visible range, decimated to about two points (min and max) per pixel column
+  const [a, b] = range(), xs = series.x, ys = series[metric];
+  let lo = 0, hi = xs.length;
+  while (lo < hi && xs[lo] < a) lo++;
+  while (hi > lo && xs[hi - 1] > b) hi--;
+  lo = Math.max(lo - 1, 0); hi = Math.min(hi + 1, xs.length);
+  const per = Math.max(1, Math.floor((hi - lo) / (W - 2 * PAD)));
+  const out = [];
+  for (let i = lo; i < hi; i += per) {
+    let mi = i, ma = i;
+    for (let j = i; j < Math.min(i + per, hi); j++) {
+      if (ys[j] < ys[mi]) mi = j;
+      if (ys[j] > ys[ma]) ma = j;
+    }
+    for (const j of (mi < ma ? [mi, ma] : mi > ma ? [ma, mi] : [mi])) out.push(j);
+  }
+  return out;
+}
+function draw(chart) {
+  const ctx = chart.canvas.getContext('2d'), metric = chart.metric, [a, b] = range();
+  ctx.clearRect(0, 0, W, H);
+  const idx = {};
+  let ymin = Infinity, ymax = -Infinity;
+  DATA.predictors.forEach(p => {
+    if (hidden[p.name]) return;
+    idx[p.name] = visible(p, metric);
+    idx[p.name].forEach(i => { const y = p[metric][i]; if (y !== null) { ymin = Math.min(ymin, y); ymax = Math.max(ymax, y); } });
+  });
+  if (!isFinite(ymin)) { ymin = 0; ymax = 1; }
+  if (ymax === ymin) ymax = ymin + 1;
+  const px = x => PAD + (x - a) / (b - a) * (W - 2 * PAD), py = y => H - PAD / 2 - (y - ymin) / (ymax - ymin) * (H - PAD);
+  ctx.strokeStyle = '#999'; ctx.fillStyle = '#333'; ctx.font = '11px sans-serif';
+  ctx.strokeRect(PAD, PAD / 2, W - 2 * PAD, H - PAD);
+  for (let k = 0; k <= 4; k++) {
+    const y = ymin + (ymax - ymin) * k / 4, x = a + (b - a) * k / 4;
+    ctx.fillText(y.toFixed(2), 4, py(y) + 4);
+    ctx.fillText(x.toFixed(1) + 'M', px(x) - 12, H - 6);
+  }
+  ctx.fillText(metric, PAD + 4, PAD / 2 + 12);
+  DATA.predictors.forEach((p, n) => {
+    if (hidden[p.name]) return;
+    ctx.strokeStyle = COLORS[n % COLORS.length]; ctx.lineWidth = 1; ctx.beginPath();
+    let pen = false;
+    idx[p.name].forEach(i => {
+      const y = p[metric][i];
+      if (y === null) { pen = false; return; }
+      pen ? ctx.lineTo(px(p.x[i]), py(y)) : ctx.moveTo(px(p.x[i]), py(y)); pen = true;
+    });
+    ctx.stroke();
+  });
+}
+function drawAll() { charts.forEach(draw); }
+function hover(metric, offsetX) {
+  const x = toX(offsetX), lines = ['@ ' + x.toFixed(2) + 'M instructions'];
+  DATA.predictors.forEach(p => {
+    if (hidden[p.name]) return;
+    let lo = 0, hi = p.x.length - 1;
+    while (lo < hi) { const mid = (lo + hi) >> 1; p.x[mid] < x ? lo = mid + 1 : hi = mid; }
+    const best = (lo > 0 && Math.abs(p.x[lo - 1] - x) < Math.abs(p.x[lo] - x)) ? lo - 1 : lo;
+    lines.push(p.name.padEnd(24) + DATA.metrics.map(m => m + ' ' + (p[m][best] === null ? '-' : p[m][best].toFixed(4))).join('  '));
+  });
+  document.getElementById('tip').textContent = lines.join('\\n');
+}
+DATA.predictors.forEach((p, n) => {
+  const s = document.createElement('span'); s.style.color = COLORS[n % COLORS.length]; s.textContent = '\\u25A0 ' + p.name;
+  s.onclick = () => { hidden[p.name] = !hidden[p.name]; s.style.opacity = hidden[p.name] ? 0.3 : 1; drawAll(); };
+  document.getElementById('legend').appendChild(s);
+});
+drawAll();
+</script></body></html>
+'''
+
+
+def render_html(html_file, title, predictors, points, summary_df):
+    metrics = [m for m in METRICS if any(np.isfinite(s[m]).any() for s in predictors.values())]
+    data = {'metrics': metrics, 'predictors': [],
+            'xmin': min(float(s['x'][0]) for s in predictors.values()),
+            'xmax': max(float(s['x'][-1]) for s in predictors.values())}
+    for name, series in predictors.items():
+        # One set of x positions per predictor: the union of the LTTB picks of its metrics
+        keep = np.unique(np.concatenate([lttb(series['x'], series[metric], points) for metric in metrics]))
+        entry = {'name': name, 'x': np.round(series['x'][keep], 4).tolist()}
+        for metric in metrics:
+            entry[metric] = [None if not np.isfinite(v) else round(float(v), 4) for v in series[metric][keep]]
+        data['predictors'].append(entry)
+    html = (HTML_TEMPLATE.replace('__TITLE__', title)
+            .replace('__SUMMARY__', summary_df.to_html(index=False, float_format=lambda v: f'{v:.4f}'))
+            .replace('__DATA__', json.dumps(data, separators=(',', ':'))))
+    with open(html_file, 'w') as f:
+        f.write(html)
+
+
+def render_trace(task):
+    (my_wl, my_run), stats_files, output_dir, points, html_points = task
+    predictors = {}
+    rows = []
+    for name, stats_file in stats_files.items():
+        epochs, mpki_50perc = load_epochs(stats_file)
+        if epochs is None or len(epochs['Instr']) == 0:
+            continue
+        series = {'x': np.cumsum(epochs['Instr']) / 1e6}
+        series.update({metric: compute(epochs) for metric, compute in METRICS.items()})
+        predictors[name] = series
+        rows.append(dict({'Workload': my_wl, 'Run': my_run, 'Predictor': name}, **summarize(series, mpki_50perc)))
+    if not predictors:
+        return rows
+    trace_dir = Path(output_dir) / my_wl
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    title = f'{my_wl}/{my_run}'
+    render_png(trace_dir / f'{my_run}.png', title, predictors, points)
+    render_html(trace_dir / f'{my_run}.html', title, predictors, html_points, pd.DataFrame(rows).drop(columns=['Workload', 'Run']))
+    return rows
+
+
+def write_index(output_dir, summary_df):
+    index_df = summary_df.copy()
+    index_df['Run'] = [f'<a href="{wl}/{run}.html">{run}</a> (<a href="{wl}/{run}.png">png</a>)'
+                       for wl, run in zip(index_df['Workload'], index_df['Run'])]
+    table = index_df.to_html(index=False, escape=False, float_format=lambda v: f'{v:.4f}')
+    with open(Path(output_dir) / 'index.html', 'w') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Epoch timelines</title>\n'
+                '<style>body { font-family: sans-serif; } table { border-collapse: collapse; font-size: 13px; } '
+                'td, th { border: 1px solid #ccc; padding: 2px 8px; text-align: right; }</style></head>\n'
+                f'<body><h3>Epoch timelines ({summary_df["Run"].nunique()} traces)</h3>\n{table}\n</body></html>\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-epoch MPKI/IPC timelines of several predictors, as PNG and self-contained interactive HTML.")
+    parser.add_argument("results_dirs", nargs='+', help="results directories of trace_exec_training_list.py, one per predictor, as NAME=DIR or DIR (named after the directory)")
+    parser.add_argument("-o", "--output_dir", default="timeline_plots", help="The directory where the timelines will be saved (default: 'timeline_plots').")
+    parser.add_argument("--points", type=int, default=1000, help="points per series in the PNGs (default: 1000)")
+    parser.add_argument("--html_points", type=int, default=20000, help="points per series embedded in the HTML (default: 20000)")
+    parser.add_argument("--filter", default='', help="regex on <wl>/<run> of the traces to render")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="traces rendered concurrently (default: number of CPUs)")
+    args = parser.parse_args()
+
+    predictor_dirs = {}
+    for my_arg in args.results_dirs:
+        name, _, my_dir = my_arg.rpartition('=')
+        predictor_dirs[name or Path(my_dir).name] = my_dir
+
+    stats_paths = {name: get_stats_paths(my_dir) for name, my_dir in predictor_dirs.items()}
+    traces = sorted(set().union(*stats_paths.values()))
+    traces = [key for key in traces if re.search(args.filter, f'{key[0]}/{key[1]}')]
+    tasks = [(key, {name: paths[key] for name, paths in stats_paths.items() if key in paths}, args.output_dir, args.points, args.html_points)
+             for key in traces]
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with mp.Pool(args.jobs) as pool:
+        summary_df = pd.DataFrame([row for rows in pool.imap_unordered(render_trace, tasks) for row in rows])
+    if summary_df.empty:
+        print(f"No per-epoch stats found in {', '.join(predictor_dirs.values())} (the runs need cbp -S stats files)")
+        return
+    summary_df = summary_df.sort_values(['Workload', 'Run', 'Predictor']).reset_index(drop=True)
+    summary_df.to_csv(Path(args.output_dir) / 'summary.csv', index=False)
+    write_index(args.output_dir, summary_df)
+    print(summary_df.groupby('Predictor')[['50PercMPKI', 'MeanMPKI', 'P95MPKI', 'MaxMPKI', 'MeanIPC']].mean().to_string())
+    print(f"Timelines of {len(traces)} traces saved to {args.output_dir} (index.html)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+import os
+import gzip
+import time
+import argparse
+import numpy as np
+
+# Generates synthetic traces in the CBP trace format (see lib/trace_reader.h) for stress and scaling tests.
+#
+# The synthetic program is a set of static basic blocks, each made of ALU/load/store instructions and ending
+# with one conditional branch. Every static branch has a behaviour:
+#   biased     - taken with a fixed probability (--bias or 1 - --bias)
+#   loop       - executed as a run of trip_count iterations: taken trip_count-1 times, then not taken
+#   correlated - repeats the outcome of the d-th previous dynamic conditional branch (global history bit d,
+#                1 <= d <= --history_depth), optionally inverted, with --noise flips
+# Blocks are drawn from a Zipf distribution over the static footprint (--hot_skew).
+# Note: the dynamic block sequence is sampled, so the PC after a branch is not its target/fall-through.
+# The simulator only uses next_pc for the branch outcome, so the trace is valid for cbp.
+
+BIASED, LOOP, CORRELATED = 0, 1, 2
+ALU, LOAD, STORE, BR_NOT_TAKEN, BR_TAKEN = 0, 1, 2, 3, 4
+
+# Record layouts (packed, little endian), one per record kind
+RECORD_DTYPES = {
+    ALU: np.dtype([('pc', '<u8'), ('type', 'u1'), ('num_in', 'u1'), ('in0', 'u1'), ('in1', 'u1'),
+                   ('num_out', 'u1'), ('out0', 'u1'), ('val0', '<u8')]),
+    LOAD: np.dtype([('pc', '<u8'), ('type', 'u1'), ('ea', '<u8'), ('size', 'u1'), ('base_upd', 'u1'),
+                    ('num_in', 'u1'), ('in0', 'u1'), ('num_out', 'u1'), ('out0', 'u1'), ('val0', '<u8')]),
+    STORE: np.dtype([('pc', '<u8'), ('type', 'u1'), ('ea', '<u8'), ('size', 'u1'), ('base_upd', 'u1'),
+                     ('reg_offset', 'u1'), ('num_in', 'u1'), ('in0', 'u1'), ('in1', 'u1'), ('num_out', 'u1')]),
+    BR_NOT_TAKEN: np.dtype([('pc', '<u8'), ('type', 'u1'), ('taken', 'u1'), ('num_in', 'u1'), ('in0', 'u1'),
+                            ('num_out', 'u1')]),
+    BR_TAKEN: np.dtype([('pc', '<u8'), ('type', 'u1'), ('taken', 'u1'), ('target', '<u8'), ('num_in', 'u1'),
+                        ('in0', 'u1'), ('num_out', 'u1')]),
+}
+RECORD_SIZES = np.array([RECORD_DTYPES[kind].itemsize for kind in range(len(RECORD_DTYPES))], dtype=np.int64)
+INST_CLASS = {ALU: 0, LOAD: 1, STORE: 2, BR_NOT_TAKEN: 3, BR_TAKEN: 3}
+FLAG_REG = 64
+CODE_BASE = 0x400000
+DATA_BASE = 0x10000000
+
+
+class SyntheticProgram:
+    """Static code layout and per-branch behaviour of a synthetic program."""
+
+    def __init__(self, args, rng):
+        n = args.static_branches
+        self.rng = rng
+        self.noise = args.noise
+
+        # Block length before the branch: geometric with mean 1/branch_density - 1
+        mean_body = max(1.0 / args.branch_density - 1.0, 0.0)
+        self.body_len = rng.geometric(1.0 / (mean_body + 1.0), size=n) - 1
+        self.block_start = np.concatenate(([0], np.cumsum(self.body_len + 1)[:-1]))
+        num_static = int(self.body_len.sum() + n)
+        self.block_pc = CODE_BASE + 4 * self.block_start
+        self.branch_pc = self.block_pc + 4 * self.body_len
+
+        # Per static instruction: kind and registers
+        rest = 1.0 - args.load_frac - args.store_frac
+        self.static_kind = rng.choice([ALU, LOAD, STORE], size=num_static, p=[rest, args.load_frac, args.store_frac])
+        self.static_regs = rng.integers(0, 31, size=(num_static, 3), dtype=np.uint8)
+
+        # Branch behaviour
+        kinds = rng.random(n)
+        self.behaviour = np.where(kinds < args.loop_frac, LOOP,
+                                  np.where(kinds < args.loop_frac + args.corr_frac, CORRELATED, BIASED))
+        self.p_taken = np.where(rng.random(n) < 0.5, args.bias, 1.0 - args.bias)
+        self.trip_count = np.where(self.behaviour == LOOP, rng.integers(2, args.max_trip_count + 1, size=n), 1)
+        self.depth = rng.integers(1, args.history_depth + 1, size=n)
+        self.invert = rng.random(n) < 0.5
+
+        # Loops jump back to their own block, other branches to a random other block
+        other = (np.arange(n) + rng.integers(2, max(n, 3), size=n)) % n
+        self.target = np.where(self.behaviour == LOOP, self.block_pc, self.block_pc[other])
+        self.target = np.where(self.target == self.branch_pc + 4, self.block_pc, self.target)
+
+        # Zipf popularity of the blocks
+        weights = 1.0 / np.arange(1, n + 1) ** args.hot_skew
+        self.popularity = rng.permutation(weights / weights.sum())
+
+        self.history = np.zeros(0, dtype=bool)  # last history_depth outcomes of the previous chunk
+        self.history_depth = args.history_depth
+        self.num_dynamic = 0
+
+    def sample_branches(self, max_instr):
+        """Returns the dynamic static-branch ids and their outcomes for at most max_instr instructions."""
+        mean_run_len = float(np.dot(self.popularity, (self.body_len + 1) * self.trip_count))
+        num_runs = max(int(max_instr / mean_run_len * 1.1) + 1, 1)
+        run_ids = self.rng.choice(len(self.popularity), size=num_runs, p=self.popularity)
+        run_instr = (self.body_len[run_ids] + 1) * self.trip_count[run_ids]
+        num_runs = max(int(np.searchsorted(np.cumsum(run_instr), max_instr, side='right')), 1)
+        run_ids = run_ids[:num_runs]
+
+        # Expand loop runs; position of each dynamic branch within its run
+        repeats = self.trip_count[run_ids]
+        ids = np.repeat(run_ids, repeats)
+        run_first = np.repeat(np.cumsum(repeats) - repeats, repeats)
+        pos_in_run = np.arange(len(ids)) - run_first
+
+        behaviour = self.behaviour[ids]
+        taken = np.where(behaviour == LOOP, pos_in_run < repeats.repeat(repeats) - 1,
+                         self.rng.random(len(ids)) < self.p_taken[ids])
+        taken = self.resolve_correlated(ids, behaviour == CORRELATED, taken)
+        return ids, taken
+
+    def resolve_correlated(self, ids, correlated, taken):
+        """Sets correlated outcomes to (outcome d branches earlier) ^ invert ^ noise using pointer jumping."""
+        num_hist = len(self.history)
+        outcome = np.concatenate((self.history, taken))
+        index = np.arange(len(outcome))
+        corr = np.concatenate((np.zeros(num_hist, dtype=bool), correlated))
+        flip = np.zeros(len(outcome), dtype=bool)
+        flip[num_hist:] = self.invert[ids] ^ (self.rng.random(len(ids)) < self.noise)
+
+        ptr = np.where(corr, np.maximum(index - np.concatenate((np.zeros(num_hist, dtype=np.int64),
+                                                                 self.depth[ids])), -1), index)
+        # Correlation sources before the start of the trace fall back to the branch's own base outcome
+        ptr = np.where(ptr < 0, index, ptr)
+        acc = np.where(ptr != index, flip, False)
+        while True:
+            next_ptr = ptr[ptr]
+            if np.array_equal(next_ptr, ptr):
+                break
+            acc = acc ^ acc[ptr]
+            ptr = next_ptr
+        outcome = outcome[ptr] ^ acc
+
+        self.history = outcome[-self.history_depth:]
+        return outcome[num_hist:]
+
+    def encode(self, ids, taken):
+        """Returns the trace bytes of the blocks ending with the dynamic branches ids."""
+        block_len = self.body_len[ids] + 1
+        num_instr = int(block_len.sum())
+        dyn_block = np.repeat(np.arange(len(ids)), block_len)
+        pos = np.arange(num_instr) - np.repeat(np.cumsum(block_len) - block_len, block_len)
+        static_idx = self.block_start[ids][dyn_block] + pos
+        pc = self.block_pc[ids][dyn_block] + 4 * pos
+        is_branch = pos == self.body_len[ids][dyn_block]
+
+        kind = self.static_kind[static_idx].astype(np.int64)
+        branch_taken = taken[dyn_block]
+        kind[is_branch] = np.where(branch_taken[is_branch], BR_TAKEN, BR_NOT_TAKEN)
+
+        sizes = RECORD_SIZES[kind]
+        offsets = np.cumsum(sizes) - sizes
+        buf = np.empty(int(sizes.sum()), dtype=np.uint8)
+        dyn_index = self.num_dynamic + np.arange(num_instr, dtype=np.uint64)
+        regs = self.static_regs[static_idx]
+        for rec_kind, dtype in RECORD_DTYPES.items():
+            sel = np.nonzero(kind == rec_kind)[0]
+            if len(sel) == 0:
+                continue
+            recs = np.zeros(len(sel), dtype=dtype)
+            recs['pc'] = pc[sel]
+            recs['type'] = INST_CLASS[rec_kind]
+            if rec_kind in (BR_NOT_TAKEN, BR_TAKEN):
+                recs['taken'] = rec_kind == BR_TAKEN
+                recs['num_in'] = 1
+                recs['in0'] = FLAG_REG
+                if rec_kind == BR_TAKEN:
+                    recs['target'] = self.target[ids][dyn_block[sel]]
+            else:
+                recs['in0'] = regs[sel, 0]
+                if rec_kind == ALU:
+                    recs['num_in'] = 2
+                    recs['in1'] = regs[sel, 1]
+                    recs['num_out'] = 1
+                    recs['out0'] = regs[sel, 2]
+                    recs['val0'] = dyn_index[sel]
+                else:
+                    # Strided accesses within a 4KB region per static load/store
+                    recs['ea'] = DATA_BASE + 4096 * static_idx[sel].astype(np.uint64) + (8 * dyn_index[sel]) % 4096
+                    recs['size'] = 8
+                    if rec_kind == LOAD:
+                        recs['num_in'] = 1
+                        recs['num_out'] = 1
+                        recs['out0'] = regs[sel, 2]
+                        recs['val0'] = dyn_index[sel]
+                    else:
+                        recs['num_in'] = 2
+                        recs['in1'] = regs[sel, 1]
+            size = dtype.itemsize
+            dst = (offsets[sel][:, None] + np.arange(size)).ravel()
+            buf[dst] = recs.view(np.uint8)
+        self.num_dynamic += num_instr
+        return buf, num_instr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic CBP trace (gzip) with controllable branch behaviour.")
+    parser.add_argument('output', help='output trace path, e.g. synthetic/syn/syn_0_trace.gz')
+    parser.add_argument('--num_instr', type=int, default=10_000_000, help='number of instructions (default: 10M)')
+    parser.add_argument('--branch_density', type=float, default=0.15, help='fraction of instructions that are conditional branches (default: 0.15)')
+    parser.add_argument('--static_branches', type=int, default=2000, help='static conditional branch footprint (default: 2000)')
+    parser.add_argument('--hot_skew', type=float, default=1.0, help='Zipf exponent of the block popularity (default: 1.0)')
+    parser.add_argument('--bias', type=float, default=0.95, help='taken probability of biased branches, or 1 - bias (default: 0.95)')
+    parser.add_argument('--loop_frac', type=float, default=0.1, help='fraction of static branches that are loop branches (default: 0.1)')
+    parser.add_argument('--max_trip_count', type=int, default=32, help='maximum loop trip count (default: 32)')
+    parser.add_argument('--corr_frac', type=float, default=0.3, help='fraction of static branches correlated with global history (default: 0.3)')
+    parser.add_argument('--history_depth', type=int, default=16, help='maximum global history depth of correlated branches (default: 16)')
+    parser.add_argument('--noise', type=float, default=0.01, help='flip probability of correlated outcomes (default: 0.01)')
+    parser.add_argument('--load_frac', type=float, default=0.25, help='fraction of non-branch instructions that are loads (default: 0.25)')
+    parser.add_argument('--store_frac', type=float, default=0.1, help='fraction of non-branch instructions that are stores (default: 0.1)')
+    parser.add_argument('--chunk_instr', type=int, default=1 << 18, help='instructions generated per chunk (default: 262144)')
+    parser.add_argument('--level', type=int, default=1, choices=range(1, 10), help='gzip compression level (default: 1)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    args = parser.parse_args()
+
+    if not 0 < args.branch_density <= 1:
+        parser.error('--branch_density must be in (0, 1]')
+    if args.loop_frac + args.corr_frac > 1 or args.load_frac + args.store_frac > 1:
+        parser.error('fractions must sum to at most 1')
+
+    rng = np.random.default_rng(args.seed)
+    program = SyntheticProgram(args, rng)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    begin_time = time.time()
+    num_instr = 0
+    num_branches = 0
+    num_taken = 0
+    with gzip.GzipFile(args.output, 'wb', compresslevel=args.level, mtime=0) as out:
+        while num_instr < args.num_instr:
+            ids, taken = program.sample_branches(min(args.chunk_instr, args.num_instr - num_instr))
+            buf, chunk_instr = program.encode(ids, taken)
+            out.write(buf.data)
+            num_instr += chunk_instr
+            num_branches += len(ids)
+            num_taken += int(taken.sum())
+    exec_time = time.time() - begin_time
+
+    print(f'Wrote {args.output}: {num_instr} instrs, {num_branches} cond branches '
+          f'({num_taken / max(num_branches, 1):.2%} taken), {args.static_branches} static branches, '
+          f'{os.path.getsize(args.output) / (1024 * 1024):.1f} MB in {exec_time:.1f}s '
+          f'({num_instr / exec_time / 1e6:.2f} M instrs/s)')
+
+
+if __name__ == '__main__':
+    main()
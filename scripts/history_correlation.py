@@ -0,0 +1,219 @@
+import os
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import branch_stream
+import predictors
+from alias_analyzer import counter_predictions
+
+# How much of the outcome of the hardest static branches global and path history explain, by history depth.
+#
+# The conditional branches of a trace are run through a baseline predictor (tools/libpredictors.so, see
+# predictors.py) and the --top static branches with the most mispredictions are analyzed. For each of their
+# dynamic instances the context of depth d is
+#   global  the outcomes of the d previous conditional branches (the history of GSHARE::history_update)
+#   path    the targets of the d previous taken branches of any kind
+# hashed into 64 bits with a rolling hash, one vectorized step per depth over all the instances at once. Per
+# static branch and depth:
+#   MIBits      mutual information between the outcome and the context in bits per execution, estimated
+#               prequentially: the code length of the outcomes under an online Krichevsky-Trofimov estimator
+#               per branch minus the one per (branch, context), both predicting each outcome from the
+#               earlier ones only. The plug-in estimate calls every long history informative, since deep
+#               contexts are seen once or twice each; here a context pays for learning its bias, so MIBits
+#               peaks at the depth that is worth it and goes negative past it.
+#   MIShare     MIBits / code length per execution of the per-branch estimator: the share of the uncertainty
+#               of the outcome the context removes
+#   CtxMisp     mispredictions of a private 2-bit counter per (branch, context), initialized to 0 and updated
+#               right after each prediction as in cbp -B: what a gshare of that history length without aliasing
+#               would achieve. Depth 0 is a per-PC bimodal counter.
+#
+# A branch is counted as one no history helps when no depth of either history reduces CtxMisp by --min_gain
+# relative to depth 0. Per workload, the CtxMisp of the analyzed branches are summed per depth, and the knee is
+# the shortest history getting 90% of the best reduction.
+
+DEFAULT_DEPTHS = '0,1,2,3,4,6,8,12,16,24,32,48,64,96,128'
+HISTORIES = ['global', 'path']
+HASH_MULT = np.uint64(0x9E3779B97F4A7C15)
+KNEE_FRACTION = 0.9
+
+
+def context_stats(branch_ids, contexts, taken, num_branches):
+    """Per analyzed branch: (number of contexts, code length in bits of the outcomes under an online
+    Krichevsky-Trofimov estimator per context, mispredictions of a 2-bit counter per context)."""
+    predictions, order, first = counter_predictions((branch_ids, contexts), taken)
+    misp = np.bincount(branch_ids, weights=predictions != taken, minlength=num_branches)
+
+    # Outcomes of the same context seen before each access, from prefix sums over the accesses grouped by context
+    sorted_taken = taken[order].astype(np.int64)
+    positions = np.arange(len(order))
+    segment_start = np.maximum.accumulate(np.where(first, positions, 0))
+    prefix = np.cumsum(sorted_taken)
+    taken_before = prefix - sorted_taken - (prefix[segment_start] - sorted_taken[segment_start])
+    seen_before = positions - segment_start
+    same_before = np.where(sorted_taken == 1, taken_before, seen_before - taken_before)
+    code_bits = -np.log2((same_before + 0.5) / (seen_before + 1))
+    code_length = np.bincount(branch_ids[order], weights=code_bits, minlength=num_branches)
+    num_contexts = np.bincount(branch_ids[order][first], minlength=num_branches)
+    return num_contexts, code_length, misp
+
+
+def history_positions(stream):
+    """For every conditional branch of the stream: its position among the conditional branches and the number
+    of taken branches before it; plus the outcome and taken-target sequences the histories are made of."""
+    cond = stream['cls'] == branch_stream.COND_BRANCH
+    taken_all = stream['taken'].astype(bool)
+    taken_before = np.cumsum(taken_all) - taken_all
+    return (np.arange(int(cond.sum())), taken_before[cond],
+            stream['taken'][cond].astype(np.uint64), np.ascontiguousarray(stream['target'][taken_all]))
+
+
+def analyze_trace(task):
+    my_trace_path, cache_dir, (spec, name, params), top, depths = task
+    my_wl, my_run = branch_stream.get_run_key(my_trace_path)
+    stream = branch_stream.load_stream(my_trace_path, cache_dir)
+    cond = stream['cls'] == branch_stream.COND_BRANCH
+    predictions = predictors.Predictor(name, *params).run_stream(stream)
+    pcs = np.ascontiguousarray(stream['pc'][cond])
+    taken = stream['taken'][cond].astype(bool)
+    mispredicted = predictions[cond] != taken
+
+    # Hardest static branches: most baseline mispredictions
+    misp_pcs, misp_counts = np.unique(pcs[mispredicted], return_counts=True)
+    top_order = np.argsort(-misp_counts, kind='stable')[:top]
+    top_pcs = np.sort(misp_pcs[top_order])
+    if len(top_pcs) == 0:
+        return []
+    selected = np.flatnonzero(np.isin(pcs, top_pcs))
+    branch_ids = np.searchsorted(top_pcs, pcs[selected])
+    y = taken[selected]
+    num_branches = len(top_pcs)
+    execs = np.bincount(branch_ids, minlength=num_branches).astype(float)
+    baseline_misp = np.bincount(branch_ids, weights=mispredicted[selected], minlength=num_branches)
+
+    cond_index, taken_before, outcomes, targets = history_positions(stream)
+    sequences = {'global': (cond_index[selected], outcomes), 'path': (taken_before[selected], targets)}
+    # Code length without context (depth 0) is the reference of MIBits
+    _, branch_code_length, _ = context_stats(branch_ids, np.zeros(len(selected), dtype=np.uint64), y, num_branches)
+    branch_bits = branch_code_length / execs
+    rows = []
+    for history in HISTORIES:
+        positions, elements = sequences[history]
+        contexts = np.zeros(len(selected), dtype=np.uint64)
+        for depth in range(max(depths) + 1):
+            if depth:
+                # Element depth back, 0 before the start of the trace (elements are offset by 1)
+                back = positions.astype(np.int64) - depth
+                valid = back >= 0
+                element = np.where(valid, elements[np.maximum(back, 0)] + np.uint64(1), np.uint64(0))
+                contexts = contexts * HASH_MULT + element
+            if depth not in depths:
+                continue
+            num_contexts, code_length, ctx_misp = context_stats(branch_ids, contexts, y, num_branches)
+            mi = (branch_code_length - code_length) / execs
+            for b in range(num_branches):
+                rows.append({'Workload': my_wl, 'Run': my_run, 'PC': f'{top_pcs[b]:#x}', 'Execs': int(execs[b]),
+                             'BaselineMisp': int(baseline_misp[b]), 'History': history, 'Depth': depth,
+                             'Contexts': int(num_contexts[b]), 'BranchBits': branch_bits[b], 'MIBits': mi[b],
+                             'MIShare': mi[b] / branch_bits[b] if branch_bits[b] > 0 else 0.0, 'CtxMisp': int(ctx_misp[b])})
+    return rows
+
+
+def knee_depth(depths, misp):
+    """Shortest depth getting KNEE_FRACTION of the best reduction of misp relative to depth 0 (0 if none)."""
+    gain = misp[0] - misp
+    if gain.max() <= 0:
+        return 0
+    return int(depths[np.argmax(gain >= KNEE_FRACTION * gain.max())])
+
+
+def summarize_branches(df, min_gain):
+    """One row per analyzed static branch: best depth and reduction per history, and whether any history helps."""
+    rows = []
+    for (my_wl, my_run, pc), branch_df in df.groupby(['Workload', 'Run', 'PC'], sort=False):
+        row = {'Workload': my_wl, 'Run': my_run, 'PC': pc, 'Execs': branch_df['Execs'].iloc[0],
+               'BaselineMisp': branch_df['BaselineMisp'].iloc[0]}
+        bimodal_misp = branch_df.loc[branch_df['Depth'] == branch_df['Depth'].min(), 'CtxMisp'].iloc[0]
+        row['BimodalMisp'] = bimodal_misp
+        best_misp = bimodal_misp
+        for history, history_df in branch_df.groupby('History', sort=False):
+            history_df = history_df.sort_values('Depth')
+            best = history_df.loc[history_df['CtxMisp'].idxmin()]
+            row[f'{history.capitalize()}BestDepth'] = int(best['Depth'])
+            row[f'{history.capitalize()}BestMisp'] = int(best['CtxMisp'])
+            row[f'{history.capitalize()}KneeDepth'] = knee_depth(history_df['Depth'].to_numpy(), history_df['CtxMisp'].to_numpy())
+            row[f'{history.capitalize()}MaxMIShare'] = history_df['MIShare'].max()
+            best_misp = min(best_misp, int(best['CtxMisp']))
+        row['NoHistoryHelps'] = best_misp > (1 - min_gain) * bimodal_misp
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def summarize_workloads(df):
+    """Per workload, history and depth: CtxMisp of the analyzed branches summed over the traces, relative to
+    depth 0, and the MIShare of all their executions: information removed over total outcome code length, so
+    near-deterministic branches weigh in by the few bits they have."""
+    df = df.assign(MIBitsTotal=df['MIBits'] * df['Execs'], BranchBitsTotal=df['BranchBits'] * df['Execs'])
+    curves = df.groupby(['Workload', 'History', 'Depth'], sort=False)[['CtxMisp', 'BaselineMisp', 'MIBitsTotal', 'BranchBitsTotal']].sum().reset_index()
+    curves['MIShare'] = curves['MIBitsTotal'] / curves['BranchBitsTotal'].where(curves['BranchBitsTotal'] > 0)
+    bimodal = curves.loc[curves['Depth'] == curves['Depth'].min(), ['Workload', 'History', 'CtxMisp']]
+    curves = curves.merge(bimodal.rename(columns={'CtxMisp': 'BimodalMisp'}), on=['Workload', 'History'])
+    curves['RemainingMisp'] = 100.0 * curves['CtxMisp'] / curves['BimodalMisp'].where(curves['BimodalMisp'] > 0)
+    return curves.drop(columns=['MIBitsTotal', 'BranchBitsTotal'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mutual information and conditional predictability of the most mispredicted branches vs global and path history depth.')
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--results_dir', help='directory of the history_correlation*.csv results', required=True)
+    parser.add_argument('--cache_dir', help='branch stream cache directory (default: <results_dir>/streams)')
+    parser.add_argument('--predictor', type=predictors.parse_predictor, default=predictors.parse_predictor('gshare:12,4096'),
+                        help='baseline predictor picking the most mispredicted branches, NAME[:PARAMS] as in predictors.py (default: gshare:12,4096)')
+    parser.add_argument('--top', type=int, default=20, help='static branches analyzed per trace (default: 20)')
+    parser.add_argument('--depths', default=DEFAULT_DEPTHS, help=f'history depths, comma separated (default: {DEFAULT_DEPTHS})')
+    parser.add_argument('--min_gain', type=float, default=0.1, help='relative reduction of the depth 0 mispredictions for a history to help a branch (default: 0.1)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of traces analyzed concurrently (default: number of CPUs)')
+    args = parser.parse_args()
+
+    depths = sorted({int(d) for d in args.depths.split(',') if d})
+    if not depths or depths[0] < 0:
+        parser.error('--depths must be non-negative integers')
+    if depths[0] != 0:
+        depths = [0] + depths
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = args.cache_dir or str(results_dir / 'streams')
+    my_traces = sorted(branch_stream.get_trace_paths(args.trace_dir))
+    tasks = [(my_trace, cache_dir, args.predictor, args.top, depths) for my_trace in my_traces]
+    # A fresh worker per trace: tage_sc_l can only be created once per process
+    with mp.Pool(args.jobs, maxtasksperchild=1) as pool:
+        df = pd.DataFrame([row for rows in pool.map(analyze_trace, tasks) for row in rows])
+    if df.empty:
+        print('No mispredicted branches')
+        return
+    df.to_csv(results_dir / 'history_correlation.csv', index=False)
+    branches = summarize_branches(df, args.min_gain)
+    branches.to_csv(results_dir / 'history_correlation_branches.csv', index=False)
+    curves = summarize_workloads(df)
+    curves.to_csv(results_dir / 'history_correlation_workloads.csv', index=False)
+
+    print(f'\n\n---------------------------History Correlation (top {args.top} branches of {args.predictor[0]} per trace, alias-free 2-bit counter per context)---------------------------\n')
+    for my_wl, wl_curves in curves.groupby('Workload', sort=False):
+        wl_branches = branches[branches['Workload'] == my_wl]
+        table = wl_curves.pivot_table(index='Depth', columns='History', values=['RemainingMisp', 'MIShare'], sort=False)
+        table.columns = [f'{history}{metric}' for metric, history in table.columns]
+        knees = {history: knee_depth(h['Depth'].to_numpy(), h['CtxMisp'].to_numpy()) for history, h in wl_curves.groupby('History', sort=False)}
+        no_help = wl_branches['NoHistoryHelps']
+        print(f'WL:{my_wl}  {len(wl_branches)} branches, {int(wl_branches["BaselineMisp"].sum())} baseline mispredictions; '
+              f'RemainingMisp in % of depth 0 (per-PC bimodal)')
+        print(table.to_string(float_format=lambda x: f'{x:.4f}'))
+        print('Knee depth: ' + ', '.join(f'{history} {knee}' for history, knee in knees.items()))
+        print(f'No history helps: {int(no_help.sum())} branches, '
+              f'{100.0 * wl_branches.loc[no_help, "BaselineMisp"].sum() / max(wl_branches["BaselineMisp"].sum(), 1):.2f}% of their baseline mispredictions\n')
+    print('-----------------------------------------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import mmap
+import time
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import pandas as pd
+
+# Offline indexer of cbp run logs: builds the results csv of trace_exec_training_list.py from an existing
+# results/<wl>/<run>.log tree (any depth, e.g. <results_dir>/<variant>/<wl>/<run>.log) without re-simulating.
+#
+# Logs are parsed in a process pool. Each one is mapped with mmap and the measurement sections are located
+# with bytes.find on their headers, so only the header, column and value lines of each section are decoded;
+# the trailing 'Key = value' lines written by the runner (ExecTime, resource usage) and cbp -t are read with
+# one regex pass over the part of the log after the first section. Both the timing model and the
+# direction-only (cbp -B) reports are understood; the cycle-based columns of the latter are 'nan'.
+#
+# The parsed rows are cached in <output>.cache.json with the size and mtime of their log, so a rerun only parses
+# the new and modified logs (and forgets the deleted ones).
+
+SECTION_HEADERS = {
+    '50Perc': [b'DIRECT CONDITIONAL BRANCH PREDICTION MEASUREMENTS (50 Perc instructions)',
+               b'DIRECTION-ONLY CONDITIONAL BRANCH PREDICTION MEASUREMENTS (50 Perc instructions)'],
+    '': [b'DIRECT CONDITIONAL BRANCH PREDICTION MEASUREMENTS (Full Simulation i.e. Counts Not Reset When Warmup Ends)',
+         b'DIRECTION-ONLY CONDITIONAL BRANCH PREDICTION MEASUREMENTS (Full Simulation i.e. Counts Not Reset When Warmup Ends)'],
+}
+measurement_columns = ['Instr', 'Cycles', 'IPC', 'NumBr', 'MispBr', 'BrPerCyc', 'MispBrPerCyc', 'MR', 'MPKI', 'CycWP', 'CycWPAvg', 'CycWPPKI']
+# Same columns as the resource usage of trace_exec_training_list.py
+resource_usage_keys = ['UserTime', 'SysTime', 'MaxRSSMB', 'ReadBytes', 'VolCtxSw', 'InvolCtxSw', 'UarchShare', 'TraceReadShare', 'DecompressShare']
+KEY_VALUE_RE = re.compile(rb'^(ExecTime|' + b'|'.join(k.encode() for k in resource_usage_keys) + rb')\s*=\s*(\S+)', re.M)
+COLUMNS = (['Workload', 'Run', 'TraceSize', 'Status', 'ExecTime'] + measurement_columns + [f'50Perc{c}' for c in measurement_columns]
+           + resource_usage_keys + ['CMD', 'Log'])
+CACHE_VERSION = 1
+CHUNK_SIZE = 256
+
+
+def get_log_stats(log_root, rel_dir=''):
+    """{relative path: [size, mtime_ns]} of the <wl>/<run>.log files under log_root (hidden directories skipped)."""
+    logs = {}
+    with os.scandir(os.path.join(log_root, rel_dir)) as entries:
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                logs.update(get_log_stats(log_root, rel_path))
+            elif entry.name.endswith('.log') and entry.is_file():
+                st = entry.stat()
+                logs[rel_path] = [st.st_size, st.st_mtime_ns]
+    return logs
+
+
+def read_section(data, headers):
+    """{column: value} of the measurement line following one of the headers, None if absent."""
+    for header in headers:
+        pos = data.find(header)
+        if pos < 0:
+            continue
+        names_begin = data.find(b'\n', pos) + 1
+        values_begin = data.find(b'\n', names_begin) + 1
+        values_end = data.find(b'\n', values_begin)
+        if names_begin <= 0 or values_begin <= 0:
+            return None
+        names = data[names_begin:values_begin].split()
+        values = data[values_begin:values_end if values_end >= 0 else len(data)].split()
+        if len(names) != len(values):
+            return None
+        return {name.decode(): value.decode() for name, value in zip(names, values)}, pos
+    return None
+
+
+def get_trace_size(cmd, my_wl, my_run, trace_dir):
+    # MB, as TraceSize of the runner: the trace of the CMD line, or <trace_dir>/<wl>/<run>.gz
+    trace_path = os.path.join(trace_dir, my_wl, f'{my_run}.gz') if trace_dir else (cmd.split()[-1] if cmd else '')
+    try:
+        return os.path.getsize(trace_path) / (1024 * 1024)
+    except OSError:
+        return float('nan')
+
+
+def parse_log(log_root, rel_path, trace_dir=None):
+    """Results row of one log, in the COLUMNS schema."""
+    log_path = os.path.join(log_root, rel_path)
+    my_wl = os.path.basename(os.path.dirname(log_path))
+    my_run = os.path.basename(log_path)[:-len('.log')]
+    row = {'Workload': my_wl, 'Run': my_run, 'Status': 'Fail', 'ExecTime': 0, 'CMD': '', 'Log': rel_path}
+    row.update({f'{prefix}{c}': 0 for prefix in SECTION_HEADERS for c in measurement_columns})
+    row.update({key: 0 for key in resource_usage_keys})
+    with open(log_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            if data[:4] == b'CMD:':
+                cmd_end = data.find(b'\n')
+                row['CMD'] = data[4:cmd_end if cmd_end >= 0 else len(data)].decode(errors='replace').strip()
+            sections = {prefix: read_section(data, headers) for prefix, headers in SECTION_HEADERS.items()}
+            first_section = min((found[1] for found in sections.values() if found), default=0)
+            key_values = {key.decode(): value.decode() for key, value in KEY_VALUE_RE.findall(data, first_section)}
+        finally:
+            if size:
+                data.close()
+
+    for prefix, found in sections.items():
+        if found:
+            values, _ = found
+            row.update({f'{prefix}{c}': values.get(c, 'nan') for c in measurement_columns})
+    if sections['50Perc'] and 'ExecTime' in key_values:
+        row['Status'] = 'Pass'
+    row['ExecTime'] = key_values.get('ExecTime', 0)
+    row.update({key: key_values[key].rstrip('%') for key in resource_usage_keys if key in key_values})
+    row['TraceSize'] = get_trace_size(row['CMD'], my_wl, my_run, trace_dir)
+    return row
+
+
+def parse_logs(task):
+    log_root, rel_paths, trace_dir = task
+    rows = []
+    for rel_path in rel_paths:
+        try:
+            rows.append((rel_path, parse_log(log_root, rel_path, trace_dir)))
+        except (OSError, ValueError) as e:
+            print(f'Skipping {rel_path}: {e}')
+    return rows
+
+
+def load_cache(cache_path, log_root):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION or cache.get('log_root') != str(Path(log_root).resolve()):
+        return {}
+    return cache['logs']
+
+
+def save_cache(cache_path, log_root, logs):
+    tmp_path = f'{cache_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        # dumps (C encoder) rather than dump (pure Python streaming)
+        f.write(json.dumps({'version': CACHE_VERSION, 'log_root': str(Path(log_root).resolve()), 'logs': logs}))
+    os.replace(tmp_path, cache_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the results csv of a tree of cbp run logs (<wl>/<run>.log) without re-simulating, incrementally.')
+    parser.add_argument('--log_dir', required=True, help='root of the log tree (e.g. an old --results_dir)')
+    parser.add_argument('--output', help='results csv to write (default: <log_dir>/log_index.csv)')
+    parser.add_argument('--trace_dir', help='trace directory for the TraceSize column (default: the trace path of the CMD line of each log)')
+    parser.add_argument('--full', action='store_true', help='reparse every log, ignoring the cache')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of parsing processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    begin_time = time.time()
+    output = Path(args.output or Path(args.log_dir) / 'log_index.csv')
+    cache_path = Path(f'{output}.cache.json')
+    cache = {} if args.full else load_cache(cache_path, args.log_dir)
+
+    logs = dict(sorted(get_log_stats(args.log_dir).items()))
+    stale = [rel_path for rel_path, stat in logs.items() if rel_path not in cache or cache[rel_path]['stat'] != stat]
+    removed = len(set(cache) - set(logs))
+
+    parsed = {}
+    if stale:
+        tasks = [(args.log_dir, stale[i:i + CHUNK_SIZE], args.trace_dir) for i in range(0, len(stale), CHUNK_SIZE)]
+        with mp.Pool(min(args.jobs, len(tasks))) as pool:
+            for rows in pool.imap_unordered(parse_logs, tasks):
+                parsed.update(rows)
+
+    new_cache = {}
+    for rel_path, stat in logs.items():
+        if rel_path in parsed:
+            new_cache[rel_path] = {'stat': stat, 'row': parsed[rel_path]}
+        elif rel_path in cache and rel_path not in stale:
+            new_cache[rel_path] = cache[rel_path]
+    df = pd.DataFrame([entry['row'] for entry in new_cache.values()], columns=COLUMNS)
+    if stale or removed or not output.exists():
+        save_cache(cache_path, args.log_dir, new_cache)
+        df.to_csv(output, index=False)
+    print(f'Indexed {len(df)} logs of {args.log_dir} in {time.time() - begin_time:.2f}s: {len(parsed)} parsed, '
+          f'{len(new_cache) - len(parsed)} unchanged, {removed} removed, {(df["Status"] != "Pass").sum()} failed -> {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import os
+import re
+import hashlib
+import argparse
+import multiprocessing as mp
+from itertools import combinations
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import branch_stream
+import predictors
+
+# Oracle hybrid bounds and complementarity of predictors, from per-branch correctness bitmaps.
+#
+# For every trace and predictor, the correctness of each dynamic conditional branch (1 = predicted right) is
+# stored bit-packed as bitmap_dir/<wl>/<run>.<label>.npy (np.packbits(correct, bitorder='little'), branches in
+# trace order). Bitmaps of the --predictor list are generated with tools/libpredictors.so (see predictors.py);
+# bitmaps of other predictors written in the same format are picked up with --extra_labels. A generated bitmap
+# is kept next to a <run>.<label>.key file naming the trace version and the libpredictors.so it came from, and is
+# generated again when either changes.
+#
+# From the bitmaps of K predictors over the same trace, with 64-bit words and popcounts:
+#   OracleMPKI          a chooser picking, for every dynamic branch, a component that predicts it right
+#                       (popcount of the OR of the bitmaps): the bound of any hybrid of these components
+#   PerPCOracleMPKI     the best component per static branch: the bound of a PC-indexed chooser whose
+#                       counters have settled (as the chooser_table of tournament_predictor.cc)
+#   pairs               per pair (A, B): the pair's oracle MPKI and Complementarity(A, B), the share of the
+#                       mispredictions of A that B predicts right
+# and per static branch, the branches where a chooser would gain the most over the best single component.
+
+WORD_BYTES = 8
+
+
+def get_label(spec):
+    """'gshare:12,4096' -> 'gshare-12-4096'"""
+    return re.sub(r'[:,]', '-', spec)
+
+
+def bitmap_path(bitmap_dir, my_wl, my_run, label):
+    return Path(bitmap_dir) / my_wl / f'{my_run}.{label}.npy'
+
+
+def library_hash(path=predictors.LIBRARY):
+    """Content hash of the predictor library, part of the key of the bitmaps it generates."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def popcount(words):
+    """Number of set bits of every row of a uint64 array (summed over the last axis)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def to_words(packed, num_bits):
+    """Bit-packed uint8 bitmap -> uint64 words, zero padded; checks the bitmap holds num_bits bits."""
+    num_bytes = (num_bits + 7) // 8
+    if len(packed) != num_bytes:
+        raise ValueError(f'bitmap of {len(packed)} bytes for {num_bits} branches')
+    padded = np.zeros(-(-num_bytes // WORD_BYTES) * WORD_BYTES, dtype=np.uint8)
+    padded[:num_bytes] = packed
+    return padded.view(np.uint64)
+
+
+def make_bitmap(task):
+    my_trace_path, cache_dir, bitmap_dir, lib_hash, (spec, name, params) = task
+    my_wl, my_run = branch_stream.get_run_key(my_trace_path)
+    my_bitmap_path = bitmap_path(bitmap_dir, my_wl, my_run, get_label(spec))
+    key_path = my_bitmap_path.with_suffix('.key')
+    key = f'{branch_stream.trace_fingerprint(my_trace_path)} {lib_hash}\n'
+    if my_bitmap_path.exists() and key_path.exists() and key_path.read_text() == key:
+        return my_bitmap_path
+    stream = branch_stream.load_stream(my_trace_path, cache_dir)
+    cond = stream['cls'] == branch_stream.COND_BRANCH
+    predictions = predictors.Predictor(name, *params).run_stream(stream)
+    correct = predictions[cond] == stream['taken'][cond].astype(bool)
+    my_bitmap_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = my_bitmap_path.with_suffix('.tmp.npy')
+    np.save(tmp_path, np.packbits(correct, bitorder='little'))
+    os.replace(tmp_path, my_bitmap_path)
+    key_path.write_text(key)
+    return my_bitmap_path
+
+
+def analyze_trace(task):
+    my_trace_path, cache_dir, bitmap_dir, labels, top_branches = task
+    my_wl, my_run = branch_stream.get_run_key(my_trace_path)
+    stream = branch_stream.load_stream(my_trace_path, cache_dir)
+    pcs, _, _ = branch_stream.conditional_branches(stream)
+    num_br = len(pcs)
+    num_inst = max(branch_stream.num_instructions(stream), 1)
+    mpki = lambda misp: 1000.0 * misp / num_inst
+
+    found = [label for label in labels if bitmap_path(bitmap_dir, my_wl, my_run, label).exists()]
+    if len(found) < 2:
+        print(f'{my_wl}/{my_run}: bitmaps of {len(found)} predictors, skipped')
+        return None
+    words = np.stack([to_words(np.load(bitmap_path(bitmap_dir, my_wl, my_run, label)), num_br) for label in found])
+    misp = num_br - popcount(words)
+    oracle_misp = num_br - int(popcount(np.bitwise_or.reduce(words, axis=0)))
+
+    row = {'Workload': my_wl, 'Run': my_run, 'NumBr': num_br}
+    row.update({f'{label}:MPKI': mpki(m) for label, m in zip(found, misp)})
+    best = int(np.argmin(misp))
+    row.update({'BestSingle': found[best], 'BestSingleMPKI': mpki(misp[best]), 'OracleMPKI': mpki(oracle_misp)})
+
+    pairs = []
+    for i, j in combinations(range(len(found)), 2):
+        a, b = words[i], words[j]
+        pair_misp = num_br - int(popcount(a | b))
+        a_only, b_only = int(popcount(a & ~b)), int(popcount(~a & b))
+        pairs.append({'Workload': my_wl, 'Run': my_run, 'A': found[i], 'B': found[j],
+                      'A:MPKI': mpki(misp[i]), 'B:MPKI': mpki(misp[j]), 'PairOracleMPKI': mpki(pair_misp),
+                      'OnlyARightPKI': mpki(a_only), 'OnlyBRightPKI': mpki(b_only),
+                      'Complementarity(A,B)': b_only / misp[i] if misp[i] else 0.0,
+                      'Complementarity(B,A)': a_only / misp[j] if misp[j] else 0.0})
+
+    # Per static branch: mispredictions of every component and of the oracle
+    static_pcs, inverse, counts = np.unique(pcs, return_inverse=True, return_counts=True)
+    wrong = ~np.unpackbits(words.view(np.uint8), axis=1, count=num_br, bitorder='little').astype(bool)
+    pc_misp = np.stack([np.bincount(inverse, weights=w, minlength=len(static_pcs)) for w in wrong]).astype(np.int64)
+    pc_oracle = np.bincount(inverse, weights=wrong.all(axis=0), minlength=len(static_pcs)).astype(np.int64)
+    row['PerPCOracleMPKI'] = mpki(pc_misp.min(axis=0).sum())
+    row['OracleGainPKI'] = row['BestSingleMPKI'] - row['OracleMPKI']
+
+    gain = pc_misp[best] - pc_oracle
+    top = np.argsort(-gain, kind='stable')[:top_branches]
+    static_rows = []
+    for k in top[gain[top] > 0]:
+        static_row = {'Workload': my_wl, 'Run': my_run, 'PC': f'0x{static_pcs[k]:x}', 'Count': int(counts[k]),
+                      'BestPredictor': found[int(np.argmin(pc_misp[:, k]))], 'OracleMisp': int(pc_oracle[k])}
+        static_row.update({f'{label}:Misp': int(m) for label, m in zip(found, pc_misp[:, k])})
+        static_rows.append(static_row)
+    return row, pairs, static_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Oracle hybrid MPKI bounds and pairwise complementarity of predictors from per-branch correctness bitmaps.')
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--results_dir', help='directory of the oracle.csv, pairs.csv and static_branches.csv results', required=True)
+    parser.add_argument('--cache_dir', help='branch stream cache directory (default: <results_dir>/streams)')
+    parser.add_argument('--bitmap_dir', help='correctness bitmap directory (default: <results_dir>/bitmaps)')
+    parser.add_argument('--predictor', type=predictors.parse_predictor, action='append', help=f'NAME[:PARAMS] run through libpredictors.so, e.g. gshare:12,4096 (repeatable; default: {", ".join(predictors.PREDICTORS)})')
+    parser.add_argument('--extra_labels', default='', help='comma separated labels of bitmaps produced elsewhere, also combined')
+    parser.add_argument('--top_branches', type=int, default=20, help='static branches with the largest oracle gain kept per trace (default: 20)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of traces processed concurrently (default: number of CPUs)')
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = args.cache_dir or str(results_dir / 'streams')
+    bitmap_dir = args.bitmap_dir or str(results_dir / 'bitmaps')
+    my_predictors = args.predictor or [predictors.parse_predictor(name) for name in predictors.PREDICTORS]
+    labels = [get_label(spec) for spec, _, _ in my_predictors] + [label for label in args.extra_labels.split(',') if label]
+
+    my_traces = sorted(branch_stream.get_trace_paths(args.trace_dir))
+    # The streams are dumped once per trace before the bitmaps of its predictors fan out
+    for _ in branch_stream.dump_streams(my_traces, cache_dir, args.jobs):
+        pass
+    lib_hash = library_hash()
+    # A fresh worker per bitmap: tage_sc_l can only be created once per process
+    with mp.Pool(args.jobs, maxtasksperchild=1) as pool:
+        pool.map(make_bitmap, [(my_trace, cache_dir, bitmap_dir, lib_hash, my_predictor) for my_trace in my_traces for my_predictor in my_predictors])
+    with mp.Pool(args.jobs) as pool:
+        results = [r for r in pool.map(analyze_trace, [(my_trace, cache_dir, bitmap_dir, labels, args.top_branches) for my_trace in my_traces]) if r]
+    if not results:
+        print('No trace with bitmaps of at least two predictors')
+        return
+
+    df = pd.DataFrame([row for row, _, _ in results])
+    pairs_df = pd.DataFrame([pair for _, pairs, _ in results for pair in pairs])
+    static_df = pd.DataFrame([static_row for _, _, static_rows in results for static_row in static_rows])
+    df.to_csv(results_dir / 'oracle.csv', index=False)
+    pairs_df.to_csv(results_dir / 'pairs.csv', index=False)
+    static_df.to_csv(results_dir / 'static_branches.csv', index=False)
+
+    metrics = [c for c in df.columns if c.endswith(':MPKI')] + ['BestSingleMPKI', 'PerPCOracleMPKI', 'OracleMPKI', 'OracleGainPKI']
+    print('\n\n-----------------------------------------Oracle Hybrid Bounds Per Workload (AMean over traces)-----------------------------------------\n')
+    summary = pd.concat([df.groupby('Workload', sort=False)[metrics].mean(), df[metrics].mean().to_frame('All').T])
+    print(summary.to_string(float_format=lambda x: f'{x:.4f}'))
+    print(f"\nBest single predictor per trace: {df['BestSingle'].value_counts().to_dict()}")
+    print('\n\n-----------------------------------------Pairwise Complementarity (AMean over traces)-----------------------------------------\n')
+    pair_metrics = ['A:MPKI', 'B:MPKI', 'PairOracleMPKI', 'Complementarity(A,B)', 'Complementarity(B,A)']
+    print(pairs_df.groupby(['A', 'B'], sort=False)[pair_metrics].mean().to_string(float_format=lambda x: f'{x:.4f}'))
+    print('-----------------------------------------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import os
+import ctypes
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import branch_stream
+
+# Python bindings of tools/libpredictors.so (make libpredictors): the GSHARE, BHTPredictor, TOURNAMENT_PREDICTOR
+# and CBP2016 TAGE-SC-L code of the repository root run over NumPy arrays of branches, one C call per batch.
+#
+#   gshare = Predictor('gshare', 12, 4096)
+#   predictions = gshare.run(pcs, taken)                # conditional branches only
+#   predictions = tage.run_stream(branch_stream.load_stream(trace, cache_dir))   # all the branches of a trace
+#
+# Arrays are read in place through their base pointer and stride, so fields of the memory-mapped branch streams
+# are not copied. Branches are predicted and trained in the order of cbp -B (see the Direction-only mode
+# section of the README), and the state carries over between calls, so a trace can be fed in chunks.
+# TAGE-SC-L keeps its tables in globals: it can be created once per process (use a fresh worker per trace).
+
+LIBRARY = branch_stream.REPO_DIR / 'tools' / 'libpredictors.so'
+PREDICTORS = ['gshare', 'bht', 'tournament', 'tage_sc_l']
+
+_lib = None
+
+
+def load_library(path=LIBRARY):
+    global _lib
+    if _lib is None:
+        if not Path(path).exists():
+            raise FileNotFoundError(f'{path} not found, build it with: make libpredictors')
+        lib = ctypes.CDLL(str(path))
+        lib.predictor_create.restype = ctypes.c_void_p
+        lib.predictor_create.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_int64), ctypes.c_int]
+        lib.predictor_destroy.restype = None
+        lib.predictor_destroy.argtypes = [ctypes.c_void_p]
+        lib.predictor_run.restype = ctypes.c_int64
+        lib.predictor_run.argtypes = [ctypes.c_void_p, ctypes.c_uint64] + [ctypes.c_void_p, ctypes.c_int64] * 4 + [ctypes.c_void_p]
+        lib.predictor_num_branches.restype = ctypes.c_uint64
+        lib.predictor_num_branches.argtypes = [ctypes.c_void_p]
+        lib.predictor_storage_bits.restype = ctypes.c_uint64
+        lib.predictor_storage_bits.argtypes = [ctypes.c_void_p]
+        lib.predictor_last_error.restype = ctypes.c_char_p
+        lib.predictor_last_error.argtypes = []
+        _lib = lib
+    return _lib
+
+
+def _buffer(array, dtype, n):
+    """(pointer, byte stride) of a 1-D array of n items of dtype, copying only if it does not have that dtype."""
+    if array is None:
+        return None, 0
+    array = np.asarray(array)
+    if array.dtype == np.bool_ and np.dtype(dtype).itemsize == 1:
+        array = array.view(np.uint8)
+    elif array.dtype != dtype:
+        array = np.ascontiguousarray(array, dtype=dtype)
+    if array.shape != (n,):
+        raise ValueError(f'expected {n} items, got shape {array.shape}')
+    return array, array.strides[0]
+
+
+class Predictor:
+    """One predictor instance of tools/libpredictors.so, e.g. Predictor('gshare', 12, 4096)."""
+
+    def __init__(self, name, *params):
+        self.lib = load_library()
+        self.name = name
+        c_params = (ctypes.c_int64 * len(params))(*params)
+        self.handle = self.lib.predictor_create(name.encode(), c_params, len(params))
+        if not self.handle:
+            raise ValueError(self.lib.predictor_last_error().decode())
+
+    def __del__(self):
+        if getattr(self, 'handle', None):
+            self.lib.predictor_destroy(self.handle)
+            self.handle = None
+
+    @property
+    def num_branches(self):
+        return self.lib.predictor_num_branches(self.handle)
+
+    @property
+    def storage_bits(self):
+        """Modeled storage of the tables and histories (0 for tage_sc_l)."""
+        return self.lib.predictor_storage_bits(self.handle)
+
+    def run(self, pcs, taken, targets=None, classes=None):
+        """Predicts and trains over the branches; returns the predicted directions (True for unconditional ones).
+
+        targets (next PCs) are needed by tage_sc_l; classes (InstClass values) may be left out when all the
+        branches are conditional.
+        """
+        n = len(pcs)
+        buffers = [_buffer(pcs, np.uint64, n), _buffer(taken, np.uint8, n), _buffer(targets, np.uint64, n), _buffer(classes, np.uint8, n)]
+        predictions = np.empty(n, dtype=np.bool_)
+        args = []
+        for array, stride in buffers:
+            args += [array.ctypes.data if array is not None else None, stride]
+        if self.lib.predictor_run(self.handle, n, *args, predictions.ctypes.data) < 0:
+            raise ValueError(self.lib.predictor_last_error().decode())
+        return predictions
+
+    def run_stream(self, stream):
+        """Runs all the branches of a branch stream (branch_stream.load_stream), in place."""
+        return self.run(stream['pc'], stream['taken'], stream['target'], stream['cls'])
+
+
+def parse_predictor(spec):
+    """'gshare:12,4096' -> ('gshare', [12, 4096])"""
+    name, _, params = spec.partition(':')
+    if name not in PREDICTORS:
+        raise argparse.ArgumentTypeError(f'unknown predictor {name} (known: {", ".join(PREDICTORS)})')
+    return spec, name, [int(p) for p in params.split(',') if p]
+
+
+def run_trace(task):
+    my_trace_path, cache_dir, (label, name, params) = task
+    my_wl, my_run = branch_stream.get_run_key(my_trace_path)
+    stream = branch_stream.load_stream(my_trace_path, cache_dir)
+    predictions = Predictor(name, *params).run_stream(stream)
+    cond = stream['cls'] == branch_stream.COND_BRANCH
+    misp = int((predictions[cond] != stream['taken'][cond].astype(bool)).sum())
+    num_inst = max(branch_stream.num_instructions(stream), 1)
+    return {'Workload': my_wl, 'Run': my_run, 'Predictor': label, 'NumBr': int(cond.sum()), 'MispBr': misp,
+            'MPKI': 1000.0 * misp / num_inst}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the repository predictors over the branch streams of the traces through tools/libpredictors.so.')
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--cache_dir', help='branch stream cache directory', required=True)
+    parser.add_argument('--predictor', type=parse_predictor, action='append', help=f'NAME[:PARAMS], e.g. gshare:12,4096 (repeatable; default: all of {", ".join(PREDICTORS)} with their default sizes)')
+    parser.add_argument('--results_csv', help='write the per trace results to this csv')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of concurrent runs (default: number of CPUs)')
+    args = parser.parse_args()
+
+    my_predictors = args.predictor or [parse_predictor(name) for name in PREDICTORS]
+    my_traces = sorted(branch_stream.get_trace_paths(args.trace_dir))
+    # The streams are dumped once per trace before the runs of its predictors fan out
+    for _ in branch_stream.dump_streams(my_traces, args.cache_dir, args.jobs):
+        pass
+    tasks = [(my_trace, args.cache_dir, my_predictor) for my_trace in my_traces for my_predictor in my_predictors]
+    # A fresh worker per run: tage_sc_l can only be created once per process
+    with mp.Pool(args.jobs, maxtasksperchild=1) as pool:
+        df = pd.DataFrame(pool.map(run_trace, tasks))
+    if args.results_csv:
+        df.to_csv(args.results_csv, index=False)
+    print(df.to_string(index=False, float_format=lambda x: f'{x:.4f}'))
+
+    print('\n\n------------------------------Branch Misprediction PKI Per Workload (AMean over traces, direction only)------------------------------\n')
+    print(df.pivot_table(index='Workload', columns='Predictor', values='MPKI', aggfunc='mean', sort=False).to_string(float_format=lambda x: f'{x:.4f}'))
+    print('-----------------------------------------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Stratified quick-evaluation subset.
+#
+# Traces are stratified by workload. Each workload gets at least one trace and the rest of the budget is
+# split by Neyman allocation (workload size x spread of the reference metric). Inside a workload, traces are
+# picked at evenly spaced quantiles of the reference metric, so the subset covers easy and hard traces alike.
+#
+# The full-set AMean of a candidate is estimated per workload with a ratio estimator against the reference
+# results (mean_w = sum(candidate) / sum(reference) over the subset x reference mean over the whole workload),
+# and the workload means are combined with the workload weights, as the arithmetic mean over all traces does.
+
+Z_95 = 1.96
+
+
+def load_reference(reference_csv):
+    """Loads a results csv (e.g. reference_results_training_set.csv) keeping passed runs."""
+    ref_df = pd.read_csv(reference_csv)
+    return ref_df[ref_df['Status'] == 'Pass'].reset_index(drop=True)
+
+
+def allocate(ref_df, num_traces, metric):
+    """Returns {workload: number of traces} summing to num_traces (capped at the available traces). Raises
+    ValueError if num_traces cannot give every workload a trace: the estimate would ignore the missing ones."""
+    groups = ref_df.groupby('Workload')[metric]
+    sizes = groups.size()
+    if num_traces < len(sizes):
+        raise ValueError(f'a quick subset needs at least one trace per workload: {num_traces} < {len(sizes)} workloads')
+    if num_traces >= sizes.sum():
+        return sizes.to_dict()
+    alloc = pd.Series(1, index=sizes.index)
+    weights = sizes * groups.std(ddof=1).fillna(0)
+    if weights.sum() == 0:
+        weights = sizes.astype(float)
+    # Largest-remainder rounding of the Neyman allocation, respecting the stratum sizes
+    while alloc.sum() < num_traces:
+        room = alloc < sizes
+        share = weights[room] / weights[room].sum() * (num_traces - alloc.sum())
+        extra = np.floor(share).astype(int)
+        if extra.sum() == 0:
+            extra[(share - extra).idxmax()] = 1
+        alloc[extra.index] = np.minimum(alloc[extra.index] + extra, sizes[extra.index])
+    return alloc.to_dict()
+
+
+def select_quick_subset(ref_df, num_traces, metric='50PercMPKI'):
+    """Returns the list of (Workload, Run) of a workload-stratified subset of num_traces traces."""
+    subset = []
+    for my_wl, my_n in allocate(ref_df, num_traces, metric).items():
+        wl_df = ref_df[ref_df['Workload'] == my_wl].sort_values(metric).reset_index(drop=True)
+        if my_n <= 0:
+            continue
+        quantile_pos = (np.arange(my_n) + 0.5) / my_n * len(wl_df) - 0.5
+        picked = set()
+        for pos in quantile_pos:
+            # nearest not yet picked trace to the quantile position
+            order = np.argsort(np.abs(np.arange(len(wl_df)) - pos), kind='stable')
+            my_idx = next(i for i in order if i not in picked)
+            picked.add(my_idx)
+        subset += [(my_wl, wl_df.loc[i, 'Run']) for i in sorted(picked)]
+    return subset
+
+
+def estimate_full_set(results_df, ref_df, metric='50PercMPKI'):
+    """Estimates the full-set AMean of metric from the subset in results_df.
+
+    Returns (estimate, 95% half width, {workload: (estimate, half width)}).
+    """
+    ref_df = ref_df[['Workload', 'Run', metric]].rename(columns={metric: 'x'})
+    sample = results_df[results_df['Status'] == 'Pass'][['Workload', 'Run', metric]].rename(columns={metric: 'y'})
+    sample = sample.merge(ref_df, on=['Workload', 'Run'])
+    sample['x'] = sample['x'].astype(float)
+    sample['y'] = sample['y'].astype(float)
+
+    num_total = len(ref_df)
+    per_wl = {}
+    rel_var = []
+    for my_wl, wl_ref in ref_df.groupby('Workload'):
+        wl_sample = sample[sample['Workload'] == my_wl]
+        if wl_sample.empty:
+            continue
+        big_n = len(wl_ref)
+        n = len(wl_sample)
+        x_mean_all = wl_ref['x'].astype(float).mean()
+        ratio = wl_sample['y'].sum() / wl_sample['x'].sum() if wl_sample['x'].sum() > 0 else math.nan
+        if math.isnan(ratio):
+            estimate = wl_sample['y'].mean()
+            residuals = wl_sample['y'] - estimate
+        else:
+            estimate = ratio * x_mean_all
+            residuals = wl_sample['y'] - ratio * wl_sample['x']
+        var = math.nan
+        if n >= 2:
+            var = (1 - n / big_n) / n * residuals.var(ddof=1)
+            if estimate > 0:
+                rel_var.append(residuals.var(ddof=1) / estimate ** 2)
+        elif n == big_n:
+            var = 0.0
+        per_wl[my_wl] = [estimate, var, big_n, n]
+
+    # Workloads sampled with a single trace borrow the pooled relative residual variance
+    pooled_rel_var = np.mean(rel_var) if rel_var else math.nan
+    for my_wl, (estimate, var, big_n, n) in per_wl.items():
+        if math.isnan(var):
+            per_wl[my_wl][1] = (1 - n / big_n) / n * pooled_rel_var * estimate ** 2
+
+    covered = sum(big_n for _, _, big_n, _ in per_wl.values())
+    estimate = sum(big_n / covered * est for est, _, big_n, _ in per_wl.values())
+    var = sum((big_n / covered) ** 2 * v for _, v, big_n, _ in per_wl.values())
+    if covered < num_total:
+        print(f'Warning: subset covers {covered} of {num_total} reference traces, estimate ignores the missing workloads')
+    return estimate, Z_95 * math.sqrt(var), {my_wl: (est, Z_95 * math.sqrt(v)) for my_wl, (est, v, _, _) in per_wl.items()}
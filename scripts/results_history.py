@@ -0,0 +1,371 @@
+import os
+import re
+import html
+import time
+import shlex
+import shutil
+import socket
+import sqlite3
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Results history: every sweep of trace_exec_training_list.py is ingested into a SQLite database, keyed by the
+# git revision the cbp binary was built from, the predictor name, the sha256 of the binary and the simulator
+# arguments, and a static dashboard shows how the metrics of each configuration moved over the commits.
+#
+#   sweeps   one row per (git_rev, predictor, binary_hash, sim_args); re-ingesting a key replaces its runs
+#   runs     per trace results of a sweep (the METRICS columns of results.csv)
+#
+# A series is the sweeps of one (predictor, sim_args), in commit order. Change points are found per trace and
+# per workload (AMean over the traces common to all the sweeps of the series) by binary segmentation: the
+# split maximizing the two-sample t statistic is kept if the means differ by at least --min_change (relative;
+# --min_speed_change for ExecTime) and the statistic reaches T_THRESHOLD, then both sides are split again.
+# Deterministic metrics (MPKI of the same binary is exactly reproducible) have no variance of their own, so
+# the noise is floored at NOISE_FLOOR of the mean.
+#
+# The database defaults to $CBP_HISTORY_DB, else results_history.sqlite at the repository root.
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB = os.environ.get('CBP_HISTORY_DB', str(REPO_DIR / 'results_history.sqlite'))
+
+# results.csv column -> runs column
+METRICS = {'50PercMPKI': 'mpki_50perc', '50PercCycWPPKI': 'cyc_wp_pki_50perc', '50PercIPC': 'ipc_50perc', 'ExecTime': 'exec_time', 'MPKI': 'mpki'}
+DASHBOARD_METRICS = ['50PercMPKI', '50PercCycWPPKI', '50PercIPC', 'ExecTime']
+SPEED_METRICS = ['ExecTime']
+T_THRESHOLD = 4.0
+NOISE_FLOOR = 0.001
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY,
+    git_rev TEXT NOT NULL,
+    git_dirty INTEGER NOT NULL,
+    commit_time INTEGER NOT NULL,
+    commit_subject TEXT NOT NULL,
+    predictor TEXT NOT NULL,
+    binary_hash TEXT NOT NULL,
+    sim_args TEXT NOT NULL,
+    results_dir TEXT NOT NULL,
+    host TEXT NOT NULL,
+    ingest_time REAL NOT NULL,
+    UNIQUE (git_rev, predictor, binary_hash, sim_args)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    sweep_id INTEGER NOT NULL REFERENCES sweeps(id) ON DELETE CASCADE,
+    workload TEXT NOT NULL,
+    run TEXT NOT NULL,
+    status TEXT NOT NULL,
+    instr INTEGER,
+    {', '.join(f'{column} REAL' for column in METRICS.values())},
+    PRIMARY KEY (sweep_id, workload, run)
+);
+'''
+
+
+def connect(db_path=DEFAULT_DB):
+    con = sqlite3.connect(db_path, timeout=60)
+    con.execute('PRAGMA foreign_keys = ON')
+    con.executescript(SCHEMA)
+    return con
+
+
+def git_info(path, rev=None):
+    """(revision, dirty, commit time, subject) of rev (default: the checked out HEAD, dirty if it has local
+    changes) in the git checkout containing path; rev itself, or 'unknown', if git does not know it."""
+    def git(*git_args):
+        return subprocess.run(['git', '-C', str(path), *git_args], capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        full_rev, commit_time, subject = git('log', '-1', '--format=%H%n%ct%n%s', rev or 'HEAD').split('\n', 2)
+        dirty = not rev and bool(git('status', '--porcelain', '--untracked-files=no'))
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return rev or 'unknown', False, 0, ''
+    return full_rev, dirty, int(commit_time), subject
+
+
+def resolve_binary(cmd):
+    """Path of the binary of a cbp command ('./cbp -B' -> ./cbp)."""
+    binary = shlex.split(cmd)[0]
+    return Path(binary if os.sep in binary else (shutil.which(binary) or binary)).resolve()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ingest(df, predictor, cmd, sim_args, results_dir, db_path=DEFAULT_DB, git_rev=None, binary_hash=None):
+    """Stores the results of a sweep (a results.csv DataFrame) of the cbp command cmd; returns the sweep id.
+    The git revision and the binary hash are read from the binary of cmd and its checkout unless given."""
+    binary = resolve_binary(cmd)
+    rev, dirty, commit_time, subject = git_info(binary.parent, git_rev)
+    if binary_hash is None:
+        binary_hash = file_sha256(binary)[:16] if binary.exists() else 'unknown'
+    key = (rev, predictor, binary_hash, sim_args)
+    with connect(db_path) as con:
+        con.execute('INSERT INTO sweeps (git_rev, git_dirty, commit_time, commit_subject, predictor, binary_hash, sim_args, results_dir, host, ingest_time) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (git_rev, predictor, binary_hash, sim_args) DO UPDATE SET '
+                    'results_dir = excluded.results_dir, host = excluded.host, ingest_time = excluded.ingest_time',
+                    (rev, int(dirty), commit_time, subject, predictor, key[2], sim_args, str(Path(results_dir).resolve()), socket.gethostname(), time.time()))
+        sweep_id = con.execute('SELECT id FROM sweeps WHERE git_rev = ? AND predictor = ? AND binary_hash = ? AND sim_args = ?', key).fetchone()[0]
+        numeric = lambda value: None if pd.isna(value) else float(value)
+        rows = []
+        for _, row in df.iterrows():
+            values = [numeric(pd.to_numeric(row.get(column), errors='coerce')) for column in ['Instr', *METRICS]]
+            rows.append((sweep_id, row['Workload'], row['Run'], row['Status'], *values))
+        con.executemany(f'INSERT OR REPLACE INTO runs VALUES ({", ".join("?" * (5 + len(METRICS)))})', rows)
+    return sweep_id
+
+
+def load_history(db_path=DEFAULT_DB):
+    """(sweeps, runs) DataFrames; runs use the results.csv column names, passed runs only."""
+    with connect(db_path) as con:
+        sweeps = pd.read_sql_query('SELECT * FROM sweeps', con)
+        runs = pd.read_sql_query("SELECT * FROM runs WHERE status = 'Pass'", con)
+    runs = runs.rename(columns={column: metric for metric, column in METRICS.items()})
+    sweeps = sweeps.sort_values(['commit_time', 'ingest_time']).reset_index(drop=True)
+    sweeps['label'] = sweeps['git_rev'].str[:8] + np.where(sweeps['git_dirty'] == 1, '+', '')
+    return sweeps, runs
+
+
+def change_points(values, min_change, threshold=T_THRESHOLD):
+    """Indices where a new segment of values starts, by binary segmentation (see the header). NaN are ignored."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(values))
+    series = values[valid]
+    found = []
+
+    def split(lo, hi):
+        seg = series[lo:hi]
+        n = len(seg)
+        if n < 2:
+            return
+        cs, cs2 = np.cumsum(seg), np.cumsum(seg * seg)
+        k = np.arange(1, n)
+        mean_l, mean_r = cs[k - 1] / k, (cs[-1] - cs[k - 1]) / (n - k)
+        ss = (cs2[k - 1] - k * mean_l ** 2) + (cs2[-1] - cs2[k - 1] - (n - k) * mean_r ** 2)
+        scale = np.maximum(np.abs(mean_l), np.abs(mean_r))
+        noise = np.maximum(np.sqrt(np.maximum(ss, 0) / max(n - 2, 1)), NOISE_FLOOR * scale)
+        shift = np.abs(mean_r - mean_l)
+        score = np.where(noise > 0, shift / np.where(noise > 0, noise, 1) * np.sqrt(k * (n - k) / n), 0)
+        score[shift < min_change * scale] = 0
+        best = int(np.argmax(score))
+        if score[best] < threshold:
+            return
+        found.append(lo + best + 1)
+        split(lo, lo + best + 1)
+        split(lo + best + 1, hi)
+
+    split(0, len(series))
+    return sorted(int(valid[i]) for i in found)
+
+
+def detect_changes(table, min_change, min_speed_change, scope):
+    """table: rows = series points (sweeps), columns = (metric, name). Returns the change point rows."""
+    rows = []
+    for (metric, name), values in table.items():
+        points = change_points(values.to_numpy(), min_speed_change if metric in SPEED_METRICS else min_change)
+        # Before/After: means of the segments on each side of the change point
+        bounds = [0] + points + [len(values)]
+        for k, i in enumerate(points):
+            before, after = values.iloc[bounds[k]:i].mean(), values.iloc[i:bounds[k + 2]].mean()
+            rows.append({'Metric': metric, 'Scope': scope, 'Name': name, 'Index': i,
+                         'Before': before, 'After': after, 'Change': after / before - 1 if before else np.nan})
+    return rows
+
+
+# Dashboard rendering: self-contained HTML with inline SVG charts
+
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+STYLE = ('<style>body { font-family: sans-serif; } table { border-collapse: collapse; font-size: 13px; } '
+         'td, th { border: 1px solid #ccc; padding: 2px 8px; text-align: right; } .up { color: #c00; } .down { color: #080; } '
+         '.charts { display: flex; flex-wrap: wrap; gap: 12px; }</style>')
+
+
+def svg_chart(labels, lines, changes, title, width=460, height=220):
+    """Line chart of {name: values} over the sweep labels, with the change points {index: text} marked."""
+    left, right, top, bottom = 60, 10, 24, 46
+    all_values = np.concatenate([np.asarray(v, dtype=np.float64) for v in lines.values()]) if lines else np.array([])
+    all_values = all_values[~np.isnan(all_values)]
+    if not len(all_values):
+        return ''
+    lo, hi = float(all_values.min()), float(all_values.max())
+    pad = (hi - lo) * 0.08 or abs(hi) * 0.05 or 1.0
+    lo, hi = lo - pad, hi + pad
+    n = len(labels)
+    x = lambda i: left + (width - left - right) * (i / (n - 1) if n > 1 else 0.5)
+    y = lambda v: top + (height - top - bottom) * (1 - (v - lo) / (hi - lo))
+    parts = [f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg" font-size="10">',
+             f'<text x="{left}" y="14" font-size="12" font-weight="bold">{html.escape(title)}</text>',
+             f'<rect x="{left}" y="{top}" width="{width - left - right}" height="{height - top - bottom}" fill="none" stroke="#999"/>']
+    for frac in (0, 0.5, 1):
+        v = lo + (hi - lo) * frac
+        parts.append(f'<text x="{left - 4}" y="{y(v) + 3:.1f}" text-anchor="end">{v:.4g}</text>')
+    step = max(1, n // 8)
+    for i in range(0, n, step):
+        parts.append(f'<text x="{x(i):.1f}" y="{height - bottom + 12}" text-anchor="end" transform="rotate(-35 {x(i):.1f} {height - bottom + 12})">{html.escape(labels[i])}</text>')
+    for i, text in changes.items():
+        parts.append(f'<line x1="{x(i - 0.5):.1f}" x2="{x(i - 0.5):.1f}" y1="{top}" y2="{height - bottom}" stroke="#d00" stroke-dasharray="4,3">'
+                     f'<title>{html.escape(text)}</title></line>')
+    for (name, values), color in zip(lines.items(), COLORS * (len(lines) // len(COLORS) + 1)):
+        points = [(i, v) for i, v in enumerate(values) if not np.isnan(v)]
+        parts.append(f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{" ".join(f"{x(i):.1f},{y(v):.1f}" for i, v in points)}"><title>{html.escape(name)}</title></polyline>')
+        parts += [f'<circle cx="{x(i):.1f}" cy="{y(v):.1f}" r="2" fill="{color}"><title>{html.escape(name)} {html.escape(labels[i])}: {v:.4f}</title></circle>'
+                  for i, v in points]
+    legend_x = left
+    for name, color in zip(lines, COLORS * (len(lines) // len(COLORS) + 1)):
+        parts.append(f'<text x="{legend_x}" y="{height - 4}" fill="{color}">{html.escape(name)}</text>')
+        legend_x += 8 + 6 * len(name)
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def sparkline(values, changes, width=140, height=28):
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if valid.sum() == 0:
+        return ''
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    span = (hi - lo) or 1.0
+    n = len(values)
+    x = lambda i: 2 + (width - 4) * (i / (n - 1) if n > 1 else 0.5)
+    y = lambda v: height - 3 - (height - 6) * (v - lo) / span
+    points = ' '.join(f'{x(i):.1f},{y(v):.1f}' for i, v in enumerate(values) if not np.isnan(v))
+    marks = ''.join(f'<circle cx="{x(i):.1f}" cy="{y(values[i]):.1f}" r="2.5" fill="#d00"/>' for i in changes if valid[i])
+    return (f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg"><polyline fill="none" stroke="#1f77b4" '
+            f'stroke-width="1.2" points="{points}"/>{marks}</svg>')
+
+
+def format_change(change):
+    if np.isnan(change):
+        return ''
+    return f'<span class="{"up" if change > 0 else "down"}">{change:+.2%}</span>'
+
+
+def render_series(output_dir, slug, title, series_sweeps, series_runs, min_change, min_speed_change):
+    """Writes <slug>.html for one series; returns its change point rows."""
+    labels = list(series_sweeps['label'])
+    sweep_index = {sweep_id: i for i, sweep_id in enumerate(series_sweeps['id'])}
+    runs = series_runs.assign(point=series_runs['sweep_id'].map(sweep_index))
+    metrics = [m for m in DASHBOARD_METRICS if runs[m].notna().any()]
+
+    # Per trace: rows = points, columns = (metric, 'wl/run')
+    runs['trace'] = runs['workload'] + '/' + runs['run']
+    per_trace = runs.pivot_table(index='point', columns='trace', values=metrics, aggfunc='mean').reindex(range(len(labels)))
+    # Per workload: AMean over the traces present in every sweep of the series
+    common = runs.groupby('trace')['point'].nunique()
+    common_traces = set(common[common == len(labels)].index)
+    common_runs = runs[runs['trace'].isin(common_traces)]
+    per_wl = common_runs.pivot_table(index='point', columns='workload', values=metrics, aggfunc='mean').reindex(range(len(labels)))
+    all_wl = common_runs.groupby('point')[metrics].mean().reindex(range(len(labels)))
+    for metric in metrics:
+        per_wl[(metric, 'All')] = all_wl[metric]
+
+    changes = detect_changes(per_wl, min_change, min_speed_change, 'workload') + detect_changes(per_trace, min_change, min_speed_change, 'trace')
+    for change in changes:
+        sweep = series_sweeps.iloc[change['Index']]
+        change.update({'Commit': sweep['git_rev'][:12] + ('+' if sweep['git_dirty'] else ''), 'Subject': sweep['commit_subject'], 'Binary': sweep['binary_hash']})
+
+    charts = []
+    for metric in metrics:
+        lines = {wl: per_wl[(metric, wl)].to_numpy() for wl in per_wl[metric].columns}
+        marks = {c['Index']: f"{c['Name']}: {c['Before']:.4f} -> {c['After']:.4f} at {c['Commit']}" for c in changes if c['Scope'] == 'workload' and c['Metric'] == metric}
+        charts.append(svg_chart(labels, lines, marks, f'{metric} (AMean of {len(common_traces)} common traces)'))
+
+    change_df = pd.DataFrame(changes, columns=['Metric', 'Scope', 'Name', 'Index', 'Commit', 'Subject', 'Binary', 'Before', 'After', 'Change'])
+    change_df = change_df.sort_values(['Scope', 'Metric', 'Index'], ascending=[False, True, True])
+    change_table = change_df.assign(Change=change_df['Change'].map(format_change), Subject=change_df['Subject'].map(html.escape)).drop(columns='Index') \
+        .to_html(index=False, escape=False, float_format=lambda v: f'{v:.4f}') if len(change_df) else '<p>No change point.</p>'
+
+    trace_rows = []
+    for trace in sorted(per_trace.columns.get_level_values(1).unique()):
+        row = {'Trace': trace}
+        for metric in metrics:
+            values = per_trace[(metric, trace)].to_numpy() if (metric, trace) in per_trace else np.full(len(labels), np.nan)
+            points = [c['Index'] for c in changes if c['Scope'] == 'trace' and c['Metric'] == metric and c['Name'] == trace]
+            last = values[~np.isnan(values)][-1] if (~np.isnan(values)).any() else np.nan
+            row[metric] = f'{sparkline(values, points)} {last:.4f}'
+        trace_rows.append(row)
+    trace_table = pd.DataFrame(trace_rows).to_html(index=False, escape=False)
+
+    sweep_table = series_sweeps[['label', 'commit_subject', 'binary_hash', 'results_dir', 'host']].assign(
+        ingest_time=pd.to_datetime(series_sweeps['ingest_time'], unit='s').dt.strftime('%Y-%m-%d %H:%M'),
+        traces=series_sweeps['id'].map(series_runs.groupby('sweep_id').size()).fillna(0).astype(int)).to_html(index=False)
+    with open(Path(output_dir) / f'{slug}.html', 'w') as f:
+        f.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>\n{STYLE}</head>\n'
+                f'<body><p><a href="index.html">all series</a></p><h3>{html.escape(title)}</h3>\n'
+                f'<div class="charts">{"".join(charts)}</div>\n<h4>Change points</h4>\n{change_table}\n'
+                f'<h4>Per trace (red: change points, value of the last sweep)</h4>\n{trace_table}\n<h4>Sweeps</h4>\n{sweep_table}\n</body></html>\n')
+    return changes
+
+
+def render_dashboard(output_dir, db_path, min_change, min_speed_change, predictors=None):
+    sweeps, runs = load_history(db_path)
+    if predictors:
+        sweeps = sweeps[sweeps['predictor'].isin(predictors)]
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    index_rows = []
+    for (predictor, sim_args), series_sweeps in sweeps.groupby(['predictor', 'sim_args'], sort=True):
+        series_sweeps = series_sweeps.reset_index(drop=True)
+        series_runs = runs[runs['sweep_id'].isin(series_sweeps['id'])]
+        if series_runs.empty:
+            continue
+        title = f'{predictor} {sim_args}'.strip()
+        slug = re.sub(r'[^\w.-]+', '_', title)
+        changes = render_series(output_dir, slug, title, series_sweeps, series_runs, min_change, min_speed_change)
+        wl_changes = [c for c in changes if c['Scope'] == 'workload']
+        last = series_sweeps.iloc[-1]
+        index_rows.append({'Series': f'<a href="{slug}.html">{html.escape(title)}</a>', 'Sweeps': len(series_sweeps),
+                           'Last commit': f"{last['label']} {html.escape(last['commit_subject'])}",
+                           'Workload change points': len(wl_changes), 'Trace change points': len(changes) - len(wl_changes),
+                           'Latest workload changes': '<br>'.join(f"{c['Metric']} {html.escape(c['Name'])} {format_change(c['Change'])} at {c['Commit']}"
+                                                                  for c in sorted(wl_changes, key=lambda c: -c['Index'])[:5])})
+    table = pd.DataFrame(index_rows).to_html(index=False, escape=False) if index_rows else '<p>No sweep ingested.</p>'
+    with open(Path(output_dir) / 'index.html', 'w') as f:
+        f.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Results history</title>\n{STYLE}</head>\n'
+                f'<body><h3>Results history ({len(sweeps)} sweeps, {db_path})</h3>\n{table}\n</body></html>\n')
+    return index_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Results history of the cbp sweeps: ingest results.csv files and render the trend dashboard.')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'history database (default: $CBP_HISTORY_DB or {DEFAULT_DB})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='ingest the results.csv of a sweep (e.g. an older results directory)')
+    ingest_parser.add_argument('--results_dir', required=True, help='results directory holding results.csv')
+    ingest_parser.add_argument('--predictor', required=True, help='predictor name of the sweep')
+    ingest_parser.add_argument('--cmd', default='./cbp', help='cbp binary and simulator arguments of the sweep (default: ./cbp)')
+    ingest_parser.add_argument('--git_rev', help='git revision the binary was built from (default: HEAD of the checkout of the binary)')
+    ingest_parser.add_argument('--binary_hash', help='binary hash of the sweep (default: sha256 of the binary of --cmd, "unknown" if it is gone)')
+    dashboard_parser = subparsers.add_parser('dashboard', help='render the static trend dashboard')
+    dashboard_parser.add_argument('-o', '--output_dir', default='history_dashboard', help='output directory (default: history_dashboard)')
+    dashboard_parser.add_argument('--predictor', action='append', help='only these predictors (repeatable)')
+    dashboard_parser.add_argument('--min_change', type=float, default=0.01, help='smallest relative shift of MPKI/CycWPPKI/IPC reported as a change point (default: 0.01)')
+    dashboard_parser.add_argument('--min_speed_change', type=float, default=0.10, help='smallest relative shift of ExecTime reported as a change point (default: 0.10)')
+    subparsers.add_parser('list', help='print the ingested sweeps')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        df = pd.read_csv(Path(args.results_dir) / 'results.csv')
+        sim_args = ' '.join(shlex.split(args.cmd)[1:])
+        sweep_id = ingest(df, args.predictor, args.cmd, sim_args, args.results_dir, args.db, args.git_rev, args.binary_hash)
+        print(f'Ingested {len(df)} runs of {args.results_dir} as sweep {sweep_id}')
+    elif args.command == 'dashboard':
+        index_rows = render_dashboard(args.output_dir, args.db, args.min_change, args.min_speed_change, args.predictor)
+        print(f'Dashboard of {len(index_rows)} series saved to {args.output_dir} (index.html)')
+    else:
+        sweeps, runs = load_history(args.db)
+        sweeps['runs'] = sweeps['id'].map(runs.groupby('sweep_id').size()).fillna(0).astype(int)
+        sweeps['ingest_time'] = pd.to_datetime(sweeps['ingest_time'], unit='s').dt.strftime('%Y-%m-%d %H:%M')
+        print(sweeps[['id', 'label', 'predictor', 'binary_hash', 'sim_args', 'runs', 'ingest_time', 'results_dir']].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,30 +9,125 @@ import multiprocessing as mp
 from numpy import random
 from time import sleep
 import argparse
+import shlex
+import sys
+import json
 from pathlib import Path
+from trace_store import TraceStore
+from trace_paths import get_trace_paths, get_run_key
+import quick_subset
+import cpu_topology
+import cbp_daemon
+import trace_fanout
+import results_history
 #from scipy.stats import gmean
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--trace_dir', help='path to trace directory', required= True)
 parser.add_argument('--results_dir', help='path to results directory', required= True)
+parser.add_argument('--trace_store', help='content-addressed trace store; traces are deduplicated into it and run from there')
+parser.add_argument('--stage_dir', help='local (tmpfs/SSD) cache the traces of this sweep are staged into (requires --trace_store)')
+parser.add_argument('--stage_cap_gb', type=float, default=16, help='size cap of --stage_dir in GB, enforced by LRU eviction (default: 16)')
+parser.add_argument('--recompress_level', type=int, choices=range(1, 10), help='recompress traces with this gzip level when adding them to --trace_store')
+parser.add_argument('--quick', type=int, default=0, help='only run a workload-stratified subset of this many traces and estimate the full-set AMean')
+parser.add_argument('--reference', default=str(Path(__file__).resolve().parent.parent / 'reference_results_training_set.csv'), help='results csv used to pick the --quick subset (default: reference_results_training_set.csv)')
+parser.add_argument('--jobs', type=int, help='number of concurrent cbp runs (default: number of worker slots with --pin, else number of CPUs)')
+parser.add_argument('--pin', action='store_true', help='pin each worker and its cbp runs to a dedicated physical core (kept on one NUMA node)')
+parser.add_argument('--use_smt', action='store_true', help='with --pin, use every hardware thread instead of one per physical core')
+parser.add_argument('--auto_jobs', action='store_true', help='probe increasing concurrency levels on the first runs and keep the one with the highest aggregate instr/sec')
+parser.add_argument('--direction_only', action='store_true', help='run cbp -B: conditional branch MPKI only, without the timing model (cycle-based columns are nan)')
+parser.add_argument('--daemon', nargs='?', const=cbp_daemon.DEFAULT_SOCKET, help=f'run through the cbp_daemon.py listening on this socket instead of a local pool (default socket: {cbp_daemon.DEFAULT_SOCKET})')
+parser.add_argument('--priority', type=int, default=0, help='with --daemon, priority of the runs, higher runs first (default: 0)')
+parser.add_argument('--preempt', action='store_true', help='with --daemon, suspend lower-priority runs when no slot is free')
+parser.add_argument('--variant', action='append', metavar='NAME=CMD', help='run every trace through this cbp command (binary and options, e.g. tage="./cbp_tage" or pf="./cbp -P"); results go to <results_dir>/NAME (repeatable; default: ./cbp into <results_dir>)')
+parser.add_argument('--fanout', action='store_true', help='with --variant, read each trace once and stream it through named pipes to the cbp runs of all the variants at once')
+parser.add_argument('--fanout_buffer_mb', type=int, default=trace_fanout.DEFAULT_BUFFER_BYTES // (1024 * 1024), help=f'with --fanout, how far (MB of trace) the fastest run of a group may get ahead of the slowest (default: {trace_fanout.DEFAULT_BUFFER_BYTES // (1024 * 1024)})')
+parser.add_argument('--history_db', default=results_history.DEFAULT_DB, help=f'results history database every sweep is ingested into (default: $CBP_HISTORY_DB or {results_history.DEFAULT_DB})')
+parser.add_argument('--no_history', action='store_true', help='do not ingest this sweep into --history_db')
+parser.add_argument('--predictor_name', help='predictor name of the sweep in the results history (default: the --variant names, else the name of the cbp binary)')
+parser.add_argument('--time_sample_period', type=int, default=0, help='pass -t <n> to cbp to sample the decompression/uarch time breakdown every n steps (0 disables)')
 
 args = parser.parse_args()
 trace_dir = Path(args.trace_dir)
 results_dir = Path(args.results_dir)
 
-def get_trace_paths(start_path):
-    ret_list = []
-    for root, dirs, files in os.walk(start_path):
-        for my_file in files:
-            if(my_file.endswith('_trace.gz')):
-                ret_list.append(os.path.join(root, my_file))
-    return ret_list
+def parse_variant(spec):
+    # 'tage=./cbp_tage -P' -> ('tage', './cbp_tage -P')
+    name, sep, cmd = spec.partition('=')
+    if not sep or not re.fullmatch(r'[\w.-]+', name) or not cmd.strip():
+        parser.error(f'--variant {spec}: expected NAME=CMD, NAME made of letters, digits, ".", "_" and "-"')
+    return name, cmd.strip()
+
+# (name, cbp command); the unnamed default variant writes its results directly into results_dir
+variants = [parse_variant(spec) for spec in args.variant] if args.variant else [('', './cbp')]
+if len({name for name, _ in variants}) != len(variants):
+    parser.error('--variant names must be unique')
+
+def get_variant_results_dir(variant_name):
+    return results_dir / variant_name if variant_name else results_dir
+
+def get_stats_file(op_file):
+    # results/int/int_0_trace.log -> results/int/int_0_trace.json (cbp -S)
+    return os.path.splitext(op_file)[0] + '.json'
+
+def format_cond_dir_stats(prefix, window, timing=True):
+    # Same values/formatting as the text report columns; without timing (cbp -B, direction-only mode) the
+    # cycle-based columns are 'nan'
+    if not timing:
+        window = dict(window, **{key: float('nan') for key in ['Cycles', 'IPC', 'BrPerCyc', 'MispBrPerCyc', 'CycWP', 'CycWPAvg', 'CycWPPKI']})
+    return {
+            f'{prefix}Instr'          : window['Instr'],
+            f'{prefix}Cycles'         : window['Cycles'],
+            f'{prefix}IPC'            : f"{window['IPC']:.4f}",
+            f'{prefix}NumBr'          : window['NumBr'],
+            f'{prefix}MispBr'         : window['MispBr'],
+            f'{prefix}BrPerCyc'       : f"{window['BrPerCyc']:.4f}",
+            f'{prefix}MispBrPerCyc'   : f"{window['MispBrPerCyc']:.4f}",
+            f'{prefix}MR'             : f"{window['MR']:.4f}%",
+            f'{prefix}MPKI'           : f"{window['MPKI']:.4f}",
+            f'{prefix}CycWP'          : window['CycWP'],
+            f'{prefix}CycWPAvg'       : f"{window['CycWPAvg']:.4f}",
+            f'{prefix}CycWPPKI'       : f"{window['CycWPPKI']:.4f}",
+    }
+
+def process_run_stats(my_trace_path, my_run_name, stats_file):
+    # Reads the cbp -S stats file (plus the 'run' info added by execute_trace); None if it is missing or unusable
+    try:
+        with open(stats_file) as f:
+            stats = json.load(f)
+        run_info = stats['run']
+        retval = {
+                'Workload'                : my_run_name.split('/')[0],
+                'Run'                     : my_run_name.split('/')[1],
+                'TraceSize'               : os.path.getsize(my_trace_path)/(1024 * 1024),
+                'Status'                  : 'Pass',
+                'ExecTime'                : run_info['ExecTime'],
+        }
+        timing = stats.get('mode') != 'direction_only'
+        retval.update(format_cond_dir_stats('', stats['cond_dir']['Full'], timing))
+        retval.update(format_cond_dir_stats('50Perc', stats['cond_dir']['50Perc'], timing))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    time_breakdown = stats.get('time_breakdown', {})
+    for key in resource_usage_keys:
+        if key in run_info:
+            retval[key] = run_info[key]
+        elif time_breakdown.get(key) is not None:
+            retval[key] = f'{time_breakdown[key]:.4f}'
+        else:
+            retval[key] = 0
+    retval.update(stats.get('hook_profile', {}))
+    return retval
 
 def process_run_op(pass_status, my_trace_path, my_run_name, op_file):
     run_name_split = re.split(r"\/", my_run_name)
     wl_name = run_name_split[0]
     run_name = run_name_split[1]
+    if pass_status:
+        retval = process_run_stats(my_trace_path, my_run_name, get_stats_file(op_file))
+        if retval is not None:
+            return retval
     print(f'Extracting data from : {op_file} |  WL:{wl_name} | Run:{run_name}')
     exec_time = 0
 
@@ -62,7 +157,10 @@ def process_run_op(pass_status, my_trace_path, my_run_name, op_file):
     _50PercCycWPAvg = 0
     _50PercCycWPPKI = 0
 
-    trace_size = os.path.getsize(trace_path)/(1024 * 1024)
+    # Resource usage of the cbp child (written by execute_trace) and sampled time breakdown (cbp -t)
+    resource_usage = {key: 0 for key in resource_usage_keys}
+
+    trace_size = os.path.getsize(my_trace_path)/(1024 * 1024)
 
     pass_status_str = 'Fail'
 
@@ -86,6 +184,10 @@ def process_run_op(pass_status, my_trace_path, my_run_name, op_file):
                 if('ExecTime' in line):
                     exec_time = line.strip().split()[-1]
 
+                for key in resource_usage_keys:
+                    if line.startswith(key):
+                        resource_usage[key] = line.strip().split()[-1].rstrip('%')
+
                 if(not process_50perc_section and _50perc_section_header in line):
                     process_50perc_section = True
                     process_100perc_section = False
@@ -169,31 +271,193 @@ def process_run_op(pass_status, my_trace_path, my_run_name, op_file):
             '50PercCycWPAvg'          : _50PercCycWPAvg,
             '50PercCycWPPKI'          : _50PercCycWPPKI,
     }
+    retval.update(resource_usage)
+    if pass_status:
+        with open(op_file, "r") as text_file:
+            retval.update(parse_hook_profile(text_file))
     return retval
 
 my_traces = get_trace_paths(trace_dir)
 
 print(f'Got {len(my_traces)} traces')
 
+if args.quick:
+    ref_df = quick_subset.load_reference(args.reference)
+    num_workloads = ref_df['Workload'].nunique()
+    if args.quick < num_workloads:
+        parser.error(f'--quick {args.quick} is below the {num_workloads} workloads of {args.reference}, the subset needs one trace per workload')
+    quick_keys = set(quick_subset.select_quick_subset(ref_df, args.quick))
+    my_traces = [t for t in my_traces if get_run_key(t) in quick_keys]
+    print(f'Quick mode: running {len(my_traces)} of {len(quick_keys)} selected traces')
+
 timestamp = datetime.datetime.now().strftime("%m_%d_%H-%M-%S")
 if not os.path.exists(f'{results_dir}'):
     os.mkdir(results_dir)
 
-def execute_trace(my_trace_path):
+# Columns filled from 'Key = value' lines of the run log
+resource_usage_keys = ['UserTime', 'SysTime', 'MaxRSSMB', 'ReadBytes', 'VolCtxSw', 'InvolCtxSw', 'UarchShare', 'TraceReadShare', 'DecompressShare']
+
+# Columns of each row of the HOOK PROFILE table of cbp builds with hook profiling (hook_profiler.h)
+hook_profile_columns = {'Calls': 'Calls', 'AvgNs': 'Ns', 'Share': 'Share'}
+
+def parse_hook_profile(lines):
+    # {<Hook>HookCalls, <Hook>HookNs, <Hook>HookShare} of the HOOK PROFILE table of a run log, empty without one
+    retval = {}
+    names = None
+    for line in lines:
+        if names is None:
+            if 'HOOK PROFILE' in line:
+                names = []
+            continue
+        if not names:
+            names = line.split()
+            continue
+        if line.startswith('-'):
+            break
+        row = dict(zip(names, line.split()))
+        for name, column in hook_profile_columns.items():
+            if name in row:
+                retval[f"{row['Hook']}Hook{column}"] = row[name].rstrip('%')
+    return retval
+
+def run_with_rusage(exec_cmd):
+    # Like subprocess.check_output, but also returns the child's rusage (wait4)
+    proc = subprocess.Popen(exec_cmd, shell=True, stdout=subprocess.PIPE, text=True)
+    run_op = proc.stdout.read()
+    proc.stdout.close()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, exec_cmd, output=run_op)
+    return run_op, rusage
+
+def get_rusage_dict(rusage):
+    # ru_maxrss is in KB on Linux and in bytes on macOS; ru_inblock counts 512-byte blocks
+    max_rss_mb = rusage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else rusage.ru_maxrss / 1024
+    return {'UserTime': rusage.ru_utime,
+            'SysTime': rusage.ru_stime,
+            'MaxRSSMB': max_rss_mb,
+            'ReadBytes': rusage.ru_inblock * 512,
+            'VolCtxSw': rusage.ru_nvcsw,
+            'InvolCtxSw': rusage.ru_nivcsw}
+
+def format_rusage(rusage_dict):
+    return '\n'.join(f'{key} = {value}' for key, value in rusage_dict.items())
+
+def add_run_info(stats_file, exec_time, rusage_dict, hook_profile):
+    # Appends the runner-side measurements to the cbp stats file so it is the only file read back
+    try:
+        with open(stats_file) as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        print(f'No usable stats file {stats_file}, results will be parsed from the log')
+        return
+    stats['run'] = {'ExecTime': exec_time, **rusage_dict}
+    if hook_profile:
+        stats['hook_profile'] = hook_profile
+    tmp_file = f'{stats_file}.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmp_file, stats_file)
+
+# Trace path -> path cbp actually reads (staged copy), set in each pool worker
+exec_paths = {}
+# Slots of this pool worker (one per cbp run of a fan-out group), set in each pool worker with --pin
+worker_slots = None
+
+def set_exec_paths(my_exec_paths):
+    global exec_paths
+    exec_paths = my_exec_paths
+
+def init_worker(my_exec_paths, slot_queue, slots_per_worker=1):
+    # Pool initializer: takes free slots and pins this worker (and the cbp children it forks) to them
+    global worker_slots
+    set_exec_paths(my_exec_paths)
+    if slot_queue is not None:
+        worker_slots = [slot_queue.get() for _ in range(slots_per_worker)]
+        os.sched_setaffinity(0, set().union(*worker_slots))
+
+def make_slot_queue(slots, num_slots):
+    if slots is None:
+        return None
+    slot_queue = mp.Queue()
+    for my_slot in slots[:num_slots]:
+        slot_queue.put(my_slot)
+    return slot_queue
+
+def run_traces(my_tasks, my_exec_paths, num_jobs, slots):
+    # my_tasks: (trace path, variant) pairs
+    with mp.Pool(processes=num_jobs, initializer=init_worker, initargs=(my_exec_paths, make_slot_queue(slots, num_jobs))) as pool:
+        return pool.map(execute_trace, my_tasks)
+
+def run_groups(my_traces, my_exec_paths, num_groups, slots):
+    # Fan-out: one worker per trace group, each cbp run of the group on a slot of its own
+    slot_queue = make_slot_queue(slots, num_groups * len(variants))
+    with mp.Pool(processes=num_groups, initializer=init_worker, initargs=(my_exec_paths, slot_queue, len(variants))) as pool:
+        group_results = pool.map(execute_group, my_traces)
+    return [result for my_results, _ in group_results for result in my_results], [stats for _, stats in group_results if stats]
+
+def aggregate_instr_rate(my_results):
+    # Sum of the per-run simulated instr/sec, i.e. the throughput while the runs shared the machine
+    rates = []
+    for pass_status, my_trace_path, op_file, my_run_name, _ in my_results:
+        run_dict = process_run_op(pass_status, my_trace_path, my_run_name, op_file)
+        if pass_status and float(run_dict['ExecTime']) > 0:
+            rates.append(float(run_dict['Instr']) / float(run_dict['ExecTime']))
+    return sum(rates) / len(rates) * len(my_results) if rates else 0
+
+def auto_tune_jobs(my_tasks, my_exec_paths, max_jobs, slots):
+    # Runs one batch of traces per probed concurrency level (1/4, 1/2, 3/4, all slots), stopping once the
+    # aggregate rate improves by less than 5%. Returns (chosen level, probe results, runs left).
+    results = []
+    best_jobs, best_rate = max_jobs, 0
+    for num_jobs in sorted({max(1, max_jobs * i // 4) for i in range(1, 5)}):
+        if len(my_tasks) < num_jobs:
+            break
+        batch, my_tasks = my_tasks[:num_jobs], my_tasks[num_jobs:]
+        batch_results = run_traces(batch, my_exec_paths, num_jobs, slots)
+        results += batch_results
+        rate = aggregate_instr_rate(batch_results)
+        print(f'Auto jobs: {num_jobs} concurrent runs -> {rate / 1e6:.2f} M instr/sec')
+        if rate < best_rate * 1.05:
+            break
+        best_jobs, best_rate = num_jobs, rate
+    print(f'Auto jobs: using {best_jobs} concurrent runs')
+    return best_jobs, results, my_tasks
+
+def prepare_run(my_trace_path, my_exec_path, variant=variants[0]):
+    # Creates the results directory of the run and returns its name, log file, stats file and cbp command
     assert(os.path.exists(my_trace_path))
-        
-    run_split = re.split(r"\/", my_trace_path)
-    my_wl = run_split[-2] 
-    # traces/int/int_0_trace.gz
-    run_name = run_split[-1].split(".")[-2]
-    if not os.path.exists(f'{results_dir}/{my_wl}'):
-        if not os.path.exists(f'{results_dir}/{my_wl}'):
-            os.makedirs(f'{results_dir}/{my_wl}', exist_ok=True)
+    variant_name, variant_cmd = variant
+    my_results_dir = get_variant_results_dir(variant_name)
+    my_wl, run_name = get_run_key(my_trace_path)
+    if not os.path.exists(f'{my_results_dir}/{my_wl}'):
+        if not os.path.exists(f'{my_results_dir}/{my_wl}'):
+            os.makedirs(f'{my_results_dir}/{my_wl}', exist_ok=True)
 
-    do_process = True
     my_run_name = f'{my_wl}/{run_name}'
-    exec_cmd = f'./cbp {my_trace_path}'
-    op_file = f'{results_dir}/{my_wl}/{run_name}.log'
+    time_sample_opt = f'-t {args.time_sample_period} ' if args.time_sample_period else ''
+    op_file = f'{my_results_dir}/{my_wl}/{run_name}.log'
+    stats_file = get_stats_file(op_file)
+    direction_only_opt = '-B ' if args.direction_only else ''
+    exec_cmd = f'{variant_cmd} {direction_only_opt}{time_sample_opt}-S {stats_file} {my_exec_path}'
+    if os.path.exists(stats_file):
+        os.remove(stats_file)
+    return my_run_name, op_file, stats_file, exec_cmd
+
+def record_run(op_file, stats_file, exec_cmd, run_op, exec_time, rusage_dict):
+    with open(op_file, "w") as text_file:
+        print(f"CMD:{exec_cmd}", file=text_file)
+        print(f"{run_op}", file=text_file)
+        print(f"ExecTime = {exec_time}", file=text_file)
+        print(format_rusage(rusage_dict), file=text_file)
+    add_run_info(stats_file, exec_time, rusage_dict, parse_hook_profile(run_op.splitlines()))
+
+def execute_trace(task):
+    my_trace_path, variant = task
+    my_exec_path = exec_paths.get(my_trace_path, my_trace_path)
+    my_run_name, op_file, stats_file, exec_cmd = prepare_run(my_trace_path, my_exec_path, variant)
+    do_process = True
     # if os.path.exists(op_file):
     #     #print(f"OP file:{op_file} already exists. Not running again!")
     #     do_process = False
@@ -203,32 +467,92 @@ def execute_trace(my_trace_path):
         print(f'Begin processing run:{my_run_name}')
         try:
             begin_time = time.time()
-            run_op = subprocess.check_output(exec_cmd, shell=True, text=True)
+            run_op, rusage = run_with_rusage(exec_cmd)
             end_time = time.time()
             exec_time = end_time - begin_time
-            with open(op_file, "w") as text_file:
-                print(f"CMD:{exec_cmd}", file=text_file)
-                print(f"{run_op}", file=text_file)
-                print(f"ExecTime = {exec_time}", file=text_file)
+            record_run(op_file, stats_file, exec_cmd, run_op, exec_time, get_rusage_dict(rusage))
         except:
             print(f'Run: {my_run_name} failed')
             pass_status = False
-    return(pass_status, my_trace_path, op_file, my_run_name)
+    return(pass_status, my_trace_path, op_file, my_run_name, variant[0])
 
+def execute_group(my_trace_path):
+    # Fan-out: the runs of all the variants on one trace, fed by trace_fanout from a single read of the trace.
+    # Returns the results of the runs and the fan-out statistics (None if the group could not be started).
+    my_exec_path = exec_paths.get(my_trace_path, my_trace_path)
+    runs = [prepare_run(my_trace_path, my_exec_path, variant) for variant in variants]
+    my_run_name = runs[0][0]
+    print(f'Begin processing run:{my_run_name} ({len(variants)} variants, fan-out)')
+    # exec_cmd ends with the trace path, the pipe of each run takes its place
+    commands = [shlex.split(exec_cmd)[:-1] for _, _, _, exec_cmd in runs]
+    out_files = [f'{op_file}.out' for _, op_file, _, _ in runs]
+    try:
+        stats, group_runs = trace_fanout.run_group(my_exec_path, commands, [name for name, _ in variants], out_files,
+                                                   args.fanout_buffer_mb * 1024 * 1024, worker_slots)
+    except OSError as e:
+        print(f'Run: {my_run_name} fan-out failed: {e}')
+        return [(False, my_trace_path, op_file, my_run_name, name) for (name, _), (_, op_file, _, _) in zip(variants, runs)], None
 
+    results = []
+    for (variant_name, _), (_, op_file, stats_file, exec_cmd), (returncode, exec_time, rusage) in zip(variants, runs, group_runs):
+        pass_status = returncode == 0
+        try:
+            with open(f'{op_file}.out') as f:
+                run_op = f.read()
+            os.remove(f'{op_file}.out')
+            if pass_status:
+                record_run(op_file, stats_file, exec_cmd, run_op, exec_time, get_rusage_dict(rusage))
+        except OSError:
+            pass_status = False
+        if not pass_status:
+            print(f'Run: {my_run_name} ({variant_name}) failed')
+        results.append((pass_status, my_trace_path, op_file, my_run_name, variant_name))
+    print(f"Fan-out run:{my_run_name} | read {stats['TraceBytes'] / 2**20:.1f} MB once for {stats['Consumers']} runs | "
+          f"saved {stats['SavedBytes'] / 2**20:.1f} MB | waited {stats['StallSeconds']:.1f}s on the slowest run")
+    return results, stats
 
-if __name__ == '__main__':
-    # For parallel runs:
-    with mp.Pool() as pool:
-        results = pool.map(execute_trace, my_traces)
-    
-    # For serial runs:
-    #results = []
-    #for my_trace in my_traces:
-    #    results.append(execute_trace(my_trace))
-    
-    df = pd.DataFrame(columns=['Workload', 'Run', 'TraceSize', 'ExecTime', 'Instr', 'Cycles', 'IPC', 'NumBr', 'MispBr', 'BrPerCyc', 'MispBrPerCyc', 'MR', 'MPKI', 'CycWP',  'CycWPAvg', 'CycWPPKI', '50PercInstr', '50PercCycles', '50PercIPC', '50PercNumBr', '50PercMispBr', '50PercBrPerCyc', '50PercMispBrPerCyc', '50PercMR', '50PercMPKI', '50PercCycWP', '50PercCycWPAvg', '50PercCycWPPKI'])
-    for my_result in results:
+def run_traces_daemon(my_tasks, my_exec_paths):
+    # Same results as run_traces, but the runs are queued on cbp_daemon.py, which owns the worker slots. ExecTime
+    # excludes the time a run spent suspended by higher-priority runs.
+    runs = [prepare_run(my_trace_path, my_exec_paths.get(my_trace_path, my_trace_path), variant) for my_trace_path, variant in my_tasks]
+    jobs = [{'cmd': shlex.split(exec_cmd), 'cwd': os.getcwd(), 'stdout': os.path.abspath(f'{op_file}.out'), 'name': my_run_name}
+            for my_run_name, op_file, _, exec_cmd in runs]
+    print(f'Submitting {len(jobs)} runs to the cbp daemon on {args.daemon} (priority {args.priority}{", preempt" if args.preempt else ""})')
+    results = [None] * len(runs)
+    for job in cbp_daemon.run_jobs(jobs, args.priority, args.preempt, args.daemon):
+        my_run_name, op_file, stats_file, exec_cmd = runs[job['index']]
+        pass_status = job['state'] == 'done'
+        try:
+            with open(f'{op_file}.out') as f:
+                run_op = f.read()
+            os.remove(f'{op_file}.out')
+            if pass_status:
+                record_run(op_file, stats_file, exec_cmd, run_op, job['ExecTime'], job['rusage'])
+        except OSError:
+            pass_status = False
+        suspended = f", suspended {job['Suspensions']} times" if job['Suspensions'] else ''
+        print(f"{'Finished' if pass_status else 'Failed'} run:{my_run_name} | queued {job['QueueTime']:.1f}s | ran {job['ExecTime']:.1f}s{suspended}")
+        my_trace_path, (variant_name, _) = my_tasks[job['index']]
+        results[job['index']] = (pass_status, my_trace_path, op_file, my_run_name, variant_name)
+    return results
+
+
+
+def ingest_history(df, variant, my_results_dir):
+    # Records the sweep of a variant in the results history (results_history.py), keyed by the git revision and
+    # hash of its binary and by the simulator arguments besides -S and the trace
+    variant_name, variant_cmd = variant
+    predictor = variant_name or args.predictor_name or os.path.basename(shlex.split(variant_cmd)[0])
+    sim_args = shlex.split(variant_cmd)[1:] + (['-B'] if args.direction_only else []) + (['-t', str(args.time_sample_period)] if args.time_sample_period else [])
+    try:
+        sweep_id = results_history.ingest(df, predictor, variant_cmd, ' '.join(sim_args), my_results_dir, args.history_db)
+        print(f'Results history: sweep {sweep_id} ({predictor}) ingested into {args.history_db}')
+    except (OSError, results_history.sqlite3.Error) as e:
+        print(f'Results history: could not ingest the sweep into {args.history_db}: {e}')
+
+def report_results(my_results, my_results_dir):
+    df = pd.DataFrame(columns=['Workload', 'Run', 'TraceSize', 'ExecTime', 'Instr', 'Cycles', 'IPC', 'NumBr', 'MispBr', 'BrPerCyc', 'MispBrPerCyc', 'MR', 'MPKI', 'CycWP',  'CycWPAvg', 'CycWPPKI', '50PercInstr', '50PercCycles', '50PercIPC', '50PercNumBr', '50PercMispBr', '50PercBrPerCyc', '50PercMispBrPerCyc', '50PercMR', '50PercMPKI', '50PercCycWP', '50PercCycWPAvg', '50PercCycWPPKI'] + resource_usage_keys)
+    for my_result in my_results:
         pass_status = my_result[0]
         trace_path = my_result[1]
         op_file = my_result[2]
@@ -241,7 +565,7 @@ if __name__ == '__main__':
         else:
             df = my_df.copy()
     print(df)
-    df.to_csv(f'{results_dir}/results.csv', index=False)
+    df.to_csv(f'{my_results_dir}/results.csv', index=False)
     
     
     unique_wls = df['Workload'].unique()
@@ -262,3 +586,88 @@ if __name__ == '__main__':
     print(f'Branch Misprediction PKI(BrMisPKI) AMean : {br_misp_pki_amean}')
     print(f'Cycles On Wrong-Path PKI(CycWpPKI) AMean : {cyc_wp_pki_amean}')
     print('-----------------------------------------------------------------------------------------------------------')
+
+    if args.quick:
+        print('\n\n--------------------------------Estimated Full-Set Aggregate Metrics (Quick Mode)--------------------------------\n')
+        for my_metric, my_label in [('50PercMPKI', 'Branch Misprediction PKI(BrMisPKI)'), ('50PercCycWPPKI', 'Cycles On Wrong-Path PKI(CycWpPKI)')]:
+            estimate, half_width, per_wl = quick_subset.estimate_full_set(df, ref_df, my_metric)
+            for my_wl, (wl_estimate, wl_half_width) in per_wl.items():
+                print(f'WL:{my_wl:<10} {my_label} AMean : {wl_estimate:.4f} +/- {wl_half_width:.4f}')
+            print(f'{my_label} AMean : {estimate:.4f} +/- {half_width:.4f} (95% CI)')
+        print('-----------------------------------------------------------------------------------------------------------')
+    return df
+
+
+if __name__ == '__main__':
+    my_exec_paths = {}
+    if args.trace_store:
+        store = TraceStore(args.trace_store, args.stage_dir, int(args.stage_cap_gb * 1024 ** 3), args.recompress_level)
+        my_exec_paths = store.stage(my_traces)
+    elif args.stage_dir:
+        parser.error('--stage_dir requires --trace_store')
+
+    if args.daemon and (args.jobs or args.pin or args.auto_jobs):
+        parser.error('--daemon runs on the slots of the daemon, --jobs/--pin/--auto_jobs are set with cbp_daemon.py serve')
+    elif (args.priority or args.preempt) and not args.daemon:
+        parser.error('--priority/--preempt require --daemon')
+    if args.fanout and len(variants) < 2:
+        parser.error('--fanout requires at least two --variant')
+    elif args.fanout and (args.daemon or args.auto_jobs):
+        parser.error('--fanout runs groups of variants on a local pool, it cannot be combined with --daemon/--auto_jobs')
+
+    slots = None
+    if args.pin:
+        slots = cpu_topology.worker_slots(cpu_topology.read_topology(), args.use_smt)
+        print(f'Pinning workers to {len(slots)} {"hardware threads" if args.use_smt else "physical cores"}')
+    elif args.use_smt:
+        parser.error('--use_smt requires --pin')
+    num_jobs = args.jobs or (len(slots) if slots else os.cpu_count())
+    if slots is not None and num_jobs > len(slots):
+        parser.error(f'--jobs {num_jobs} exceeds the {len(slots)} worker slots')
+
+    # For parallel runs:
+    results = []
+    fanout_stats = []
+    my_tasks = [(my_trace, variant) for my_trace in my_traces for variant in variants]
+    if args.auto_jobs:
+        num_jobs, results, my_tasks = auto_tune_jobs(my_tasks, my_exec_paths, num_jobs, slots)
+    if args.daemon:
+        results = run_traces_daemon(my_tasks, my_exec_paths)
+    elif args.fanout and my_traces:
+        # A group runs one cbp per variant at once
+        num_groups = max(1, num_jobs // len(variants))
+        if slots is not None and num_groups * len(variants) > len(slots):
+            parser.error(f'--fanout with --pin needs a slot per variant: {num_groups * len(variants)} slots, {len(slots)} available')
+        print(f'Fan-out: {num_groups} concurrent groups of {len(variants)} runs')
+        results, fanout_stats = run_groups(my_traces, my_exec_paths, num_groups, slots)
+    elif my_tasks:
+        results += run_traces(my_tasks, my_exec_paths, num_jobs, slots)
+    
+    # For serial runs:
+    #results = []
+    #init_worker(my_exec_paths, None)
+    #for my_task in my_tasks:
+    #    results.append(execute_trace(my_task))
+
+    if args.trace_store:
+        # The staged traces of this sweep are no longer in use
+        store.release()
+
+    for variant_name, variant_cmd in variants:
+        if variant_name:
+            print(f'\n\n=========================================== Variant: {variant_name} ===========================================')
+        df = report_results([r for r in results if r[4] == variant_name], get_variant_results_dir(variant_name))
+        if not args.no_history and not df.empty:
+            ingest_history(df, (variant_name, variant_cmd), get_variant_results_dir(variant_name))
+
+    if fanout_stats:
+        trace_bytes = sum(stats['TraceBytes'] for stats in fanout_stats)
+        saved_bytes = sum(stats['SavedBytes'] for stats in fanout_stats)
+        print('\n\n-------------------------------------------------Trace Fan-out-------------------------------------------------\n')
+        print(f'Traces read once         : {len(fanout_stats)} ({trace_bytes / 2**20:.1f} MB)')
+        print(f'Storage reads saved      : {saved_bytes / 2**20:.1f} MB ({len(variants)} variants, {saved_bytes / max(trace_bytes + saved_bytes, 1):.1%} of the reads without fan-out)')
+        print(f'Reader waits on slowest  : {sum(stats["StallSeconds"] for stats in fanout_stats):.1f}s')
+        dropped = sum(stats['Dropped'] for stats in fanout_stats)
+        if dropped:
+            print(f'Runs that stopped reading before the end of their trace: {dropped}')
+        print('-----------------------------------------------------------------------------------------------------------')
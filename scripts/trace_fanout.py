@@ -0,0 +1,216 @@
+import os
+import time
+import fcntl
+import errno
+import select
+import tempfile
+import subprocess
+from collections import deque
+
+# Single-read trace fan-out: one reader streams the bytes of a trace through a named pipe per consumer, so N cbp
+# runs of a sweep (predictor or parameter variants) decompress the same trace while storage reads it once.
+#
+# The reader keeps the chunks between the slowest and the fastest consumer in a window of at most buffer_bytes.
+# Writes are non-blocking and driven by poll(): a consumer whose pipe is full is skipped until it drains, the
+# others keep going until they are a whole window ahead of it, and only then the reader waits. A slow consumer
+# therefore bounds the throughput of the group, never blocks it: the group moves at the speed of its slowest
+# member. Consumers that exit early (EPIPE) are dropped, and one that accepts no byte for stall_timeout seconds
+# while the group waits for it is killed.
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_BUFFER_BYTES = 64 * 1024 * 1024
+PIPE_SIZE = 1024 * 1024
+STALL_TIMEOUT = 600
+POLL_MS = 50
+
+
+class Consumer:
+    """One process reading the trace from its named pipe."""
+
+    def __init__(self, fifo_path, proc):
+        self.fifo_path = fifo_path
+        self.proc = proc
+        self.fd = None
+        self.chunk = 0          # index of the chunk being written (absolute, see first_chunk in fanout())
+        self.offset = 0         # bytes of that chunk already written
+        self.sent = 0
+        self.done = False
+        self.last_progress = time.monotonic()
+        self.exit = None        # (exit code, end time, rusage) once reaped
+
+    def reap(self, options=0):
+        """Waits for the process (os.WNOHANG: only if it exited); True once it is reaped."""
+        if self.exit is None:
+            pid, status, rusage = os.wait4(self.proc.pid, options)
+            if pid:
+                self.proc.returncode = os.waitstatus_to_exitcode(status)
+                self.exit = (self.proc.returncode, time.time(), rusage)
+        return self.exit is not None
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.done = True
+
+
+def make_fifos(names, fifo_dir=None):
+    """Creates a named pipe per name in a fresh directory (local temp dir by default: FIFOs do not work on every
+    shared filesystem); returns (directory, paths)."""
+    my_dir = tempfile.mkdtemp(prefix='cbp_fanout_', dir=fifo_dir)
+    paths = []
+    for i, name in enumerate(names):
+        path = os.path.join(my_dir, f'{i}_{name}.gz')
+        os.mkfifo(path, 0o600)
+        paths.append(path)
+    return my_dir, paths
+
+
+def remove_fifos(my_dir, paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    os.rmdir(my_dir)
+
+
+def try_open(consumer):
+    # The write end of a FIFO can only be opened non-blocking once the reader has it open (else ENXIO); a
+    # consumer that exits before opening it is done
+    try:
+        consumer.fd = os.open(consumer.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno != errno.ENXIO:
+            raise
+        if consumer.reap(os.WNOHANG):
+            consumer.done = True
+        return
+    if hasattr(fcntl, 'F_SETPIPE_SZ'):
+        try:
+            fcntl.fcntl(consumer.fd, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+        except OSError:
+            pass
+    consumer.last_progress = time.monotonic()
+
+
+def fanout(trace_path, consumers, buffer_bytes=DEFAULT_BUFFER_BYTES, stall_timeout=STALL_TIMEOUT):
+    """Streams trace_path to the consumers until they all got it (or are gone). Returns a dict of statistics:
+    TraceBytes (read once from storage), Consumers, SavedBytes (the reads of the other consumers),
+    StallSeconds (time the reader waited on the slowest consumer with a full window), Dropped (consumers that
+    did not get the whole trace)."""
+    chunks = deque()
+    first_chunk = 0             # absolute index of chunks[0]
+    buffered = 0
+    eof = False
+    trace_bytes = 0
+    stall_seconds = 0.0
+
+    with open(trace_path, 'rb', buffering=0) as trace_file:
+        while True:
+            # Reaped as soon as they exit, for the exec time of each run
+            for c in consumers:
+                if c.done and c.exit is None:
+                    c.reap(os.WNOHANG)
+            active = [c for c in consumers if not c.done]
+            if not active:
+                break
+            for c in active:
+                if c.fd is None:
+                    try_open(c)
+
+            # Read ahead while the window has room
+            while not eof and buffered < buffer_bytes:
+                data = trace_file.read(CHUNK_SIZE)
+                if not data:
+                    eof = True
+                    break
+                chunks.append(data)
+                buffered += len(data)
+                trace_bytes += len(data)
+
+            last_chunk = first_chunk + len(chunks)
+            for c in active:
+                if c.fd is None:
+                    continue
+                try:
+                    while c.chunk < last_chunk:
+                        data = chunks[c.chunk - first_chunk]
+                        written = os.write(c.fd, memoryview(data)[c.offset:])
+                        c.offset += written
+                        c.sent += written
+                        c.last_progress = time.monotonic()
+                        if c.offset == len(data):
+                            c.chunk, c.offset = c.chunk + 1, 0
+                except BlockingIOError:
+                    pass
+                except (BrokenPipeError, ConnectionResetError):
+                    c.close()
+                    continue
+                if eof and c.chunk == last_chunk:
+                    c.close()
+
+            # Release the chunks every consumer is past
+            open_consumers = [c for c in consumers if not c.done]
+            slowest = min((c.chunk for c in open_consumers), default=last_chunk)
+            while first_chunk < slowest:
+                buffered -= len(chunks.popleft())
+                first_chunk += 1
+            if not open_consumers:
+                break
+
+            # Wait until a pipe drains (or a consumer still has to open its pipe)
+            waiting = [c for c in open_consumers if c.fd is not None and c.chunk < last_chunk]
+            poller = select.poll()
+            for c in waiting:
+                poller.register(c.fd, select.POLLOUT)
+            window_full = not eof and buffered >= buffer_bytes
+            begin = time.monotonic()
+            if waiting or any(c.fd is None for c in open_consumers):
+                poller.poll(POLL_MS)
+            if window_full:
+                stall_seconds += time.monotonic() - begin
+
+            now = time.monotonic()
+            for c in waiting:
+                if window_full and c.chunk == first_chunk and now - c.last_progress > stall_timeout:
+                    print(f'Fan-out: {c.fifo_path} accepted no data for {stall_timeout}s, killing it')
+                    c.proc.kill()
+                    c.close()
+
+    dropped = sum(1 for c in consumers if c.sent != trace_bytes)
+    return {'TraceBytes': trace_bytes,
+            'Consumers': len(consumers),
+            'SavedBytes': trace_bytes * (len(consumers) - 1),
+            'StallSeconds': stall_seconds,
+            'Dropped': dropped}
+
+
+def run_group(trace_path, commands, names, stdout_paths, buffer_bytes=DEFAULT_BUFFER_BYTES, cpu_sets=None):
+    """Starts one process per command (an argv list, the consumer's pipe is appended as the trace argument),
+    feeds them the trace and waits for them. stdout of each process goes to its stdout_path.
+    Returns (statistics of fanout(), [(exit code, exec time in seconds, rusage) per command])."""
+    fifo_dir, fifo_paths = make_fifos(names)
+    procs = []
+    try:
+        begin_time = time.time()
+        for cmd, fifo_path, stdout_path, cpus in zip(commands, fifo_paths, stdout_paths, cpu_sets or [None] * len(commands)):
+            with open(stdout_path, 'w') as stdout_file:
+                procs.append(subprocess.Popen(cmd + [fifo_path], stdout=stdout_file))
+            if cpus:
+                os.sched_setaffinity(procs[-1].pid, cpus)
+        consumers = [Consumer(fifo_path, proc) for fifo_path, proc in zip(fifo_paths, procs)]
+        stats = fanout(trace_path, consumers, buffer_bytes)
+        # Polled rather than waited in turn, so each run gets its own end time
+        pending = [c for c in consumers if c.exit is None]
+        while pending:
+            pending = [c for c in pending if not c.reap(os.WNOHANG)]
+            if pending:
+                time.sleep(0.01)
+        return stats, [(c.exit[0], c.exit[1] - begin_time, c.exit[2]) for c in consumers]
+    finally:
+        for proc in procs:
+            if proc.returncode is None:
+                proc.kill()
+                proc.wait()
+        remove_fifos(fifo_dir, fifo_paths)
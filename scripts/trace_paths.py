@@ -0,0 +1,20 @@
+import os
+import re
+
+# Trace discovery and run naming shared by the scripts: traces are the *_trace.gz files under a directory, and
+# a run is named by the workload directory and the trace name, as in the results of trace_exec_training_list.py.
+
+
+def get_trace_paths(start_path):
+    ret_list = []
+    for root, dirs, files in os.walk(start_path):
+        for my_file in files:
+            if(my_file.endswith('_trace.gz')):
+                ret_list.append(os.path.join(root, my_file))
+    return ret_list
+
+
+def get_run_key(my_trace_path):
+    # traces/int/int_0_trace.gz -> ('int', 'int_0_trace')
+    run_split = re.split(r"\/", my_trace_path)
+    return (run_split[-2], run_split[-1].split(".")[-2])
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import gzip
+import shutil
+import fcntl
+import hashlib
+import argparse
+from pathlib import Path
+from contextlib import contextmanager
+from trace_paths import get_trace_paths
+
+# Content-addressed trace store with an optional local staging cache.
+#
+# store_dir/
+#   index.json            source path -> {size, mtime, sha256}
+#   objects/<sha>.gz      verbatim copy of the trace
+#   objects/<sha>.l<N>.gz trace recompressed with gzip level N
+# stage_dir/
+#   lru.json              object name -> {size, last_used}
+#   leases.json           pid -> object names staged by that process (a running sweep), never evicted
+#   <object name>         staged copy of an object (tmpfs/SSD)
+
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+@contextmanager
+def locked(lock_path):
+    """Holds an exclusive flock on lock_path for the duration of the block."""
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def save_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def file_sha256(path):
+    """Streams path through sha256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TraceStore:
+    """Deduplicates traces by content hash and stages the ones a sweep needs into a size-capped LRU cache."""
+
+    def __init__(self, store_dir, stage_dir=None, stage_cap_bytes=None, recompress_level=None):
+        self.store_dir = Path(store_dir)
+        self.objects_dir = self.store_dir / 'objects'
+        self.index_file = self.store_dir / 'index.json'
+        self.stage_dir = Path(stage_dir) if stage_dir else None
+        self.stage_cap_bytes = stage_cap_bytes
+        self.recompress_level = recompress_level
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        if self.stage_dir:
+            self.stage_dir.mkdir(parents=True, exist_ok=True)
+
+    def object_name(self, sha):
+        if self.recompress_level is None:
+            return f'{sha}.gz'
+        return f'{sha}.l{self.recompress_level}.gz'
+
+    def ingest(self, trace_path):
+        """Adds trace_path to the store (if needed) and returns the path of its object."""
+        trace_path = os.path.abspath(trace_path)
+        stat = os.stat(trace_path)
+        with locked(self.store_dir / '.lock'):
+            index = load_json(self.index_file, {})
+            entry = index.get(trace_path)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                entry = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': file_sha256(trace_path)}
+                index[trace_path] = entry
+                save_json(self.index_file, index)
+
+            object_path = self.objects_dir / self.object_name(entry['sha256'])
+            if not object_path.exists():
+                tmp_path = object_path.with_name(object_path.name + '.tmp')
+                if self.recompress_level is None:
+                    shutil.copyfile(trace_path, tmp_path)
+                else:
+                    print(f'Recompressing {trace_path} at gzip level {self.recompress_level}')
+                    with gzip.open(trace_path, 'rb') as src, \
+                         gzip.GzipFile(tmp_path, 'wb', compresslevel=self.recompress_level, mtime=0) as dst:
+                        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+                os.replace(tmp_path, object_path)
+        return object_path
+
+    def stage(self, trace_paths):
+        """Returns {trace path: path to run from}, staging the objects of trace_paths into stage_dir.
+
+        Least recently used objects that are not needed by this call, nor leased by another process still
+        running, are evicted to stay under stage_cap_bytes; traces that still do not fit are served from the
+        store. The staged objects are leased to this process until release() or its exit, so a concurrent sweep
+        staging into the same directory does not evict them while they are read.
+        """
+        object_paths = {trace_path: self.ingest(trace_path) for trace_path in trace_paths}
+        if not self.stage_dir:
+            return {trace_path: str(object_path) for trace_path, object_path in object_paths.items()}
+
+        needed = {object_path.name for object_path in object_paths.values()}
+        staged_paths = {}
+        with locked(self.stage_dir / '.lock'):
+            lru = load_json(self.stage_dir / 'lru.json', {})
+            # Forget entries whose file disappeared (e.g. tmpfs cleared on reboot)
+            lru = {name: entry for name, entry in lru.items() if (self.stage_dir / name).exists()}
+            leases = self.live_leases()
+            pid = str(os.getpid())
+            in_use = needed.union(*(names for lease_pid, names in leases.items() if lease_pid != pid))
+            lease = set(leases.get(pid, []))
+            for trace_path, object_path in object_paths.items():
+                staged_path = self.stage_dir / object_path.name
+                if object_path.name not in lru:
+                    size = object_path.stat().st_size
+                    if not self.make_room(lru, size, in_use):
+                        print(f'Stage cache full, running {trace_path} from the store')
+                        staged_paths[trace_path] = str(object_path)
+                        continue
+                    tmp_path = staged_path.with_name(staged_path.name + '.tmp')
+                    shutil.copyfile(object_path, tmp_path)
+                    os.replace(tmp_path, staged_path)
+                    lru[object_path.name] = {'size': size}
+                lru[object_path.name]['last_used'] = time.time()
+                lease.add(object_path.name)
+                staged_paths[trace_path] = str(staged_path)
+            if lease:
+                leases[pid] = sorted(lease)
+            save_json(self.stage_dir / 'leases.json', leases)
+            save_json(self.stage_dir / 'lru.json', lru)
+        return staged_paths
+
+    def release(self):
+        """Ends the lease of this process on the objects it staged, making them evictable again."""
+        if not self.stage_dir:
+            return
+        with locked(self.stage_dir / '.lock'):
+            leases = self.live_leases()
+            if leases.pop(str(os.getpid()), None) is not None:
+                save_json(self.stage_dir / 'leases.json', leases)
+
+    def live_leases(self):
+        """Leases of the processes still running (call with the stage lock held); the others ended without release()."""
+        leases = load_json(self.stage_dir / 'leases.json', {})
+        return {pid: names for pid, names in leases.items() if process_alive(int(pid))}
+
+    def make_room(self, lru, size, in_use):
+        """Evicts LRU entries not in in_use until size more bytes fit under the cap; returns False if impossible."""
+        if self.stage_cap_bytes is None:
+            return True
+        used = sum(entry['size'] for entry in lru.values())
+        victims = sorted((name for name in lru if name not in in_use), key=lambda name: lru[name]['last_used'])
+        while used + size > self.stage_cap_bytes and victims:
+            victim = victims.pop(0)
+            used -= lru[victim]['size']
+            (self.stage_dir / victim).unlink(missing_ok=True)
+            del lru[victim]
+        return used + size <= self.stage_cap_bytes
+
+    def stats(self):
+        index = load_json(self.index_file, {})
+        objects = list(self.objects_dir.glob('*.gz'))
+        print(f'Store: {self.store_dir} | {len(index)} source paths | {len(objects)} objects | '
+              f'{sum(o.stat().st_size for o in objects) / (1024 ** 3):.2f} GB')
+        if self.stage_dir:
+            lru = load_json(self.stage_dir / 'lru.json', {})
+            print(f'Stage: {self.stage_dir} | {len(lru)} objects | '
+                  f'{sum(e["size"] for e in lru.values()) / (1024 ** 3):.2f} GB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingests traces into a content-addressed store and stages them into a local cache.")
+    parser.add_argument('command', choices=['ingest', 'stage', 'stats'])
+    parser.add_argument('--store_dir', required=True, help='trace store directory')
+    parser.add_argument('--trace_dir', help='directory with the *_trace.gz files to ingest/stage')
+    parser.add_argument('--stage_dir', help='local (tmpfs/SSD) staging directory')
+    parser.add_argument('--stage_cap_gb', type=float, default=16, help='size cap of the staging directory in GB (default: 16)')
+    parser.add_argument('--recompress_level', type=int, choices=range(1, 10), help='recompress objects with this gzip level')
+    args = parser.parse_args()
+
+    store = TraceStore(args.store_dir, args.stage_dir, int(args.stage_cap_gb * 1024 ** 3), args.recompress_level)
+    if args.command == 'stats':
+        store.stats()
+        return
+    if not args.trace_dir:
+        sys.exit(f'Error: {args.command} requires --trace_dir')
+    traces = get_trace_paths(args.trace_dir)
+    if args.command == 'ingest':
+        for trace_path in traces:
+            print(f'{trace_path} -> {store.ingest(trace_path)}')
+    else:
+        for trace_path, staged_path in store.stage(traces).items():
+            print(f'{trace_path} -> {staged_path}')
+        store.release()
+    store.stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+import pandas as pd
+import quick_subset
+from trace_paths import get_trace_paths, get_run_key
+
+# Watch mode for predictor development.
+#
+# Polls the predictor sources in the repo root (and the lib/ headers they include), rebuilds only the predictor objects (the OBJ list of the
+# Makefile) against the prebuilt lib/libcbp.a whenever they change, and reruns the traces with the new binary:
+# the --quick subset first, then the remaining traces, shortest (reference ExecTime) first. Runs of a stale
+# binary are killed as soon as a newer build links. Per-trace MPKI is printed as the runs finish, together
+# with the delta against the last result of the same trace from an earlier build.
+#
+# results_dir/
+#   objs/<hash>.o               predictor objects, keyed by flags and the contents of the files they depend on
+#                               (g++ -MM: the source, included headers and .cc files)
+#   builds/<build id>/cbp       linked binary
+#   builds/<build id>/<wl>/<run>.log
+#   builds/<build id>/<wl>/<run>.json   cbp -S stats file
+#   builds/<build id>/results.csv
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+OBJ_SOURCES = ['cond_branch_predictor_interface.cc', 'my_cond_branch_predictor.cc']
+
+
+def read_measurements(stats_file):
+    """Returns {column: value} of the full-simulation and (prefixed with 50Perc) 50 Perc measurements of a cbp -S
+    stats file."""
+    with open(stats_file) as f:
+        cond_dir = json.load(f)['cond_dir']
+    ret = {}
+    for prefix, window in (('', 'Full'), ('50Perc', '50Perc')):
+        ret.update({prefix + col: value for col, value in cond_dir[window].items()})
+    return ret
+
+
+def source_fingerprint(watch_files):
+    """Hashes the contents of the watched files; the build id of the tree."""
+    digest = hashlib.sha256()
+    for path in watch_files:
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes() if path.exists() else b'')
+    return digest.hexdigest()[:12]
+
+
+def dependencies(src_path, cxx, cxxflags):
+    """Files the object of src_path is built from, as listed by the compiler (-MM): the source and every header or
+    .cc file it includes, system headers aside. None (after printing the error) if the includes do not resolve."""
+    deps = subprocess.run([cxx, *cxxflags.split(), '-I', str(REPO_DIR), '-MM', str(src_path)], cwd=REPO_DIR,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if deps.returncode != 0:
+        print(f'  {src_path.name}: dependency scan failed\n{deps.stderr}')
+        return None
+    # "x.o: x.cc a.h \<newline> b.h"
+    return [REPO_DIR / dep for dep in deps.stdout.replace('\\\n', ' ').split(':', 1)[1].split()]
+
+
+def build(build_dir, obj_dir, cxx, cxxflags):
+    """Compiles the predictor objects (reusing unchanged ones) and links build_dir/cbp. Returns the binary or None."""
+    compiles = []
+    objs = []
+    for src in OBJ_SOURCES:
+        src_path = REPO_DIR / src
+        deps = dependencies(src_path, cxx, cxxflags)
+        if deps is None:
+            return None
+        digest = hashlib.sha256(f'{cxx} {cxxflags}'.encode())
+        for dep in deps:
+            digest.update(str(dep).encode())
+            digest.update(dep.read_bytes())
+        obj_key = digest.hexdigest()[:16]
+        obj_path = obj_dir / f'{src_path.stem}.{obj_key}.o'
+        objs.append(obj_path)
+        if not obj_path.exists():
+            tmp_path = obj_path.with_suffix('.tmp.o')
+            cmd = [cxx, *cxxflags.split(), '-I', str(REPO_DIR), '-c', '-o', str(tmp_path), str(src_path)]
+            compiles.append((src, tmp_path, obj_path, subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True)))
+        else:
+            print(f'  {src}: unchanged, reusing {obj_path.name}')
+
+    failed = False
+    for src, tmp_path, obj_path, proc in compiles:
+        _, errors = proc.communicate()
+        if proc.returncode != 0:
+            print(f'  {src}: compile failed\n{errors}')
+            failed = True
+        else:
+            os.replace(tmp_path, obj_path)
+            print(f'  {src}: compiled')
+    if failed:
+        return None
+
+    build_dir.mkdir(parents=True, exist_ok=True)
+    binary = build_dir / 'cbp'
+    cmd = [cxx, *cxxflags.split(), '-o', str(binary), *map(str, objs), '-L', str(REPO_DIR / 'lib'), '-lcbp', '-lz']
+    link = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+    if link.returncode != 0:
+        print(f'  link failed\n{link.stderr}')
+        return None
+    return binary
+
+
+def order_traces(my_traces, ref_df, num_quick):
+    """Quick subset first, then the rest by ascending reference ExecTime (unknown traces last, by size)."""
+    by_key = {get_run_key(t): t for t in my_traces}
+    quick_keys = quick_subset.select_quick_subset(ref_df, num_quick) if num_quick else []
+    first = [by_key[k] for k in quick_keys if k in by_key]
+    exec_time = {(wl, run): float(t) for wl, run, t in zip(ref_df['Workload'], ref_df['Run'], ref_df['ExecTime'])}
+    rest = [t for t in my_traces if t not in first]
+    rest.sort(key=lambda t: (get_run_key(t) not in exec_time, exec_time.get(get_run_key(t), os.path.getsize(t))))
+    return first + rest, len(first)
+
+
+class Watcher:
+    """Keeps at most `jobs` cbp runs of the newest build in flight."""
+
+    def __init__(self, args, my_traces, ref_df):
+        self.args = args
+        self.ref_df = ref_df
+        self.results_dir = Path(args.results_dir).resolve()
+        self.obj_dir = self.results_dir / 'objs'
+        self.obj_dir.mkdir(parents=True, exist_ok=True)
+        self.watch_files = sorted(p for p in REPO_DIR.iterdir() if p.suffix in ('.cc', '.h')) + sorted((REPO_DIR / 'lib').glob('*.h'))
+        self.order, self.num_quick = order_traces(my_traces, ref_df, args.quick)
+        self.build_id = None
+        self.binary = None
+        self.queue = []
+        self.running = {}       # trace path -> (Popen, log file, start time)
+        self.results = []       # rows of the current build
+        self.last_results = {}  # (wl, run) -> (build id, 50PercMPKI), across builds
+        self.baseline = {}      # snapshot of last_results when the current build started
+
+    def rebuild(self, fingerprint):
+        print(f'\n=== Sources changed, building {fingerprint} ===')
+        begin_time = time.time()
+        binary = build(self.results_dir / 'builds' / fingerprint, self.obj_dir, self.args.cxx, self.args.cxxflags)
+        if binary is None:
+            print(f'=== Build {fingerprint} failed, keeping build {self.build_id} running ===')
+            return
+        print(f'=== Build {fingerprint} linked in {time.time() - begin_time:.1f}s ===')
+        self.cancel_running()
+        self.build_id = fingerprint
+        self.binary = binary
+        self.queue = list(self.order)
+        self.results = []
+        self.baseline = dict(self.last_results)
+
+    def cancel_running(self):
+        for my_trace, (proc, op_file, _) in self.running.items():
+            proc.kill()
+            proc.wait()
+            op_file.unlink(missing_ok=True)
+            op_file.with_suffix('.json').unlink(missing_ok=True)
+        if self.running:
+            print(f'  cancelled {len(self.running)} runs of stale build {self.build_id}')
+        self.running = {}
+
+    def launch(self):
+        while self.queue and len(self.running) < self.args.jobs:
+            my_trace = self.queue.pop(0)
+            my_wl, run_name = get_run_key(my_trace)
+            op_file = self.results_dir / 'builds' / self.build_id / my_wl / f'{run_name}.log'
+            op_file.parent.mkdir(parents=True, exist_ok=True)
+            stats_file = op_file.with_suffix('.json')
+            stats_file.unlink(missing_ok=True)
+            with open(op_file, 'w') as text_file:
+                proc = subprocess.Popen([str(self.binary), '-S', str(stats_file), os.path.abspath(my_trace)], stdout=text_file, stderr=subprocess.STDOUT)
+            self.running[my_trace] = (proc, op_file, time.time())
+
+    def reap(self):
+        for my_trace, (proc, op_file, begin_time) in list(self.running.items()):
+            if proc.poll() is None:
+                continue
+            del self.running[my_trace]
+            my_wl, run_name = get_run_key(my_trace)
+            row = {'Workload': my_wl, 'Run': run_name, 'Status': 'Fail', 'ExecTime': time.time() - begin_time}
+            if proc.returncode == 0:
+                try:
+                    row.update(read_measurements(op_file.with_suffix('.json')))
+                    row['Status'] = 'Pass'
+                except (OSError, ValueError, KeyError):
+                    pass
+            self.results.append(row)
+            self.report(row)
+
+    def report(self, row):
+        key = (row['Workload'], row['Run'])
+        done = f'[{len(self.results)}/{len(self.order)}]'
+        if row['Status'] != 'Pass':
+            print(f'{done} {key[0]}/{key[1]}: FAILED (see {self.results_dir}/builds/{self.build_id}/{key[0]}/{key[1]}.log)')
+            return
+        mpki = row['50PercMPKI']
+        delta = ''
+        if key in self.baseline:
+            prev_build, prev_mpki = self.baseline[key]
+            delta = f' ({mpki - prev_mpki:+.4f} vs {prev_build})'
+        self.last_results[key] = (self.build_id, mpki)
+        print(f'{done} {key[0]}/{key[1]}: 50PercMPKI {mpki:.4f}{delta} | {row["ExecTime"]:.1f}s')
+
+        if len(self.results) == self.num_quick or len(self.results) == len(self.order):
+            self.summarize(quick=len(self.results) < len(self.order))
+
+    def summarize(self, quick):
+        df = pd.DataFrame(self.results)
+        df.to_csv(self.results_dir / 'builds' / self.build_id / 'results.csv', index=False)
+        passed = df[df['Status'] == 'Pass']
+        if passed.empty:
+            return
+        deltas = [mpki - self.baseline[key][1] for key, mpki in zip(zip(passed['Workload'], passed['Run']), passed['50PercMPKI']) if key in self.baseline]
+        delta = f' | mean delta {sum(deltas) / len(deltas):+.4f} over {len(deltas)} traces' if deltas else ''
+        if quick:
+            estimate, half_width, _ = quick_subset.estimate_full_set(passed, self.ref_df, '50PercMPKI')
+            print(f'=== Build {self.build_id} quick subset done: estimated BrMisPKI AMean {estimate:.4f} +/- {half_width:.4f}{delta} ===')
+        else:
+            print(f'=== Build {self.build_id} done: BrMisPKI AMean {passed["50PercMPKI"].mean():.4f} | '
+                  f'CycWpPKI AMean {passed["50PercCycWPPKI"].mean():.4f}{delta} ===')
+
+    def run(self):
+        fingerprint = None
+        pending = None
+        while True:
+            current = source_fingerprint(self.watch_files)
+            # Wait for the sources to stop changing for one poll interval before rebuilding
+            if current != fingerprint and current == pending:
+                fingerprint = current
+                self.rebuild(fingerprint)
+            pending = current
+            if self.binary is not None:
+                self.reap()
+                self.launch()
+            time.sleep(self.args.poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuilds the predictor on source changes and reruns the traces with streaming MPKI deltas.")
+    parser.add_argument('--trace_dir', help='path to trace directory', required=True)
+    parser.add_argument('--results_dir', help='path to results directory (objects, binaries and logs per build)', required=True)
+    parser.add_argument('--quick', type=int, default=12, help='size of the quick subset run first after every build (default: 12, 0 disables)')
+    parser.add_argument('--reference', default=str(REPO_DIR / 'reference_results_training_set.csv'), help='results csv used to pick the quick subset and the run order')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='concurrent cbp runs (default: number of CPUs)')
+    parser.add_argument('--poll_interval', type=float, default=0.5, help='seconds between source/run polls (default: 0.5)')
+    parser.add_argument('--cxx', default='g++', help='C++ compiler (default: g++)')
+    parser.add_argument('--cxxflags', default='-std=c++17 -O3', help='compile flags of the predictor objects (default: -std=c++17 -O3)')
+    args = parser.parse_args()
+
+    if not (REPO_DIR / 'lib' / 'libcbp.a').exists():
+        sys.exit(f'Error: {REPO_DIR}/lib/libcbp.a not found, build it once with `make -C {REPO_DIR}/lib`')
+    my_traces = get_trace_paths(args.trace_dir)
+    print(f'Got {len(my_traces)} traces')
+    if not my_traces:
+        sys.exit(f'Error: no *_trace.gz files under {args.trace_dir}')
+
+    ref_df = quick_subset.load_reference(args.reference)
+    num_workloads = ref_df['Workload'].nunique()
+    if 0 < args.quick < num_workloads:
+        parser.error(f'--quick {args.quick} is below the {num_workloads} workloads of {args.reference}, the subset needs one trace per workload')
+    watcher = Watcher(args, my_traces, ref_df)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.cancel_running()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+// Dumps the branches of a trace to a NumPy .npy file, for the trace analysis scripts (scripts/branch_stream.py).
+//
+// One record per branch uop, in trace order, as a packed structured array:
+//   pc     <u8  branch PC
+//   target <u8  next_pc
+//   inst   <u8  number of instructions before the branch (counted like uarchsim_t: one per last piece)
+//   cls    u1   InstClass (condBranchInstClass, callDirectInstClass, ...)
+//   taken  u1   next_pc != pc + 4, as in bp_t::predict
+//
+// Build: make branch_stream
+// Run:   ./tools/branch_stream <trace.gz> <out.npy>
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <string>
+#include "lib/trace_reader.h"
+
+#pragma pack(push, 1)
+struct BranchRecord
+{
+    uint64_t pc;
+    uint64_t target;
+    uint64_t inst;
+    uint8_t cls;
+    uint8_t taken;
+};
+#pragma pack(pop)
+
+static_assert(sizeof(BranchRecord) == 26, "BranchRecord must match the .npy descr");
+
+// .npy format 1.0 header. The shape is written with a fixed width so it can be rewritten in place once the
+// number of branches is known.
+static void write_npy_header(FILE* f, uint64_t num_records)
+{
+    char dict[256];
+    snprintf(dict, sizeof(dict),
+             "{'descr': [('pc', '<u8'), ('target', '<u8'), ('inst', '<u8'), ('cls', 'u1'), ('taken', 'u1')], "
+             "'fortran_order': False, 'shape': (%20lu,), }", num_records);
+    const size_t preamble = 10; // magic (6) + version (2) + header length (2)
+    size_t header_len = strlen(dict) + 1;
+    header_len += (64 - (preamble + header_len) % 64) % 64;
+    std::string header(dict);
+    header.resize(header_len - 1, ' ');
+    header += '\n';
+
+    fwrite("\x93NUMPY\x01\x00", 1, 8, f);
+    const uint16_t len = header_len;
+    fputc(len & 0xFF, f);
+    fputc(len >> 8, f);
+    fwrite(header.data(), 1, header.size(), f);
+}
+
+int main(int argc, char** argv)
+{
+    if (argc != 3)
+    {
+        fprintf(stderr, "usage: %s <trace.gz> <out.npy>\n", argv[0]);
+        return 1;
+    }
+
+    // Written to a temporary file of this process and renamed, so a reader never sees a partial stream and
+    // concurrent dumps of the same trace do not write into each other
+    const std::string tmp_file = std::string(argv[2]) + ".tmp." + std::to_string(getpid());
+    FILE* f = fopen(tmp_file.c_str(), "wb");
+    if (!f)
+    {
+        fprintf(stderr, "Could not open %s\n", tmp_file.c_str());
+        return 1;
+    }
+    write_npy_header(f, 0);
+
+    TraceReader reader(argv[1]);
+    uint64_t num_inst = 0;
+    uint64_t num_records = 0;
+    std::vector<BranchRecord> buffer;
+    buffer.reserve(1 << 16);
+    while (db_t* inst = reader.get_inst())
+    {
+        if (is_br(inst->insn_class))
+        {
+            buffer.push_back({inst->pc, inst->next_pc, num_inst, static_cast<uint8_t>(inst->insn_class), inst->next_pc != inst->pc + 4});
+            if (buffer.size() == buffer.capacity())
+            {
+                fwrite(buffer.data(), sizeof(BranchRecord), buffer.size(), f);
+                num_records += buffer.size();
+                buffer.clear();
+            }
+        }
+        num_inst += inst->is_last_piece;
+        delete inst;
+    }
+    fwrite(buffer.data(), sizeof(BranchRecord), buffer.size(), f);
+    num_records += buffer.size();
+
+    fseek(f, 0, SEEK_SET);
+    write_npy_header(f, num_records);
+    if (fclose(f) != 0 || rename(tmp_file.c_str(), argv[2]) != 0)
+    {
+        fprintf(stderr, "Could not write %s\n", argv[2]);
+        return 1;
+    }
+    printf("%lu branches in %lu instructions\n", num_records, num_inst);
+    return 0;
+}
@@ -0,0 +1,243 @@
+// C ABI of the repository predictors, see predictor_capi.h.
+//
+// Build: make libpredictors
+//
+// Every predictor source defines its own global cond_predictor_impl, as it is meant to be the one
+// my_cond_branch_predictor of a cbp build. They are compiled together here, each with cond_predictor_impl
+// renamed, and the handles own separate instances. All the predictor headers are included first so that the
+// "my_cond_branch_predictor.h" the sources include (empty, or a copy of one of these headers) adds nothing.
+
+#include <string.h>
+#include <string>
+#include <memory>
+#include "lib/sim_common_structs.h"
+#include "tools/predictor_capi.h"
+
+#define cond_predictor_impl gshare_cond_predictor_impl
+#include "gshare.h"
+#undef cond_predictor_impl
+#define cond_predictor_impl bht_cond_predictor_impl
+#include "bht.h"
+#undef cond_predictor_impl
+#define cond_predictor_impl tournament_cond_predictor_impl
+#include "tournament_predictor.h"
+#undef cond_predictor_impl
+#include "cbp2016_tage_sc_l.h"
+
+#define cond_predictor_impl gshare_cond_predictor_impl
+#include "gshare.cc"
+#undef cond_predictor_impl
+#define cond_predictor_impl bht_cond_predictor_impl
+#include "bht.cc"
+#undef cond_predictor_impl
+#define cond_predictor_impl tournament_cond_predictor_impl
+#include "tournament_predictor.cc"
+#undef cond_predictor_impl
+
+static thread_local std::string last_error;
+
+template <typename T>
+static inline T load(const void* base, int64_t stride, uint64_t i)
+{
+    T value;
+    memcpy(&value, static_cast<const char*>(base) + i * stride, sizeof(T)); // records may be unaligned
+    return value;
+}
+
+// Adapts the interface of each predictor to the steps of a batch
+class BatchPredictor
+{
+    public:
+        virtual ~BatchPredictor() {}
+        virtual bool predict(uint64_t seq_no, uint64_t pc) = 0;
+        virtual void resolve(uint64_t seq_no, uint64_t pc, bool taken, bool pred, uint64_t next_pc) = 0;
+        virtual void other_branch(uint64_t pc, InstClass inst_class, bool taken, uint64_t next_pc) {}
+        virtual bool needs_targets() const { return false; }
+        virtual uint64_t storage_bits() const { return 0; }
+};
+
+class GshareBatch : public BatchPredictor
+{
+    public:
+        GshareBatch(int history_length, int table_size) : impl(history_length, table_size) { impl.setup(); }
+        ~GshareBatch() { impl.terminate(); }
+        bool predict(uint64_t seq_no, uint64_t pc) override { return impl.predict(seq_no, 0, pc, false); }
+        void resolve(uint64_t seq_no, uint64_t pc, bool taken, bool pred, uint64_t next_pc) override
+        {
+            impl.history_update(seq_no, 0, pc, taken, next_pc);
+            impl.update(seq_no, 0, pc, taken, pred, next_pc);
+        }
+        uint64_t storage_bits() const override { return impl.storage_bits(); }
+    private:
+        GSHARE impl;
+};
+
+class BhtBatch : public BatchPredictor
+{
+    public:
+        explicit BhtBatch(int table_size) : impl(table_size) { impl.setup(); }
+        ~BhtBatch() { impl.terminate(); }
+        bool predict(uint64_t seq_no, uint64_t pc) override { return impl.predict(seq_no, 0, pc, false); }
+        void resolve(uint64_t seq_no, uint64_t pc, bool taken, bool pred, uint64_t next_pc) override
+        {
+            impl.history_update(seq_no, 0, pc, taken, next_pc);
+            impl.update(seq_no, 0, pc, taken, pred, next_pc);
+        }
+        uint64_t storage_bits() const override { return impl.storage_bits(); }
+    private:
+        BHTPredictor impl;
+};
+
+class TournamentBatch : public BatchPredictor
+{
+    public:
+        bool predict(uint64_t seq_no, uint64_t pc) override { return impl.get_cond_dir_prediction(pc); }
+        void resolve(uint64_t seq_no, uint64_t pc, bool taken, bool pred, uint64_t next_pc) override { impl.update_predictor(pc, taken, pred); }
+        uint64_t storage_bits() const override { return impl.storage_bits(); }
+    private:
+        TOURNAMENT_PREDICTOR impl;
+};
+
+// Uses the cbp2016_tage_sc_l instance of the header, with the branch types of spec_update
+// (cond_branch_predictor_interface.cc)
+class TageScLBatch : public BatchPredictor
+{
+    public:
+        TageScLBatch() { cbp2016_tage_sc_l.setup(); }
+        ~TageScLBatch() { cbp2016_tage_sc_l.terminate(); }
+        bool predict(uint64_t seq_no, uint64_t pc) override { return cbp2016_tage_sc_l.predict(seq_no, 0, pc); }
+        void resolve(uint64_t seq_no, uint64_t pc, bool taken, bool pred, uint64_t next_pc) override
+        {
+            cbp2016_tage_sc_l.history_update(seq_no, 0, pc, 1, pred, taken, next_pc);
+            cbp2016_tage_sc_l.update(seq_no, 0, pc, taken, pred, next_pc);
+        }
+        void other_branch(uint64_t pc, InstClass inst_class, bool taken, uint64_t next_pc) override
+        {
+            const bool direct = inst_class == InstClass::uncondDirectBranchInstClass || inst_class == InstClass::callDirectInstClass;
+            cbp2016_tage_sc_l.TrackOtherInst(pc, direct ? 0 : 2, true, taken, next_pc);
+        }
+        bool needs_targets() const override { return true; }
+
+        static bool created;
+};
+
+bool TageScLBatch::created = false;
+
+struct predictor_handle
+{
+    std::unique_ptr<BatchPredictor> impl;
+    uint64_t seq_no = 0;
+};
+
+extern "C" {
+
+predictor_handle* predictor_create(const char* name, const int64_t* params, int num_params)
+{
+    const std::string predictor(name ? name : "");
+    auto param = [&](int i, int64_t default_value) { return i < num_params ? params[i] : default_value; };
+    std::unique_ptr<BatchPredictor> impl;
+    if (predictor == "gshare")
+    {
+        const int64_t history_length = param(0, 12), table_size = param(1, 4096);
+        if (history_length < 0 || history_length > 63 || table_size <= 0 || (table_size & (table_size - 1)))
+        {
+            last_error = "gshare: history_length must be in [0, 63] and table_size a power of two";
+            return nullptr;
+        }
+        impl.reset(new GshareBatch(history_length, table_size));
+    }
+    else if (predictor == "bht")
+    {
+        const int64_t table_size = param(0, 1024);
+        if (table_size <= 0)
+        {
+            last_error = "bht: table_size must be positive";
+            return nullptr;
+        }
+        impl.reset(new BhtBatch(table_size));
+    }
+    else if (predictor == "tournament")
+        impl.reset(new TournamentBatch());
+    else if (predictor == "tage_sc_l")
+    {
+        if (TageScLBatch::created)
+        {
+            last_error = "tage_sc_l: its tables are globals, it can only be created once per process";
+            return nullptr;
+        }
+        TageScLBatch::created = true;
+        impl.reset(new TageScLBatch());
+    }
+    else
+    {
+        last_error = "unknown predictor '" + predictor + "' (known: gshare, bht, tournament, tage_sc_l)";
+        return nullptr;
+    }
+    predictor_handle* handle = new predictor_handle;
+    handle->impl = std::move(impl);
+    return handle;
+}
+
+void predictor_destroy(predictor_handle* handle)
+{
+    delete handle;
+}
+
+int64_t predictor_run(predictor_handle* handle, uint64_t n,
+                      const void* pcs, int64_t pc_stride,
+                      const void* taken, int64_t taken_stride,
+                      const void* targets, int64_t target_stride,
+                      const void* classes, int64_t class_stride,
+                      uint8_t* predictions)
+{
+    if (!handle || (n && (!pcs || !taken)))
+    {
+        last_error = "predictor_run: handle, pcs and taken are required";
+        return -1;
+    }
+    BatchPredictor& impl = *handle->impl;
+    if (n && !targets && impl.needs_targets())
+    {
+        last_error = "predictor_run: this predictor needs the branch targets";
+        return -1;
+    }
+
+    int64_t mispredictions = 0;
+    for (uint64_t i = 0; i < n; i++)
+    {
+        const uint64_t pc = load<uint64_t>(pcs, pc_stride, i);
+        const bool br_taken = load<uint8_t>(taken, taken_stride, i) != 0;
+        const uint64_t next_pc = targets ? load<uint64_t>(targets, target_stride, i) : (br_taken ? pc : pc + 4);
+        const InstClass inst_class = classes ? static_cast<InstClass>(load<uint8_t>(classes, class_stride, i)) : InstClass::condBranchInstClass;
+        const uint64_t seq_no = handle->seq_no++;
+        bool pred = true;
+        if (inst_class == InstClass::condBranchInstClass)
+        {
+            pred = impl.predict(seq_no, pc);
+            impl.resolve(seq_no, pc, br_taken, pred, next_pc);
+            mispredictions += pred != br_taken;
+        }
+        else if (is_br(inst_class))
+            impl.other_branch(pc, inst_class, br_taken, next_pc);
+        if (predictions)
+            predictions[i] = pred;
+    }
+    return mispredictions;
+}
+
+uint64_t predictor_num_branches(const predictor_handle* handle)
+{
+    return handle ? handle->seq_no : 0;
+}
+
+uint64_t predictor_storage_bits(const predictor_handle* handle)
+{
+    return handle ? handle->impl->storage_bits() : 0;
+}
+
+const char* predictor_last_error(void)
+{
+    return last_error.c_str();
+}
+
+}
@@ -0,0 +1,58 @@
+#ifndef _PREDICTOR_CAPI_H_
+#define _PREDICTOR_CAPI_H_
+
+// C ABI of tools/libpredictors.so (make libpredictors), the predictors of the repository root built as a shared
+// library so they can be driven from Python (scripts/predictors.py) without the simulator.
+//
+// A batch is a run of branches in program order. For every conditional branch the predictor is asked for a
+// prediction, then its history is updated and it is trained right away, in the order of cbp -B (predict,
+// spec_update, execute/resolve). Other branches only update the histories of the predictors that track them
+// (TAGE-SC-L). The state carries over from one batch to the next, so a trace can be fed in chunks.
+//
+// Arrays are passed as a base pointer and a byte stride, so the fields of an array of records (e.g. the
+// memory-mapped branch streams of scripts/branch_stream.py) are read in place.
+
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+typedef struct predictor_handle predictor_handle;
+
+// Creates a predictor:
+//   "gshare"      params: history_length, table_size (default 12, 4096 as cond_predictor_impl in gshare.cc)
+//   "bht"         params: table_size (default 1024 as in bht.cc)
+//   "tournament"  no params (sizes are the macros of tournament_predictor.h)
+//   "tage_sc_l"   no params; its tables are globals, so it can only be created once per process
+// Returns NULL on error (see predictor_last_error).
+predictor_handle* predictor_create(const char* name, const int64_t* params, int num_params);
+
+void predictor_destroy(predictor_handle* handle);
+
+// Runs n branches. pcs and taken (0/1) are required; targets (next_pc) may be NULL for the predictors that
+// ignore them (all but tage_sc_l); classes (InstClass values) may be NULL when all the branches are
+// conditional. predictions (may be NULL) receives the predicted direction of every branch, 1 for the
+// unconditional ones. Returns the number of mispredicted conditional branches, or -1 on error.
+int64_t predictor_run(predictor_handle* handle, uint64_t n,
+                      const void* pcs, int64_t pc_stride,
+                      const void* taken, int64_t taken_stride,
+                      const void* targets, int64_t target_stride,
+                      const void* classes, int64_t class_stride,
+                      uint8_t* predictions);
+
+// Number of branches run so far (the seq_no given to the next branch)
+uint64_t predictor_num_branches(const predictor_handle* handle);
+
+// Modeled storage of the predictor tables and histories in bits, to check against the storage budget;
+// 0 for tage_sc_l, which reports its own (predictorsize() of cbp2016_tage_sc_l.h)
+uint64_t predictor_storage_bits(const predictor_handle* handle);
+
+// Message of the last failed call
+const char* predictor_last_error(void);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif
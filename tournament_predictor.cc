@@ -7,15 +7,11 @@
 TOURNAMENT_PREDICTOR cond_predictor_impl; // Dichiarazione dell'istanza globale del predittore Tournament
 
 TOURNAMENT_PREDICTOR::TOURNAMENT_PREDICTOR() {
-    // Inizializza le tabelle con le dimensioni definite nel file .h
-    local_predictor_table.resize(1 << LOG_LOCAL_PREDICTOR_SIZE);
-    global_predictor_table.resize(1 << LOG_GLOBAL_PREDICTOR_SIZE);
-    chooser_table.resize(1 << LOG_CHOOSER_SIZE);
-
-    // Imposta tutti i contatori a uno stato iniziale di "debolmente non preso" (1)
-    for (auto &entry : local_predictor_table) entry = 1;
-    for (auto &entry : global_predictor_table) entry = 1;
-    for (auto &entry : chooser_table) entry = 1; // Preferenza iniziale debole per il locale
+    // Inizializza le tabelle con le dimensioni definite nel file .h,
+    // con tutti i contatori in uno stato iniziale di "debolmente non preso" (1)
+    local_predictor_table.assign(1 << LOG_LOCAL_PREDICTOR_SIZE, 1);
+    global_predictor_table.assign(1 << LOG_GLOBAL_PREDICTOR_SIZE, 1);
+    chooser_table.assign(1 << LOG_CHOOSER_SIZE, 1); // Preferenza iniziale debole per il locale
 
     ghr = 0; // Azzera la storia globale
 }
@@ -24,16 +20,16 @@ TOURNAMENT_PREDICTOR::TOURNAMENT_PREDICTOR() {
 bool TOURNAMENT_PREDICTOR::get_cond_dir_prediction(uint64_t pc) {
     // 1. Predizione Locale
     uint32_t local_index = pc % (1 << LOG_LOCAL_PREDICTOR_SIZE);
-    bool local_prediction = (local_predictor_table[local_index] >= 2);
+    bool local_prediction = local_predictor_table.taken(local_index);
 
     // 2. Predizione Globale (GShare)
     uint64_t history_mask = (1 << GLOBAL_HISTORY_LENGTH) - 1;
     uint32_t global_index = (pc ^ (ghr & history_mask)) % (1 << LOG_GLOBAL_PREDICTOR_SIZE);
-    bool global_prediction = (global_predictor_table[global_index] >= 2);
+    bool global_prediction = global_predictor_table.taken(global_index);
 
     // 3. Decisione del Selettore
     uint32_t chooser_index = pc % (1 << LOG_CHOOSER_SIZE);
-    bool use_global_predictor = (chooser_table[chooser_index] >= 2);
+    bool use_global_predictor = chooser_table.taken(chooser_index);
 
     return use_global_predictor ? global_prediction : local_prediction;
 }
@@ -42,44 +38,29 @@ bool TOURNAMENT_PREDICTOR::get_cond_dir_prediction(uint64_t pc) {
 void TOURNAMENT_PREDICTOR::update_predictor(uint64_t pc, bool taken, bool pred) {
     // Ottieni di nuovo le predizioni per vedere chi aveva ragione
     uint32_t local_index = pc % (1 << LOG_LOCAL_PREDICTOR_SIZE);
-    bool local_prediction = (local_predictor_table[local_index] >= 2);
+    bool local_prediction = local_predictor_table.taken(local_index);
     uint64_t history_mask = (1 << GLOBAL_HISTORY_LENGTH) - 1;
     uint32_t global_index = (pc ^ (ghr & history_mask)) % (1 << LOG_GLOBAL_PREDICTOR_SIZE);
-    bool global_prediction = (global_predictor_table[global_index] >= 2);
+    bool global_prediction = global_predictor_table.taken(global_index);
 
     bool local_correct = (local_prediction == taken);
     bool global_correct = (global_prediction == taken);
 
     // Aggiorna il selettore
     uint32_t chooser_index = pc % (1 << LOG_CHOOSER_SIZE);
-    if (global_correct && !local_correct) {
-        saturating_increment(chooser_table[chooser_index]);
-    } else if (!global_correct && local_correct) {
-        saturating_decrement(chooser_table[chooser_index]);
+    if (global_correct != local_correct) {
+        chooser_table.update(chooser_index, global_correct);
     }
 
     // Aggiorna i contatori dei predittori di base
-    if (taken) {
-        saturating_increment(local_predictor_table[local_index]);
-        saturating_increment(global_predictor_table[global_index]);
-    } else {
-        saturating_decrement(local_predictor_table[local_index]);
-        saturating_decrement(global_predictor_table[global_index]);
-    }
+    local_predictor_table.update(local_index, taken);
+    global_predictor_table.update(global_index, taken);
 
     // Aggiorna la storia globale alla fine
     ghr = ((ghr << 1) | taken);
 }
 
-// Implementazione delle funzioni helper
-void TOURNAMENT_PREDICTOR::saturating_increment(int8_t &counter) {
-    if (counter < 3) {
-        counter++;
-    }
+uint64_t TOURNAMENT_PREDICTOR::storage_bits() const {
+    return local_predictor_table.storage_bits() + global_predictor_table.storage_bits()
+         + chooser_table.storage_bits() + GLOBAL_HISTORY_LENGTH;
 }
-
-void TOURNAMENT_PREDICTOR::saturating_decrement(int8_t &counter) {
-    if (counter > 0) {
-        counter--;
-    }
-}
\ No newline at end of file
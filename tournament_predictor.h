@@ -3,6 +3,7 @@
 
 #include <vector>
 #include <cstdint>
+#include "counter_table.h"
 
 // ============================================================================
 // ==                CONFIGURAZIONE DEL TOURNAMENT PREDICTOR                 ==
@@ -16,15 +17,11 @@
 class TOURNAMENT_PREDICTOR {
 private:
     // --- Componenti Hardware del Predittore ---
-    std::vector<int8_t> local_predictor_table;
-    std::vector<int8_t> global_predictor_table;
-    std::vector<int8_t> chooser_table;
+    CounterTable<2> local_predictor_table;
+    CounterTable<2> global_predictor_table;
+    CounterTable<2> chooser_table;
     uint64_t ghr; // Global History Register
 
-    // --- Funzioni Helper Private ---
-    void saturating_increment(int8_t &counter);
-    void saturating_decrement(int8_t &counter);
-
 public:
     // --- Interfaccia Pubblica per il Simulatore CBP ---
 
@@ -36,6 +33,9 @@ public:
 
     // Funzione principale di aggiornamento
     void update_predictor(uint64_t pc, bool taken, bool pred);
+
+    // Bit di stato modellati (tre tabelle e storia globale), da confrontare con il budget
+    uint64_t storage_bits() const;
 };
 
 extern TOURNAMENT_PREDICTOR cond_predictor_impl; // Dichiarazione dell'istanza globale del predittore Tournament